@@ -3,6 +3,16 @@ from config.config import Config
 from utils.error_handler import register_error_handlers
 from routes import register_blueprints
 from extensions import bcrypt, jwt, cors
+from utils.log import init_logging
+from utils.db import init_db_pool
+from utils.sql_instrumentation import init_sql_instrumentation
+from utils.migrations import register_migration_commands
+from utils.partitions import init_attendance_partitions
+from utils.schema import init_schema_registry
+from utils.metrics import init_metrics
+from utils.profiling import init_profiling
+from utils.report_jobs import init_report_jobs
+from utils.report_bundle import init_report_bundles
 
 def create_app(config_class=Config):
     """
@@ -17,19 +27,48 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Logging estructurado con identificador de correlación por petición
+    init_logging(app)
+    
     # Inicializar extensiones
     cors.init_app(app, supports_credentials=True, resources={r"/*": {"origins": app.config['CORS_ORIGIN']}})
     jwt.init_app(app)
     bcrypt.init_app(app)
     
+    # Inicializar el pool de conexiones compartido
+    init_db_pool(app)
+    
+    # Crear con anticipación las particiones mensuales de asistencia
+    init_attendance_partitions(app)
+    
+    # Cargar una sola vez las tablas y columnas del esquema
+    init_schema_registry(app)
+    
+    # Instrumentación de SQL por petición
+    init_sql_instrumentation(app)
+    
+    # Métricas Prometheus en /metrics
+    init_metrics(app)
+    
+    # Perfilado bajo demanda para administradores (X-Profile)
+    init_profiling(app)
+    
+    # Cola de reportes en segundo plano y paquetes ZIP de reportes
+    init_report_jobs(app)
+    init_report_bundles(app)
+    
     # Registrar blueprints
     register_blueprints(app)
     
     # Registrar manejadores de errores
     register_error_handlers(app)
     
+    # Comandos de migración (flask db upgrade/status/verify)
+    register_migration_commands(app)
+    
     return app
 
 if __name__ == "__main__":
+    # Servidor de desarrollo; en producción usar: gunicorn -c gunicorn.conf.py wsgi:app
     app = create_app()
     app.run(debug=app.config['DEBUG'], host=app.config['HOST'], port=app.config['PORT'])
@@ -0,0 +1,485 @@
+"""
+Generador de un conjunto de datos sintético para pruebas de rendimiento.
+
+Llena usuarios, family, student, class, "group", history, notes y attendance
+con una escala configurable (por defecto 20 000 estudiantes, 2 000 grupos y 5
+ciclos escolares de asistencia diaria). Las filas se cargan con COPY desde un
+generador, sin construir archivos intermedios.
+
+El resultado depende solo de los parámetros: cada tabla usa su propio
+generador aleatorio derivado de `--seed`, así que con los mismos parámetros se
+obtienen los mismos datos (salvo los hashes de contraseña, que usan sal
+aleatoria) y cambiar, por ejemplo, el número de periodos no altera los
+estudiantes.
+
+Distribuciones:
+- Familias de 1 a 4 hermanos que comparten tutor y apellidos.
+- Cada ciclo escolar tiene sus propios grupos, repartidos por grado
+  (1° a 6° de primaria y 1° a 3° de secundaria). Cada estudiante avanza un
+  grado por ciclo, deja la escuela al terminar secundaria y cada ciclo está
+  inscrito en varios grupos de su grado (`--groups-per-student` en promedio).
+- history queda 'activo' en el último ciclo e 'inactivo' en los anteriores.
+- Calificaciones alrededor del promedio de cada estudiante y asistencia en
+  días hábiles (sin vacaciones de invierno ni de Semana Santa) con una
+  probabilidad de asistencia propia de cada estudiante.
+
+Se requiere haber aplicado las migraciones (`flask --app app db upgrade`).
+Las tablas deben estar vacías, o se vacían con `--truncate`.
+
+Uso:
+    python -m benchmarks.dataset --students 20000 --groups 2000 --years 5 --seed 42 --truncate
+
+Todos los usuarios generados tienen la contraseña 123456; el administrador es
+admin@dataset.test.
+"""
+import argparse
+import random
+import time
+import unicodedata
+from datetime import date, timedelta
+
+import bcrypt
+import psycopg2
+
+from config.config import Config
+from routes.grades_routes import GRADE_COMPONENTS, calculate_final_grade
+
+DEFAULT_PASSWORD = '123456'
+EMAIL_DOMAIN = 'dataset.test'
+ADMIN_ROLE_ID = 1
+TEACHER_ROLE_ID = 2
+
+# Tablas que llena el generador, en orden de dependencia
+TABLES = ('usuarios', 'family', 'student', 'class', '"group"', 'history', 'notes', 'attendance')
+
+LEVELS = tuple(f"{n}° primaria" for n in range(1, 7)) + tuple(f"{n}° secundaria" for n in range(1, 4))
+
+SUBJECTS = (
+    'Matemáticas', 'Español', 'Inglés', 'Ciencias Naturales', 'Historia', 'Geografía', 'Formación Cívica',
+    'Educación Física', 'Artes', 'Música', 'Computación', 'Biología', 'Física', 'Química', 'Clase Bíblica',
+    'Lectura', 'Tecnología', 'Francés',
+)
+
+FIRST_NAMES = {
+    'F': ('María', 'Sofía', 'Valentina', 'Regina', 'Camila', 'Ximena', 'Fernanda', 'Daniela', 'Andrea',
+          'Isabella', 'Mariana', 'Renata', 'Victoria', 'Natalia', 'Paula', 'Lucía', 'Ana', 'Elena'),
+    'M': ('José', 'Santiago', 'Mateo', 'Sebastián', 'Leonardo', 'Emiliano', 'Diego', 'Miguel', 'Daniel',
+          'Alejandro', 'Juan', 'Carlos', 'Luis', 'Gabriel', 'David', 'Tomás', 'Andrés', 'Pablo'),
+}
+
+LAST_NAMES = (
+    'Hernández', 'García', 'Martínez', 'López', 'González', 'Pérez', 'Rodríguez', 'Sánchez', 'Ramírez',
+    'Cruz', 'Flores', 'Gómez', 'Morales', 'Vázquez', 'Reyes', 'Jiménez', 'Torres', 'Díaz', 'Gutiérrez',
+    'Ruiz', 'Mendoza', 'Aguilar', 'Ortiz', 'Moreno', 'Castillo', 'Romero', 'Álvarez', 'Méndez', 'Chávez',
+    'Rivera', 'Juárez', 'Ramos', 'Domínguez', 'Herrera', 'Medina', 'Castro', 'Vargas', 'Guzmán', 'Velázquez',
+)
+
+BLOOD_TYPES = ('O+', 'A+', 'B+', 'AB+', 'O-', 'A-', 'B-', 'AB-')
+BLOOD_TYPE_WEIGHTS = (56, 27, 8, 2, 4, 2, 0.7, 0.3)
+ALLERGIES = ('Polen', 'Penicilina', 'Lácteos', 'Cacahuate', 'Mariscos', 'Polvo')
+CHAPELS = ('Capilla Central', 'Capilla Norte', 'Capilla Sur', 'Capilla Oriente', 'Capilla Poniente')
+CAMPUSES = ('Campus Centro', 'Campus Norte', 'Campus Sur')
+STATES = ('DF', 'MC', 'JC', 'NL', 'PL', 'GT', 'QT', 'MN')
+
+# Hermanos por familia
+FAMILY_SIZES = (1, 2, 3, 4)
+FAMILY_SIZE_WEIGHTS = (55, 30, 12, 3)
+
+# Ciclo escolar: del 26 de agosto al 10 de julio, sin vacaciones de invierno ni de Semana Santa
+SCHOOL_YEAR_START = (8, 26)
+SCHOOL_YEAR_END = (7, 10)
+WINTER_BREAK = ((12, 20), (1, 6))
+SPRING_BREAK = ((4, 1), (4, 14))
+
+
+class DatasetSpec:
+    """Parámetros de escala del conjunto de datos"""
+
+    def __init__(self, students=20000, groups=2000, teachers=400, classes=len(SUBJECTS), years=5, start_year=2020,
+                 groups_per_student=3, periods=3, seed=42, attendance=True):
+        self.students = students
+        self.groups = groups
+        self.teachers = teachers
+        self.classes = classes
+        self.years = years
+        self.start_year = start_year
+        self.groups_per_student = groups_per_student
+        self.periods = periods
+        self.seed = seed
+        self.attendance = attendance
+
+    def rng(self, name):
+        """Generador aleatorio propio de una tabla o etapa, derivado de la semilla"""
+        return random.Random(f"{self.seed}:{name}")
+
+
+class CopyStream:
+    """Archivo de solo lectura que produce filas en formato de texto de COPY a partir de un iterador"""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.count = 0
+        self._buffer = ''
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            line = '\t'.join(_copy_value(value) for value in row) + '\n'
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+        data = ''.join(chunks)
+        if size < 0:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return str(value)
+
+
+def copy_rows(cur, table, columns, rows):
+    """Carga las filas con COPY y devuelve cuántas se cargaron"""
+    stream = CopyStream(rows)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream)
+    return stream.count
+
+
+def _ascii(text):
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower().replace(' ', '')
+
+
+def school_days(year):
+    """Días hábiles del ciclo escolar que empieza en agosto de `year`"""
+    day = date(year, *SCHOOL_YEAR_START)
+    last = date(year + 1, *SCHOOL_YEAR_END)
+    breaks = (
+        (date(year, *WINTER_BREAK[0]), date(year + 1, *WINTER_BREAK[1])),
+        (date(year + 1, *SPRING_BREAK[0]), date(year + 1, *SPRING_BREAK[1])),
+    )
+    days = []
+    while day <= last:
+        if day.weekday() < 5 and not any(start <= day <= end for start, end in breaks):
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _split_evenly(total, parts):
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+class DatasetPlan:
+    """
+    Estructura del conjunto de datos (familias, estudiantes, grupos e inscripciones).
+
+    Se calcula en memoria antes de cargar; las filas voluminosas (notes y
+    attendance) se generan al vuelo a partir de las inscripciones.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.families = []
+        self.students = []
+        self.groups = []
+        # (student_id, group_id, year_index)
+        self.enrollments = []
+        self._plan_families_and_students()
+        self._plan_groups()
+        self._plan_enrollments()
+
+    def _plan_families_and_students(self):
+        spec = self.spec
+        rng = spec.rng('students')
+        student_id = 0
+        while student_id < spec.students:
+            family_id = len(self.families) + 1
+            size = min(rng.choices(FAMILY_SIZES, FAMILY_SIZE_WEIGHTS)[0], spec.students - student_id)
+            lastname_f, lastname_m = rng.choice(LAST_NAMES), rng.choice(LAST_NAMES)
+            tutor_gender = rng.choice('FM')
+            self.families.append({
+                'id': family_id,
+                'tutor_name': rng.choice(FIRST_NAMES[tutor_gender]),
+                'tutor_lastname_f': lastname_f if tutor_gender == 'M' else rng.choice(LAST_NAMES),
+                'tutor_lastname_m': lastname_m if tutor_gender == 'F' else rng.choice(LAST_NAMES),
+                'phone': f"55{rng.randrange(10**8):08d}",
+                'emergency_phone': f"55{rng.randrange(10**8):08d}",
+            })
+
+            # Los hermanos entran el mismo ciclo en grados distintos
+            first_level = rng.randrange(len(LEVELS))
+            for sibling in range(size):
+                student_id += 1
+                gender = rng.choice('FM')
+                level = (first_level + sibling * rng.choice((1, 2, 3))) % len(LEVELS)
+                self.students.append({
+                    'id': student_id,
+                    'family_id': family_id,
+                    'gender': gender,
+                    'name': rng.choice(FIRST_NAMES[gender]),
+                    'lastname_f': lastname_f,
+                    'lastname_m': lastname_m,
+                    'start_level': level,
+                    'birth_date': date(spec.start_year - 6 - level, 1, 1) + timedelta(days=rng.randrange(365)),
+                    'ability': min(9.8, max(6.0, rng.gauss(8.2, 0.8))),
+                    'presence': min(0.995, max(0.6, rng.betavariate(18, 1.5))),
+                })
+
+    def _plan_groups(self):
+        spec = self.spec
+        rng = spec.rng('groups')
+        self.groups_by_year_level = {}
+        group_id = 0
+        for year_index, count in enumerate(_split_evenly(spec.groups, spec.years)):
+            for n in range(count):
+                group_id += 1
+                level = n % len(LEVELS)
+                self.groups.append({
+                    'id': group_id,
+                    'grade': LEVELS[level],
+                    'class_id': rng.randrange(spec.classes) + 1,
+                    'professor_id': rng.randrange(spec.teachers) + 2 if spec.teachers else None,
+                })
+                self.groups_by_year_level.setdefault((year_index, level), []).append(group_id)
+
+    def _plan_enrollments(self):
+        spec = self.spec
+        rng = spec.rng('enrollments')
+        mean = spec.groups_per_student
+        for student in self.students:
+            for year_index in range(spec.years):
+                level = student['start_level'] + year_index
+                if level >= len(LEVELS):
+                    break
+                candidates = self.groups_by_year_level.get((year_index, level))
+                if not candidates:
+                    continue
+                count = min(len(candidates), max(1, mean + rng.choice((-1, 0, 0, 1))))
+                for group_id in rng.sample(candidates, count):
+                    self.enrollments.append((student['id'], group_id, year_index))
+
+
+def _subject_names(count):
+    names = []
+    for i in range(count):
+        round_, index = divmod(i, len(SUBJECTS))
+        names.append(SUBJECTS[index] if round_ == 0 else f"{SUBJECTS[index]} {round_ + 1}")
+    return names
+
+
+def _curp(rng, student):
+    initials = (_ascii(student['lastname_f'])[:2] + _ascii(student['lastname_m'])[:1] + _ascii(student['name'])[:1])
+    consonants = ''.join(rng.choice('BCDFGHJKLMNPRSTVZ') for _ in range(3))
+    return (
+        f"{initials.upper():X<4}{student['birth_date']:%y%m%d}{'M' if student['gender'] == 'F' else 'H'}"
+        f"{rng.choice(STATES)}{consonants}{rng.randrange(10)}{rng.randrange(10)}"
+    )
+
+
+def _user_rows(spec):
+    password = bcrypt.hashpw(DEFAULT_PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    rng = spec.rng('usuarios')
+    yield 1, 'Administrador', 'Dataset', 'Dataset', f"admin@{EMAIL_DOMAIN}", password, ADMIN_ROLE_ID
+    for n in range(1, spec.teachers + 1):
+        gender = rng.choice('FM')
+        yield (
+            n + 1, rng.choice(FIRST_NAMES[gender]), rng.choice(LAST_NAMES), rng.choice(LAST_NAMES),
+            f"profesor{n}@{EMAIL_DOMAIN}", password, TEACHER_ROLE_ID,
+        )
+
+
+def _family_rows(plan):
+    for family in plan.families:
+        yield (
+            family['id'], family['tutor_name'], family['tutor_lastname_f'], family['tutor_lastname_m'],
+            family['phone'], f"tutor{family['id']}@{EMAIL_DOMAIN}", family['emergency_phone'],
+        )
+
+
+def _student_rows(plan):
+    spec = plan.spec
+    rng = spec.rng('student_details')
+    # group_id apunta al primer grupo del ciclo actual; queda vacío para quienes ya egresaron
+    current_group = {}
+    for student_id, group_id, year_index in plan.enrollments:
+        if year_index == spec.years - 1:
+            current_group.setdefault(student_id, group_id)
+
+    for student in plan.students:
+        email = f"{_ascii(student['name'])}.{_ascii(student['lastname_f'])}.{student['id']}@alumnos.{EMAIL_DOMAIN}"
+        yield (
+            student['id'], student['name'], student['lastname_f'], student['lastname_m'], email,
+            rng.choices(BLOOD_TYPES, BLOOD_TYPE_WEIGHTS)[0],
+            rng.choice(ALLERGIES) if rng.random() < 0.12 else None,
+            rng.random() < 0.15,
+            rng.choice(CHAPELS),
+            rng.choice(CAMPUSES),
+            student['family_id'],
+            None,
+            date(spec.start_year, 8, 1) + timedelta(days=rng.randrange(25)),
+            student['birth_date'],
+            _curp(rng, student),
+            f"SEP{student['id']:08d}",
+            f"CPDB{student['id']:07d}",
+            student['gender'],
+            current_group.get(student['id']),
+        )
+
+
+def _history_rows(plan):
+    current_year = plan.spec.years - 1
+    for student_id, group_id, year_index in plan.enrollments:
+        status = 'activo' if year_index == current_year else 'inactivo'
+        yield student_id, group_id, status
+
+
+def _note_rows(plan):
+    spec = plan.spec
+    rng = spec.rng('notes')
+    students = {student['id']: student for student in plan.students}
+    for student_id, group_id, _ in plan.enrollments:
+        ability = students[student_id]['ability']
+        for period in range(1, spec.periods + 1):
+            values = [round(min(10.0, max(5.0, rng.gauss(ability, 0.7))), 2) for _ in GRADE_COMPONENTS]
+            yield (student_id, group_id, *values, round(calculate_final_grade(*values), 2), period)
+
+
+def _attendance_rows(plan):
+    spec = plan.spec
+    presence = {student['id']: student['presence'] for student in plan.students}
+    by_year = {}
+    for student_id, group_id, year_index in plan.enrollments:
+        by_year.setdefault(year_index, []).append((student_id, group_id))
+
+    # Las filas se generan por día, en el orden en que la aplicación las registraría
+    for year_index in range(spec.years):
+        rng = spec.rng(f"attendance:{year_index}")
+        enrollments = by_year.get(year_index, [])
+        for day in school_days(spec.start_year + year_index):
+            fecha = f"{day.isoformat()} 00:00:00"
+            for student_id, group_id in enrollments:
+                yield student_id, rng.random() < presence[student_id], fecha, group_id
+
+
+def _tables_with_rows(cur):
+    populated = []
+    for table in TABLES:
+        cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+        if cur.fetchone()[0]:
+            populated.append(table)
+    return populated
+
+
+def generate(conn, spec, truncate=False, log=print):
+    """
+    Genera y carga el conjunto de datos en una sola transacción.
+
+    Devuelve un diccionario con las filas cargadas por tabla.
+    """
+    plan = DatasetPlan(spec)
+    counts = {}
+
+    with conn.cursor() as cur:
+        if truncate:
+            cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+        else:
+            populated = _tables_with_rows(cur)
+            if populated:
+                raise RuntimeError(
+                    f"Las tablas {', '.join(populated)} ya tienen datos; use --truncate para vaciarlas"
+                )
+
+        cur.execute(
+            "INSERT INTO roles (id, name) VALUES (%s, %s), (%s, %s) ON CONFLICT (id) DO NOTHING",
+            (ADMIN_ROLE_ID, 'Administrador', TEACHER_ROLE_ID, 'Profesor')
+        )
+
+        steps = [
+            ('usuarios', ('id', 'name', 'lastname_f', 'lastname_m', 'email', 'password', 'rol'), _user_rows(spec)),
+            ('family', ('id', 'tutor_name', 'tutor_lastname_f', 'tutor_lastname_m', 'phone_number',
+                        'email_address', 'emergency_phone_number'), _family_rows(plan)),
+            ('class', ('id', 'name'), enumerate(_subject_names(spec.classes), start=1)),
+            ('"group"', ('id', 'grade', 'class_id', 'professor_id'),
+             ((g['id'], g['grade'], g['class_id'], g['professor_id']) for g in plan.groups)),
+            ('student', ('id', 'name', 'lastname_f', 'lastname_m', 'email', 'blood_type', 'allergies',
+                         'scholar_ship', 'chapel', 'school_campus', 'family_id', 'permission', 'reg_date',
+                         'birth_date', 'curp', 'sep_register', 'cpdb_register', 'gender', 'group_id'),
+             _student_rows(plan)),
+            ('history', ('student_id', 'group_id', 'status'), _history_rows(plan)),
+            ('notes', ('student_id', 'grade_id') + GRADE_COMPONENTS + ('finall', 'period'), _note_rows(plan)),
+        ]
+        if spec.attendance:
+            first_day = school_days(spec.start_year)[0]
+            last_day = school_days(spec.start_year + spec.years - 1)[-1]
+            cur.execute("SELECT ensure_attendance_partitions(%s, %s)", (first_day, last_day))
+            steps.append(('attendance', ('student_id', 'status', 'fecha', 'grade_id'), _attendance_rows(plan)))
+
+        for table, columns, rows in steps:
+            start = time.perf_counter()
+            counts[table] = copy_rows(cur, table, columns, rows)
+            log(f"{table}: {counts[table]} filas en {time.perf_counter() - start:.1f} s")
+
+        # Las tablas con id explícito necesitan que su secuencia continúe después del máximo
+        for table in ('usuarios', 'family', 'class', '"group"', 'student'):
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), (SELECT max(id) FROM {table}))", (table,)
+            )
+
+    conn.commit()
+
+    # ANALYZE fuera de la transacción de carga para que el planificador vea las estadísticas reales
+    with conn.cursor() as cur:
+        for table in counts:
+            cur.execute(f"ANALYZE {table}")
+    conn.commit()
+    return counts
+
+
+def main():
+    defaults = DatasetSpec()
+    parser = argparse.ArgumentParser(description="Genera un conjunto de datos sintético para pruebas de rendimiento")
+    parser.add_argument("--students", type=int, default=defaults.students)
+    parser.add_argument("--groups", type=int, default=defaults.groups, help="Grupos en total, repartidos entre ciclos")
+    parser.add_argument("--teachers", type=int, default=defaults.teachers)
+    parser.add_argument("--classes", type=int, default=defaults.classes, help="Materias")
+    parser.add_argument("--years", type=int, default=defaults.years, help="Ciclos escolares")
+    parser.add_argument("--start-year", type=int, default=defaults.start_year, help="Año en que empieza el primer ciclo")
+    parser.add_argument("--groups-per-student", type=int, default=defaults.groups_per_student)
+    parser.add_argument("--periods", type=int, default=defaults.periods, help="Periodos de calificación por grupo")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--skip-attendance", action="store_true", help="No generar asistencia")
+    parser.add_argument("--truncate", action="store_true", help="Vaciar las tablas antes de cargar")
+    args = parser.parse_args()
+
+    if args.years < 1 or args.students < 1 or args.groups < 1 or args.classes < 1:
+        parser.error("--students, --groups, --classes y --years deben ser mayores que cero")
+
+    spec = DatasetSpec(
+        students=args.students, groups=args.groups, teachers=args.teachers, classes=args.classes,
+        years=args.years, start_year=args.start_year, groups_per_student=args.groups_per_student,
+        periods=args.periods, seed=args.seed, attendance=not args.skip_attendance,
+    )
+    start = time.perf_counter()
+    conn = psycopg2.connect(**Config.DB_CONFIG)
+    try:
+        counts = generate(conn, spec, truncate=args.truncate)
+    finally:
+        conn.close()
+    print(f"{sum(counts.values())} filas en {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Prueba de carga HTTP sin dependencias externas.
+
+Lanza `--concurrency` clientes concurrentes contra uno o más endpoints durante
+`--duration` segundos y reporta peticiones por segundo y latencias (p50, p95,
+p99). Si se indican `--email` y `--password` primero inicia sesión y envía el
+token en cada petición.
+
+Uso:
+    python -m benchmarks.load_test --base-url http://localhost:5328 \\
+        --email admin@cedb.com --password 123456 \\
+        --path /api/estudiantes?per_page=20 --path /api/asistencia/grupo/1 \\
+        --concurrency 32 --duration 30
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def login(base_url, email, password):
+    """Inicia sesión en /api/login y devuelve el token de acceso"""
+    body = json.dumps({"email": email, "password": password}).encode("utf-8")
+    req = urllib.request.Request(
+        f"{base_url}/api/login", data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return json.loads(resp.read())["token"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LoadResult:
+    """Latencias y errores acumulados por todos los clientes"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.status_counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, latency, status):
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            if isinstance(status, int) and status < 400:
+                self.latencies.append(latency)
+            else:
+                self.errors += 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        total = len(latencies) + self.errors
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "elapsed_s": round(elapsed, 2),
+            "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "status": {str(key): value for key, value in sorted(self.status_counts.items(), key=str)},
+        }
+
+
+def _client(base_url, paths, headers, deadline, result, offset):
+    i = offset
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        req = urllib.request.Request(f"{base_url}{path}", headers=headers)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = "error"
+        result.record(time.perf_counter() - start, status)
+
+
+def run_load_test(base_url, paths, concurrency=16, duration=30.0, token=None, warmup=2.0):
+    """
+    Ejecuta la prueba de carga y devuelve el resumen como diccionario.
+
+    Los primeros `warmup` segundos no se cuentan (llenan pools y cachés).
+    """
+    headers = {"Accept": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+
+    def run_phase(seconds, result):
+        deadline = time.monotonic() + seconds
+        threads = [
+            threading.Thread(target=_client, args=(base_url, paths, headers, deadline, result, n), daemon=True)
+            for n in range(concurrency)
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.monotonic() - start
+
+    if warmup > 0:
+        run_phase(warmup, LoadResult())
+
+    result = LoadResult()
+    elapsed = run_phase(duration, result)
+    return result.summary(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP del backend")
+    parser.add_argument("--base-url", default="http://localhost:5328")
+    parser.add_argument("--path", action="append", dest="paths", help="Ruta a solicitar (se puede repetir)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--email")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+
+    paths = args.paths or ["/api/usuarios/groups"]
+    token = login(args.base_url, args.email, args.password) if args.email else None
+    summary = run_load_test(args.base_url, paths, args.concurrency, args.duration, token, args.warmup)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Suite de latencia por endpoint con escenarios realistas y comparación contra líneas base.
+
+Cada usuario virtual repite escenarios elegidos según `--mix`:
+
+- gradebook:  un profesor abre sus materias y las calificaciones de un grupo.
+- attendance: un profesor abre la asistencia de un grupo y la guarda.
+- search:     un administrador busca estudiantes y pide la página siguiente.
+- reports:    un administrador descarga los reportes CSV de un grupo.
+
+Al terminar se reportan peticiones por segundo y latencias p50/p95/p99 por
+endpoint. Con `--save-baseline` el resultado se guarda en
+benchmarks/baselines/<nombre>.json; con `--baseline` se compara contra uno
+guardado y el proceso termina con código 1 si algún endpoint empeoró más de la
+tolerancia, para usarlo antes de desplegar.
+
+Se espera una base cargada con benchmarks.dataset (usuarios admin@dataset.test
+y profesorN@dataset.test). El escenario attendance escribe asistencia, así que
+solo debe ejecutarse contra bases de prueba.
+
+Uso:
+    # Contra un servidor en marcha
+    python -m benchmarks.suite --base-url http://localhost:5328 --baseline main
+
+    # Arrancando la aplicación con gunicorn en un puerto libre
+    python -m benchmarks.suite --boot gunicorn --port 5400 --concurrency 32 --duration 60 --save-baseline main
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date
+
+from benchmarks.dataset import EMAIL_DOMAIN, LAST_NAMES
+from benchmarks.load_test import LoadResult, login
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'baselines')
+
+DEFAULT_MIX = {'gradebook': 35, 'attendance': 30, 'search': 25, 'reports': 10}
+
+# Tolerancias por defecto para considerar una regresión
+DEFAULT_LATENCY_TOLERANCE = 0.20     # p95 hasta 20% más lento
+DEFAULT_THROUGHPUT_TOLERANCE = 0.15  # hasta 15% menos peticiones por segundo
+MIN_LATENCY_DELTA_MS = 2.0           # diferencias menores se consideran ruido
+
+
+class SuiteResult:
+    """Resultados acumulados por endpoint"""
+
+    def __init__(self):
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency, status):
+        with self._lock:
+            result = self.endpoints.get(endpoint)
+            if result is None:
+                result = self.endpoints[endpoint] = LoadResult()
+        result.record(latency, status)
+
+    def summary(self, elapsed):
+        overall = LoadResult()
+        for result in self.endpoints.values():
+            overall.latencies.extend(result.latencies)
+            overall.errors += result.errors
+            for status, count in result.status_counts.items():
+                overall.status_counts[status] = overall.status_counts.get(status, 0) + count
+        return {
+            'overall': overall.summary(elapsed),
+            'endpoints': {name: result.summary(elapsed) for name, result in sorted(self.endpoints.items())},
+        }
+
+
+class Session:
+    """Cliente HTTP de un usuario autenticado que registra la latencia de cada petición"""
+
+    def __init__(self, base_url, token, result):
+        self.base_url = base_url
+        self.token = token
+        self.result = result
+
+    def request(self, endpoint, method, path, body=None):
+        """
+        Ejecuta la petición y devuelve el JSON de la respuesta (o None).
+
+        `endpoint` es la etiqueta con la que se agrupan las latencias, p. ej.
+        "GET /api/asistencia/grupo/<id>".
+        """
+        headers = {'Accept': 'application/json', 'Authorization': f'Bearer {self.token}'}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(f"{self.base_url}{path}", data=data, headers=headers, method=method)
+
+        start = time.perf_counter()
+        payload = None
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                content = resp.read()
+                status = resp.status
+            if resp.headers.get_content_type() == 'application/json':
+                payload = json.loads(content)
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 'error'
+        self.result.record(endpoint, time.perf_counter() - start, status)
+        return payload
+
+
+def _teacher_groups(session):
+    materias = session.request('GET /api/profesor/materias', 'GET', '/api/profesor/materias') or {}
+    return [materia['group_id'] for materia in materias.get('materias', [])]
+
+
+def scenario_gradebook(ctx, rng):
+    teacher = rng.choice(ctx['teachers'])
+    groups = _teacher_groups(teacher)
+    if groups:
+        group_id = rng.choice(groups)
+        period = rng.randint(1, ctx['periods'])
+        teacher.request(
+            'GET /api/calificaciones/grupo/<id>', 'GET', f"/api/calificaciones/grupo/{group_id}?period={period}"
+        )
+
+
+def scenario_attendance(ctx, rng):
+    teacher = rng.choice(ctx['teachers'])
+    groups = _teacher_groups(teacher)
+    if not groups:
+        return
+    group_id = rng.choice(groups)
+    day = ctx['attendance_date']
+    current = teacher.request(
+        'GET /api/asistencia/grupo/<id>', 'GET', f"/api/asistencia/grupo/{group_id}?date={day}"
+    ) or {}
+    records = [
+        {'student_id': record['student_id'], 'group_id': group_id, 'present': rng.random() < 0.93}
+        for record in current.get('attendance', [])
+    ]
+    if records:
+        teacher.request(
+            'POST /api/asistencia/guardar', 'POST', '/api/asistencia/guardar',
+            {'group_id': group_id, 'date': day, 'attendance': records}
+        )
+
+
+def scenario_search(ctx, rng):
+    admin = ctx['admin']
+    term = urllib.parse.quote(rng.choice(LAST_NAMES)[:rng.randint(3, 6)])
+    page = admin.request(
+        'GET /api/estudiantes?search', 'GET', f"/api/estudiantes?search={term}&per_page=20&count=none"
+    ) or {}
+    next_cursor = page.get('pagination', {}).get('next_cursor')
+    if next_cursor:
+        admin.request(
+            'GET /api/estudiantes?cursor', 'GET',
+            f"/api/estudiantes?search={term}&per_page=20&count=none&cursor={urllib.parse.quote(next_cursor)}"
+        )
+
+
+def scenario_reports(ctx, rng):
+    admin = ctx['admin']
+    group_id = rng.choice(ctx['report_groups'])
+    admin.request('GET /api/asistencia/reporte/<id>', 'GET', f"/api/asistencia/reporte/{group_id}")
+    admin.request(
+        'GET /api/calificaciones/reporte/<id>', 'GET',
+        f"/api/calificaciones/reporte/{group_id}?period={rng.randint(1, ctx['periods'])}"
+    )
+
+
+SCENARIOS = {
+    'gradebook': scenario_gradebook,
+    'attendance': scenario_attendance,
+    'search': scenario_search,
+    'reports': scenario_reports,
+}
+
+
+def parse_mix(value):
+    """Convierte "gradebook=35,search=25" en un diccionario de pesos"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Escenario desconocido: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _virtual_user(ctx, mix, deadline, seed):
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.monotonic() < deadline:
+        SCENARIOS[rng.choices(names, weights)[0]](ctx, rng)
+
+
+def run_suite(base_url, mix=None, concurrency=16, duration=60.0, warmup=5.0, teachers=20, periods=3,
+              password='123456', attendance_date=None, seed=1):
+    """Ejecuta la suite y devuelve el resumen por endpoint"""
+    mix = mix or DEFAULT_MIX
+
+    def make_ctx(result):
+        return {
+            'admin': Session(base_url, admin_token, result),
+            'teachers': [Session(base_url, token, result) for token in teacher_tokens],
+            'periods': periods,
+            'attendance_date': attendance_date or date.today().isoformat(),
+            'report_groups': report_groups,
+        }
+
+    admin_token = login(base_url, f"admin@{EMAIL_DOMAIN}", password)
+    teacher_tokens = [login(base_url, f"profesor{n}@{EMAIL_DOMAIN}", password) for n in range(1, teachers + 1)]
+
+    # Grupos con profesor asignado para los reportes
+    setup = Session(base_url, admin_token, SuiteResult())
+    report_groups = []
+    for token in teacher_tokens:
+        setup.token = token
+        report_groups.extend(_teacher_groups(setup))
+    if not report_groups:
+        raise RuntimeError("Los profesores de prueba no tienen grupos; cargue la base con benchmarks.dataset")
+
+    def run_phase(seconds, result):
+        ctx = make_ctx(result)
+        deadline = time.monotonic() + seconds
+        threads = [
+            threading.Thread(target=_virtual_user, args=(ctx, mix, deadline, seed + n), daemon=True)
+            for n in range(concurrency)
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.monotonic() - start
+
+    if warmup > 0:
+        run_phase(warmup, SuiteResult())
+
+    result = SuiteResult()
+    elapsed = run_phase(duration, result)
+    summary = result.summary(elapsed)
+    summary['params'] = {
+        'mix': mix, 'concurrency': concurrency, 'duration': duration, 'teachers': teachers, 'seed': seed,
+    }
+    return summary
+
+
+def compare_with_baseline(summary, baseline, latency_tolerance=DEFAULT_LATENCY_TOLERANCE,
+                          throughput_tolerance=DEFAULT_THROUGHPUT_TOLERANCE):
+    """Devuelve la lista de regresiones respecto a la línea base (vacía si no hay)"""
+    regressions = []
+
+    for endpoint, current in summary['endpoints'].items():
+        previous = baseline['endpoints'].get(endpoint)
+        if not previous:
+            continue
+        for key in ('p95_ms', 'p99_ms'):
+            limit = previous[key] * (1 + latency_tolerance)
+            if current[key] > limit and current[key] - previous[key] > MIN_LATENCY_DELTA_MS:
+                regressions.append(f"{endpoint}: {key} {previous[key]} -> {current[key]}")
+        if current['requests'] and previous['requests']:
+            if current['errors'] / current['requests'] > previous['errors'] / previous['requests'] + 0.01:
+                regressions.append(f"{endpoint}: errores {previous['errors']} -> {current['errors']}")
+
+    previous_rps = baseline['overall']['rps']
+    if summary['overall']['rps'] < previous_rps * (1 - throughput_tolerance):
+        regressions.append(f"throughput: {previous_rps} -> {summary['overall']['rps']} req/s")
+    return regressions
+
+
+def baseline_path(name):
+    return os.path.join(BASELINES_DIR, f"{name}.json")
+
+
+def format_table(summary):
+    rows = [('endpoint', 'req', 'err', 'req/s', 'p50', 'p95', 'p99')]
+    for endpoint, stats in list(summary['endpoints'].items()) + [('TOTAL', summary['overall'])]:
+        rows.append((endpoint, stats['requests'], stats['errors'], stats['rps'],
+                     stats['p50_ms'], stats['p95_ms'], stats['p99_ms']))
+    widths = [max(len(str(row[i])) for row in rows) for i in range(len(rows[0]))]
+    return '\n'.join(
+        '  '.join(str(value).ljust(widths[i]) if i == 0 else str(value).rjust(widths[i]) for i, value in enumerate(row))
+        for row in rows
+    )
+
+
+def boot_server(kind, port):
+    """Arranca la aplicación (gunicorn o el servidor de desarrollo) y espera a que acepte conexiones"""
+    env = dict(os.environ, FLASK_PORT=str(port))
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'wsgi:app']
+    else:
+        env['FLASK_HOST'] = '127.0.0.1'
+        command = [sys.executable, 'app.py']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El servidor terminó al arrancar (código {process.returncode})")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("El servidor no respondió en 60 segundos")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de latencia por endpoint")
+    parser.add_argument("--base-url", help="Servidor en marcha (por defecto http://127.0.0.1:<port>)")
+    parser.add_argument("--boot", choices=("gunicorn", "dev"), help="Arrancar la aplicación antes de la prueba")
+    parser.add_argument("--port", type=int, default=5400)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="Pesos, p. ej. gradebook=35,search=25")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--teachers", type=int, default=20, help="Profesores de prueba que inician sesión")
+    parser.add_argument("--periods", type=int, default=3)
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--attendance-date", help="Día para los escenarios de asistencia (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="Línea base contra la que comparar")
+    parser.add_argument("--save-baseline", help="Guardar el resultado como línea base con este nombre")
+    parser.add_argument("--latency-tolerance", type=float, default=DEFAULT_LATENCY_TOLERANCE)
+    parser.add_argument("--throughput-tolerance", type=float, default=DEFAULT_THROUGHPUT_TOLERANCE)
+    parser.add_argument("--json", action="store_true", help="Imprimir el resumen completo en JSON")
+    args = parser.parse_args()
+
+    base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    server = boot_server(args.boot, args.port) if args.boot else None
+    try:
+        summary = run_suite(
+            base_url, args.mix, args.concurrency, args.duration, args.warmup, args.teachers, args.periods,
+            args.password, args.attendance_date, args.seed,
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False) if args.json else format_table(summary))
+
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        with open(baseline_path(args.save_baseline), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"Línea base guardada en {baseline_path(args.save_baseline)}")
+
+    if args.baseline:
+        with open(baseline_path(args.baseline), encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(summary, baseline, args.latency_tolerance, args.throughput_tolerance)
+        if regressions:
+            print("Regresiones respecto a la línea base:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"Sin regresiones respecto a la línea base {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
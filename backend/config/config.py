@@ -1,12 +1,13 @@
 from dotenv import load_dotenv
 import os
+import tempfile
 from datetime import timedelta
 
 load_dotenv()
 
 class Config:
     # Configuración general
-    DEBUG = os.getenv("FLASK_DEBUG", "True") == "True"
+    DEBUG = os.getenv("FLASK_DEBUG", "False") == "True"
     HOST = os.getenv("FLASK_HOST", "0.0.0.0")
     PORT = int(os.getenv("FLASK_PORT", "5328"))
     
@@ -21,6 +22,7 @@ class Config:
     JWT_COOKIE_SECURE = False  # Cambia a True en producción con HTTPS
     JWT_COOKIE_SAMESITE = "Lax"
     JWT_COOKIE_CSRF_PROTECT = True
+    ADMIN_ROLES = os.getenv("ADMIN_ROLES", "1")  # Ids de roles de administrador (usuarios.rol), separados por comas
     
     # Configuración de CORS
     CORS_ORIGIN = os.getenv("CORS_ORIGIN", "http://localhost:3001")
@@ -32,4 +34,67 @@ class Config:
         "dbname": os.getenv("DB_NAME"),
         "user": os.getenv("DB_USER"),
         "password": os.getenv("DB_PASSWORD"),
-    }
\ No newline at end of file
+    }
+    
+    # Configuración del pool de conexiones
+    DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+    DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))                      # Segundos de espera por una conexión libre
+    DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))          # Segundos antes de reciclar una conexión
+    DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))  # Inactividad antes de verificar con SELECT 1
+    
+    # Configuración de cachés en memoria
+    ROSTER_CACHE_TTL = float(os.getenv("ROSTER_CACHE_TTL", "300"))  # Segundos que se conserva el roster de un grupo
+    ROSTER_CACHE_SIZE = int(os.getenv("ROSTER_CACHE_SIZE", "2048"))  # Máximo de grupos en caché
+    GRADES_CACHE_TTL = float(os.getenv("GRADES_CACHE_TTL", "120"))   # Segundos que se conserva una lista de calificaciones
+    GRADES_CACHE_SIZE = int(os.getenv("GRADES_CACHE_SIZE", "512"))   # Máximo de combinaciones grupo/periodo en caché
+    ATTENDANCE_CACHE_TTL = float(os.getenv("ATTENDANCE_CACHE_TTL", "60"))  # Segundos que se conserva la asistencia de un grupo y día
+    ATTENDANCE_CACHE_SIZE = int(os.getenv("ATTENDANCE_CACHE_SIZE", "512"))  # Máximo de combinaciones grupo/día en caché
+    COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))      # Segundos que se conserva el total de un listado
+    COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "256"))     # Máximo de búsquedas con total en caché
+    
+    # Particiones mensuales de attendance
+    ATTENDANCE_PARTITIONS_AHEAD = int(os.getenv("ATTENDANCE_PARTITIONS_AHEAD", "3"))    # Meses futuros con partición creada
+    ATTENDANCE_RETENTION_MONTHS = int(os.getenv("ATTENDANCE_RETENTION_MONTHS", "0"))    # Meses antes de separar una partición (0 = nunca)
+    
+    # Instrumentación de SQL por petición (encabezado Server-Timing y detección de N+1)
+    SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "True") == "True"
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))  # Repeticiones de una sentencia antes de advertir
+    
+    # Logging (utils/log.py)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG else "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")                                   # json o text
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))      # Fracción de peticiones con volcados de depuración
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))                     # Registros en espera antes de descartar
+    
+    # Métricas Prometheus (/metrics)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")                                       # Si se define, /metrics exige "Authorization: Bearer <token>"
+    METRICS_REFRESH_INTERVAL = float(os.getenv("METRICS_REFRESH_INTERVAL", "5"))     # Segundos entre actualizaciones de métricas de caché y pool
+    
+    # Perfilado bajo demanda (encabezado X-Profile: stacks | pstats)
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "True") == "True"
+    PROFILING_ADMIN_ROLES = os.getenv("PROFILING_ADMIN_ROLES", ADMIN_ROLES)         # Ids de roles autorizados, separados por comas
+    PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "copadb-profiles"))
+    PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "100"))               # Perfiles conservados por directorio
+    PROFILING_SAMPLE_INTERVAL = float(os.getenv("PROFILING_SAMPLE_INTERVAL", "0.005"))  # Segundos entre muestras en modo stacks
+    
+    # Reportes en segundo plano (?async=1)
+    REPORT_JOBS_DIR = os.getenv("REPORT_JOBS_DIR", os.path.join(tempfile.gettempdir(), "copadb-reports"))  # Compartido por los procesos del servidor
+    REPORT_JOBS_WORKERS = int(os.getenv("REPORT_JOBS_WORKERS", "2"))               # Hilos de reportes por proceso
+    REPORT_JOBS_MAX_CONCURRENT = int(os.getenv("REPORT_JOBS_MAX_CONCURRENT", "2")) # Reportes simultáneos entre todos los procesos
+    REPORT_JOBS_MAX_QUEUED = int(os.getenv("REPORT_JOBS_MAX_QUEUED", "20"))        # Trabajos sin terminar por proceso antes de responder 503
+    REPORT_JOBS_TTL = int(os.getenv("REPORT_JOBS_TTL", "3600"))                    # Segundos que se conserva cada archivo generado
+    REPORT_BUNDLE_WORKERS = int(os.getenv("REPORT_BUNDLE_WORKERS", "4"))           # Hilos por paquete ZIP (a lo sumo DB_POOL_MAX - 2)
+    REPORT_BUNDLE_MAX_CONCURRENT = int(os.getenv("REPORT_BUNDLE_MAX_CONCURRENT", "1"))  # Paquetes simultáneos por proceso antes de responder 503
+    
+    # Servidor de producción (gunicorn.conf.py)
+    GUNICORN_WORKERS = int(os.getenv("GUNICORN_WORKERS", str(min((os.cpu_count() or 1) * 2 + 1, 8))))  # Procesos (cada uno con su pool de hasta DB_POOL_MAX conexiones)
+    GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "4"))                # Hilos por proceso (no mayor que DB_POOL_MAX)
+    GUNICORN_WORKER_CLASS = os.getenv("GUNICORN_WORKER_CLASS", "gthread")     # gthread o gevent (requiere psycogreen)
+    GUNICORN_PRELOAD = os.getenv("GUNICORN_PRELOAD", "True") == "True"        # Cargar la aplicación antes de crear los procesos
+    GUNICORN_TIMEOUT = int(os.getenv("GUNICORN_TIMEOUT", "60"))               # Segundos antes de reiniciar un proceso bloqueado
+    GUNICORN_GRACEFUL_TIMEOUT = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))  # Segundos para terminar peticiones en curso al recargar
+    GUNICORN_KEEPALIVE = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+    GUNICORN_MAX_REQUESTS = int(os.getenv("GUNICORN_MAX_REQUESTS", "5000"))   # Peticiones antes de reciclar un proceso (0 = nunca)
+    GUNICORN_MAX_REQUESTS_JITTER = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "500"))
@@ -0,0 +1,77 @@
+"""
+Configuración de gunicorn para producción, tomada de Config (variables GUNICORN_*).
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+- Con GUNICORN_PRELOAD=True la aplicación se carga una sola vez en el proceso
+  maestro (migración de particiones, registro de esquema) y los procesos de
+  trabajo se crean con fork. El pool de conexiones del maestro se cierra antes
+  de crear los procesos y cada proceso abre el suyo en post_fork.
+- Recarga sin cortar peticiones: `kill -HUP <pid del maestro>` reinicia los
+  procesos de trabajo esperando hasta GUNICORN_GRACEFUL_TIMEOUT segundos a las
+  peticiones en curso. Con preload el código se carga en el maestro, así que
+  para desplegar código nuevo hay que usar USR2 (nuevo maestro) seguido de
+  WINCH y QUIT al maestro anterior, o desactivar el preload.
+- Los cachés en memoria son de cada proceso. Los de calificaciones y asistencia
+  se validan contra cache_versions y son coherentes entre procesos; el de
+  estudiantes por grupo y el de totales pueden atrasarse hasta su TTL (ver README).
+"""
+import glob
+import os
+
+from config.config import Config
+from utils.db import close_db_pool, reset_db_pool_after_fork
+
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = Config.GUNICORN_WORKERS
+threads = Config.GUNICORN_THREADS
+worker_class = Config.GUNICORN_WORKER_CLASS
+preload_app = Config.GUNICORN_PRELOAD
+timeout = Config.GUNICORN_TIMEOUT
+graceful_timeout = Config.GUNICORN_GRACEFUL_TIMEOUT
+keepalive = Config.GUNICORN_KEEPALIVE
+max_requests = Config.GUNICORN_MAX_REQUESTS
+max_requests_jitter = Config.GUNICORN_MAX_REQUESTS_JITTER
+
+accesslog = "-"
+errorlog = "-"
+# Incluye el X-Request-ID de la respuesta para relacionar el acceso con los registros de la aplicación
+access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(M)sms request_id=%({x-request-id}o)s'
+
+
+def on_starting(server):
+    # Las métricas de ejecuciones anteriores no deben mezclarse con las nuevas
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(multiproc_dir, "*.db")):
+            os.remove(path)
+
+
+def when_ready(server):
+    # Con preload el maestro abrió conexiones al crear la aplicación; cerrarlas
+    # antes de crear procesos evita que los hijos hereden sockets compartidos
+    close_db_pool()
+    server.log.info(
+        "Servidor listo: %d procesos x %d hilos (%s), preload=%s",
+        workers, threads, worker_class, preload_app
+    )
+
+
+def post_fork(server, worker):
+    if worker_class == "gevent":
+        # psycopg2 bloquea el hilo completo; psycogreen lo hace cooperativo con gevent
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    # Sin preload cada proceso carga la aplicación después del fork y crea su propio pool
+    if preload_app:
+        from wsgi import app
+        reset_db_pool_after_fork(app)
+        server.log.info("Pool de conexiones reiniciado en el proceso %s", worker.pid)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,92 @@
+-- Esquema base de la aplicación, derivado de las columnas que usan las rutas
+-- Usa IF NOT EXISTS para no modificar bases de datos ya existentes
+
+CREATE TABLE IF NOT EXISTS roles (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    lastname_f TEXT,
+    lastname_m TEXT,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    rol INT REFERENCES roles(id) ON DELETE SET NULL,
+    profesor_type TEXT DEFAULT 'titular'
+);
+
+CREATE TABLE IF NOT EXISTS family (
+    id SERIAL PRIMARY KEY,
+    tutor_name TEXT NOT NULL,
+    tutor_lastname_f TEXT NOT NULL,
+    tutor_lastname_m TEXT NOT NULL,
+    phone_number VARCHAR(50) NOT NULL,
+    email_address TEXT UNIQUE NOT NULL,
+    emergency_phone_number VARCHAR(50) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS student (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    lastname_f TEXT NOT NULL,
+    lastname_m TEXT NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    blood_type VARCHAR(5),
+    allergies TEXT,
+    scholar_ship BOOLEAN DEFAULT FALSE,
+    chapel VARCHAR(100),
+    school_campus TEXT,
+    family_id INT REFERENCES family(id) ON DELETE SET NULL,
+    permission TEXT,
+    reg_date DATE NOT NULL DEFAULT CURRENT_DATE,
+    birth_date DATE,
+    curp TEXT,
+    sep_register TEXT,
+    cpdb_register TEXT,
+    gender TEXT,
+    group_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS class (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS "group" (
+    id SERIAL PRIMARY KEY,
+    grade VARCHAR(50) NOT NULL,
+    class_id INT NOT NULL REFERENCES class(id) ON DELETE CASCADE,
+    professor_id INT REFERENCES usuarios(id) ON DELETE SET NULL
+);
+
+CREATE TABLE IF NOT EXISTS history (
+    id SERIAL PRIMARY KEY,
+    student_id INT NOT NULL REFERENCES student(id) ON DELETE CASCADE,
+    group_id INT NOT NULL REFERENCES "group"(id) ON DELETE CASCADE,
+    status VARCHAR(50) NOT NULL
+);
+
+-- grade_id guarda el id del grupo
+CREATE TABLE IF NOT EXISTS notes (
+    id SERIAL PRIMARY KEY,
+    student_id INT NOT NULL REFERENCES student(id) ON DELETE CASCADE,
+    grade_id INT NOT NULL,
+    class_participation DECIMAL(5,2),
+    exercises DECIMAL(5,2),
+    homework DECIMAL(5,2),
+    exams DECIMAL(5,2),
+    church_class DECIMAL(5,2),
+    finall DECIMAL(5,2),
+    period INT NOT NULL DEFAULT 1
+);
+
+-- grade_id guarda el id del grupo; status indica si el estudiante estuvo presente
+CREATE TABLE IF NOT EXISTS attendance (
+    id SERIAL PRIMARY KEY,
+    student_id INT NOT NULL REFERENCES student(id) ON DELETE CASCADE,
+    status BOOLEAN NOT NULL DEFAULT FALSE,
+    fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    grade_id INT NOT NULL
+);
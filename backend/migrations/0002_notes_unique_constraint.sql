@@ -0,0 +1,21 @@
+-- Restricción única para el upsert de calificaciones (/api/calificaciones/guardar)
+-- Una fila de notes por estudiante, grupo y periodo
+
+-- Eliminar duplicados existentes conservando el registro más reciente
+DELETE FROM notes n
+USING notes newer
+WHERE n.student_id = newer.student_id
+  AND n.grade_id = newer.grade_id
+  AND n.period = newer.period
+  AND n.id < newer.id;
+
+-- Crear la restricción única si no existe
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'notes_student_grade_period_key'
+    ) THEN
+        ALTER TABLE notes
+            ADD CONSTRAINT notes_student_grade_period_key UNIQUE (student_id, grade_id, period);
+    END IF;
+END $$;
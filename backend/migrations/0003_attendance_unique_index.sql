@@ -0,0 +1,18 @@
+-- Índice único para el upsert de asistencia (/api/asistencia/guardar)
+-- Una fila de attendance por estudiante, grupo y día; fecha se guarda a medianoche
+
+-- Eliminar duplicados del mismo día conservando el registro más reciente
+DELETE FROM attendance a
+USING attendance newer
+WHERE a.student_id = newer.student_id
+  AND a.grade_id = newer.grade_id
+  AND a.fecha::date = newer.fecha::date
+  AND a.id < newer.id;
+
+-- Normalizar fecha al inicio del día
+UPDATE attendance
+SET fecha = date_trunc('day', fecha)
+WHERE fecha <> date_trunc('day', fecha);
+
+CREATE UNIQUE INDEX IF NOT EXISTS attendance_student_grade_fecha_key
+    ON attendance (student_id, grade_id, fecha);
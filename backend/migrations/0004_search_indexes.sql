@@ -0,0 +1,21 @@
+-- migrate: no-transaction
+-- Búsqueda por trigramas sin acentos para /api/estudiantes, /api/tutores y /api/usuarios
+-- Las expresiones indexadas deben coincidir con utils/search.py (search_document)
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() no es IMMUTABLE y no puede usarse en índices; esta envoltura fija el diccionario
+CREATE OR REPLACE FUNCTION immutable_unaccent(text)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS student_search_trgm_idx ON student
+    USING gin (immutable_unaccent(lower(coalesce(name, '') || ' ' || coalesce(lastname_f, '') || ' ' || coalesce(lastname_m, '') || ' ' || coalesce(email, ''))) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS family_search_trgm_idx ON family
+    USING gin (immutable_unaccent(lower(coalesce(tutor_name, '') || ' ' || coalesce(tutor_lastname_f, '') || ' ' || coalesce(tutor_lastname_m, '') || ' ' || coalesce(email_address, ''))) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS usuarios_search_trgm_idx ON usuarios
+    USING gin (immutable_unaccent(lower(coalesce(name, '') || ' ' || coalesce(lastname_f, '') || ' ' || coalesce(lastname_m, '') || ' ' || coalesce(email, ''))) gin_trgm_ops);
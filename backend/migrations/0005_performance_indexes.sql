@@ -0,0 +1,18 @@
+-- migrate: no-transaction
+-- Índices para los accesos más frecuentes de las rutas
+-- notes(student_id, grade_id, period) ya está cubierto por la restricción única de 0002
+
+-- Roster de un grupo: history WHERE group_id = ? AND status = 'activo'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS history_group_status_idx ON history (group_id, status);
+
+-- Grupos de un estudiante: history WHERE student_id = ANY(?) AND status = 'activo'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS history_student_status_idx ON history (student_id, status);
+
+-- Calificaciones de un grupo por periodo (reportes)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS notes_grade_period_idx ON notes (grade_id, period);
+
+-- Asistencia de un grupo por día o rango de fechas (fecha se guarda a medianoche)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS attendance_grade_fecha_idx ON attendance (grade_id, fecha);
+
+-- Materias de un profesor
+CREATE INDEX CONCURRENTLY IF NOT EXISTS group_professor_id_idx ON "group" (professor_id);
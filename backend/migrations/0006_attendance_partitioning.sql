@@ -0,0 +1,121 @@
+-- Particionamiento mensual de attendance por fecha
+-- Cada mes vive en su propia partición (attendance_yYYYYmMM), de modo que las consultas de un día
+-- o de un rango (fecha >= ? AND fecha < ?) solo leen las particiones que lo cubren.
+-- Las particiones futuras se crean con ensure_attendance_partitions (al iniciar la aplicación y con
+-- `flask db partitions`) y las antiguas se separan con detach_attendance_partitions.
+
+-- Conservar la tabla actual para copiar sus datos
+ALTER TABLE attendance RENAME TO attendance_legacy;
+ALTER INDEX IF EXISTS attendance_pkey RENAME TO attendance_legacy_pkey;
+ALTER INDEX IF EXISTS attendance_student_grade_fecha_key RENAME TO attendance_legacy_student_grade_fecha_key;
+ALTER INDEX IF EXISTS attendance_grade_fecha_idx RENAME TO attendance_legacy_grade_fecha_idx;
+ALTER SEQUENCE attendance_id_seq OWNED BY NONE;
+
+-- La clave primaria y los índices únicos de una tabla particionada deben incluir la columna de partición
+CREATE TABLE attendance (
+    id INT NOT NULL DEFAULT nextval('attendance_id_seq'),
+    student_id INT NOT NULL REFERENCES student(id) ON DELETE CASCADE,
+    status BOOLEAN NOT NULL DEFAULT FALSE,
+    fecha TIMESTAMP NOT NULL DEFAULT date_trunc('day', LOCALTIMESTAMP),
+    grade_id INT NOT NULL,
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+
+ALTER SEQUENCE attendance_id_seq OWNED BY attendance.id;
+
+CREATE UNIQUE INDEX attendance_student_grade_fecha_key ON attendance (student_id, grade_id, fecha);
+CREATE INDEX attendance_grade_fecha_idx ON attendance (grade_id, fecha);
+
+-- Nombre de la partición mensual que contiene un día
+CREATE OR REPLACE FUNCTION attendance_partition_name(day date)
+RETURNS text
+LANGUAGE sql IMMUTABLE STRICT
+AS $$ SELECT to_char(date_trunc('month', day::timestamp), '"attendance_y"YYYY"m"MM') $$;
+
+-- Crea la partición del mes de `day` si no existe; devuelve true si la creó
+CREATE OR REPLACE FUNCTION ensure_attendance_partition(day date)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start date := date_trunc('month', day::timestamp)::date;
+    partition_name text := attendance_partition_name(day);
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    -- Serializar la creación entre procesos que arrancan al mismo tiempo
+    PERFORM pg_advisory_xact_lock(hashtext('attendance_partitions'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN false;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF attendance FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, (month_start + interval '1 month')::date
+    );
+    RETURN true;
+END
+$$;
+
+-- Crea las particiones de todos los meses entre first_day y last_day; devuelve cuántas creó
+CREATE OR REPLACE FUNCTION ensure_attendance_partitions(first_day date, last_day date)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start date := date_trunc('month', first_day::timestamp)::date;
+    created integer := 0;
+BEGIN
+    WHILE month_start <= last_day LOOP
+        IF ensure_attendance_partition(month_start) THEN
+            created := created + 1;
+        END IF;
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END
+$$;
+
+-- Separa las particiones que terminan antes de `before` y las renombra a attendance_archive_yYYYYmMM.
+-- Las tablas separadas se conservan; pueden respaldarse y eliminarse manualmente.
+CREATE OR REPLACE FUNCTION detach_attendance_partitions(before date)
+RETURNS SETOF text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    partition_name text;
+    archive_name text;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('attendance_partitions'));
+    FOR partition_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'attendance'::regclass
+          AND c.relname ~ '^attendance_y[0-9]{4}m[0-9]{2}$'
+          AND to_date(substr(c.relname, 13), 'YYYY"m"MM') + interval '1 month' <= before
+        ORDER BY c.relname
+    LOOP
+        archive_name := replace(partition_name, 'attendance_', 'attendance_archive_');
+        EXECUTE format('ALTER TABLE attendance DETACH PARTITION %I', partition_name);
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', partition_name, archive_name);
+        RETURN NEXT archive_name;
+    END LOOP;
+END
+$$;
+
+-- Crear las particiones que cubren los datos existentes y los próximos meses, y copiar los datos
+SELECT ensure_attendance_partitions(
+    COALESCE((SELECT min(fecha)::date FROM attendance_legacy), current_date),
+    GREATEST((SELECT max(fecha)::date FROM attendance_legacy), (current_date + interval '3 months')::date)
+);
+
+INSERT INTO attendance (id, student_id, status, fecha, grade_id)
+SELECT id, student_id, status, fecha, grade_id
+FROM attendance_legacy;
+
+DROP TABLE attendance_legacy;
+
+ANALYZE attendance;
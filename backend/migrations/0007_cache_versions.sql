@@ -0,0 +1,10 @@
+-- Versiones de los cachés en memoria (utils/cache_versions.py)
+-- Las escrituras incrementan la versión de (ámbito, llave) en su misma transacción y las lecturas
+-- solo sirven una entrada del caché construida con la versión actual, de modo que una escritura
+-- atendida por cualquier proceso de gunicorn invalida el caché de todos.
+CREATE TABLE IF NOT EXISTS cache_versions (
+    scope TEXT NOT NULL,
+    key BIGINT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, key)
+);
@@ -4,6 +4,7 @@ from routes.student_routes import student_bp
 from routes.user_routes import user_bp
 from routes.attendance_routes import attendance_bp
 from routes.grades_routes import grades_bp
+from routes.report_routes import report_bp
 
 def register_blueprints(app):
     """
@@ -17,4 +18,5 @@ def register_blueprints(app):
     app.register_blueprint(student_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(attendance_bp)
-    app.register_blueprint(grades_bp)
\ No newline at end of file
+    app.register_blueprint(grades_bp)
+    app.register_blueprint(report_bp)
\ No newline at end of file
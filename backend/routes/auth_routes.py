@@ -2,16 +2,13 @@ from flask import Blueprint, request, jsonify, make_response
 from flask_jwt_extended import (
     create_access_token, create_refresh_token, decode_token, jwt_required, get_jwt_identity, set_refresh_cookies, unset_jwt_cookies
 )
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from config.config import Config
+from utils.db import get_db_connection
+from utils.log import get_logger
 from extensions import bcrypt
 from datetime import timedelta
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api')
-
-def get_db_connection():
-    return psycopg2.connect(**Config.DB_CONFIG, cursor_factory=RealDictCursor)
+logger = get_logger(__name__)
 
 @auth_bp.route('/login', methods=['POST', 'OPTIONS'])
 def login():
@@ -35,7 +32,7 @@ def login():
         conn = get_db_connection()
         cur = conn.cursor()
 
-        cur.execute("SELECT id, name, email, password FROM usuarios WHERE email = %s", (email,))
+        cur.execute("SELECT id, name, email, password, rol FROM usuarios WHERE email = %s", (email,))
         user = cur.fetchone()
 
         cur.close()
@@ -43,7 +40,7 @@ def login():
 
         if user and bcrypt.check_password_hash(user["password"], password):
             user_id_str = str(user["id"])
-            access_token = create_access_token(identity=user_id_str)
+            access_token = create_access_token(identity=user_id_str, additional_claims={"rol": user["rol"]})
             refresh_token = create_refresh_token(identity=user_id_str)
 
             resp = jsonify({
@@ -99,8 +96,7 @@ def get_profile():
         }), 200
             
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener perfil")
         return jsonify({"message": "Error al obtener perfil", "error": str(e)}), 500
 
 @auth_bp.route('/user/profile', methods=['GET', 'OPTIONS'])
@@ -146,8 +142,7 @@ def get_user_profile():
         }), 200
             
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener perfil")
         return jsonify({"message": "Error al obtener perfil", "error": str(e)}), 500
 
 @auth_bp.route('/change-password', methods=['POST'])
@@ -1,16 +1,46 @@
-from flask import Blueprint, jsonify, request, make_response, Response
+from flask import Blueprint, jsonify, request, make_response
 from functools import wraps
 from utils.db import get_db_connection
-import traceback
+from utils.auth import admin_required
+from utils.cache import TTLCache
+from utils.cache_versions import VersionedCache
+from utils.roster import get_group_roster
+from utils.log import get_logger, log_payload
+from utils.reports import ReportNotFound, ReportOutput, iter_cursor_rows, stream_report
+from utils.report_jobs import enqueue_report, register_report_job, wants_async
 from datetime import datetime
-import time
 import psycopg2.extras
-import csv
-import io
+from config.config import Config
 
-# Sistema de caché simple para reducir consultas repetidas
-grades_cache = {}
-CACHE_EXPIRY = 60  # Tiempo de expiración del caché en segundos
+# Caché LRU con expiración de las calificaciones por (grupo, periodo), la vista anual y las
+# estadísticas; cada entrada se valida contra la versión del grupo en cache_versions
+grades_cache = TTLCache(maxsize=Config.GRADES_CACHE_SIZE, ttl=Config.GRADES_CACHE_TTL, name='grades')
+grades_versions = VersionedCache(grades_cache, 'grades')
+
+# Componentes de la calificación y su ponderación en la calificación final
+GRADE_COMPONENTS = ('class_participation', 'exercises', 'homework', 'exams', 'church_class')
+GRADE_WEIGHTS = {
+    'class_participation': 0.15,  # 15%
+    'exercises': 0.15,            # 15%
+    'homework': 0.25,             # 25%
+    'exams': 0.35,                # 35%
+    'church_class': 0.10          # 10%
+}
+
+# Estadísticas de calificaciones: percentiles y cubetas del histograma sobre la escala 0-10
+STATS_PERCENTILES = (10, 25, 50, 75, 90)
+STATS_HISTOGRAM_BINS = 10
+GRADE_SCALE_MAX = 10
+
+def calculate_final_grade(class_participation, exercises, homework, exams, church_class):
+    """Calcula la calificación final según las ponderaciones de cada componente"""
+    return (
+        class_participation * GRADE_WEIGHTS['class_participation'] +
+        exercises * GRADE_WEIGHTS['exercises'] +
+        homework * GRADE_WEIGHTS['homework'] +
+        exams * GRADE_WEIGHTS['exams'] +
+        church_class * GRADE_WEIGHTS['church_class']
+    )
 
 # Definir el decorador CORS localmente
 def cors_decorator(f):
@@ -40,157 +70,376 @@ def cors_decorator(f):
     return decorated_function
 
 grades_bp = Blueprint('grades', __name__, url_prefix='/api')
+logger = get_logger(__name__)
 
 @grades_bp.route('/calificaciones/grupo/<int:group_id>', methods=['GET', 'OPTIONS'])
 @cors_decorator
 def get_grades_by_group(group_id):
-    """Endpoint para obtener las calificaciones de los estudiantes de un grupo"""
+    """
+    Endpoint para obtener las calificaciones de los estudiantes de un grupo.
+
+    La respuesta se guarda en caché por (grupo, periodo) y se invalida en
+    todos los procesos al guardar calificaciones del grupo (cache_versions),
+    o cuando cambia el roster del grupo.
+    """
     if request.method == 'OPTIONS':
         return make_response()
     
     try:
-        print(f"Recibida solicitud para obtener calificaciones del grupo {group_id}")
+        # Obtener el periodo del query string (por defecto 1)
+        period = request.args.get('period', '1')
+        try:
+            period = int(period)
+        except ValueError:
+            period = 1
+        
+        logger.debug("Calificaciones solicitadas: grupo %s, periodo %s", group_id, period)
         
-        # Temporalmente desactivamos el caché para depurar
-        cache_key = f"grades_{group_id}"
-        if cache_key in grades_cache:
-            print(f"Invalidando caché existente para grupo {group_id}")
-            del grades_cache[cache_key]
+        # Obtener los estudiantes activos del grupo (desde el caché de rosters si está disponible)
+        roster = get_group_roster(group_id)
+        students = roster.students if roster else []
         
-        # Si no hay datos en caché o han expirado, consultar la base de datos
-        print(f"Ejecutando consulta SQL para el grupo {group_id}")
+        if not students:
+            logger.info("No se encontraron estudiantes activos en el grupo %s", group_id)
+            return jsonify({
+                'message': 'No se encontraron estudiantes en este grupo',
+                'grades': [],
+                'group_id': group_id
+            }), 200
         
+        cache_key = (group_id, period)
         with get_db_connection() as conn:
-            # Usar un cursor que devuelva diccionarios desde el principio
             with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                # Primero, verificar si hay registros en la tabla history para este grupo
-                cur.execute("""
-                    SELECT student_id, status FROM history WHERE group_id = %s AND status = 'activo'
-                """, (group_id,))
-                
-                history_records = cur.fetchall()
-                print(f"Registros en history para el grupo {group_id}: {history_records}")
-                
-                if not history_records:
-                    print(f"No se encontraron estudiantes activos en el grupo {group_id}")
-                    return jsonify({
-                        'message': 'No se encontraron estudiantes en este grupo',
-                        'grades': [],
-                        'group_id': group_id
-                    }), 200
-                
-                # Obtener todos los estudiantes del grupo usando la tabla history
-                cur.execute("""
-                    SELECT s.id, s.name || ' ' || s.lastname_f || ' ' || s.lastname_m as full_name, 
-                           h.group_id, g.grade as group_grade, c.name as class_name
-                    FROM student s
-                    JOIN history h ON s.id = h.student_id
-                    JOIN "group" g ON h.group_id = g.id
-                    JOIN class c ON g.class_id = c.id
-                    WHERE h.group_id = %s AND h.status = 'activo'
-                """, (group_id,))
-                
-                students = cur.fetchall()
-                print(f"Consulta SQL ejecutada correctamente")
-                print(f"Se encontraron {len(students)} estudiantes")
+                # Usar el caché solo si se construyó con el mismo roster y la versión actual del grupo
+                version = grades_versions.version(cur, group_id)
+                cached = grades_versions.get(cache_key, version)
+                if cached and cached['roster'] is roster:
+                    return jsonify(cached['data']), 200
                 
                 # Buscar registros de calificaciones para todos los estudiantes del grupo
-                student_ids = [student['id'] for student in students]
-                grades_records = {}
-                
-                if student_ids:
-                    placeholders = ', '.join(['%s'] * len(student_ids))
-                    # Obtener el periodo del query string (por defecto 1)
-                    period = request.args.get('period', '1')
-                    try:
-                        period = int(period)
-                    except ValueError:
-                        period = 1
-                    
-                    print(f"Obteniendo calificaciones para el periodo {period}")
-                    
-                    query = f"""
-                        SELECT id, student_id, grade_id, class_participation, exercises, 
-                               homework, exams, church_class, finall, period
-                        FROM notes 
-                        WHERE student_id IN ({placeholders}) AND grade_id = %s AND period = %s
-                    """
-                    
-                    params = student_ids + [group_id, period]
-                    print(f"Ejecutando consulta de calificaciones: {query} con parámetros {params}")
-                    
-                    try:
-                        cur.execute(query, params)
-                        for record in cur.fetchall():
-                            student_id = record['student_id']
-                            grades_records[student_id] = {
-                                'id': record['id'],
-                                'class_participation': record['class_participation'],
-                                'exercises': record['exercises'],
-                                'homework': record['homework'],
-                                'exams': record['exams'],
-                                'church_class': record['church_class'],
-                                'finall': record['finall'],
-                                'period': record['period']
-                            }
-                        
-                        print(f"Registros de calificaciones encontrados: {len(grades_records)}")
-                    except Exception as e:
-                        print(f"Error al obtener registros de calificaciones: {e}")
-                
-                # Preparar la respuesta
-                grades_list = []
-                
-                for student in students:
-                    student_id = student['id']
-                    student_name = student['full_name']
-                    student_group_id = student['group_id']
-                    group_grade = student['group_grade']
-                    class_name = student['class_name']
-                    
-                    # Verificar si hay un registro de calificaciones para este estudiante
-                    grade_record = grades_records.get(student_id, {})
-                    grade_id = grade_record.get('id', 0)
-                    
-                    # Agregar a la lista de calificaciones
-                    grades_list.append({
-                        'id': grade_id,
-                        'student_id': student_id,
-                        'student_name': student_name,
-                        'group_id': student_group_id,
-                        'class_participation': grade_record.get('class_participation', 0),
-                        'exercises': grade_record.get('exercises', 0),
-                        'homework': grade_record.get('homework', 0),
-                        'exams': grade_record.get('exams', 0),
-                        'church_class': grade_record.get('church_class', 0),
-                        'finall': grade_record.get('finall', 0),
-                        'period': grade_record.get('period', period)
-                    })
+                cur.execute("""
+                    SELECT id, student_id, grade_id, class_participation, exercises, 
+                           homework, exams, church_class, finall, period
+                    FROM notes 
+                    WHERE student_id = ANY(%s) AND grade_id = %s AND period = %s
+                """, (roster.student_ids, group_id, period))
                 
-                response_data = {
-                    'message': 'Calificaciones obtenidas correctamente',
-                    'grades': grades_list,
-                    'group_id': group_id,
-                    'period': period
-                }
+                grades_records = {record['student_id']: record for record in cur.fetchall()}
+        
+        logger.debug("Grupo %s: %d registros de calificaciones", group_id, len(grades_records))
+        
+        # Preparar la respuesta
+        grades_list = []
+        
+        for student in students:
+            student_id = student['id']
+            
+            # Verificar si hay un registro de calificaciones para este estudiante
+            grade_record = grades_records.get(student_id, {})
+            
+            grades_list.append({
+                'id': grade_record.get('id', 0),
+                'student_id': student_id,
+                'student_name': student['full_name'],
+                'group_id': student['group_id'],
+                'class_participation': grade_record.get('class_participation', 0),
+                'exercises': grade_record.get('exercises', 0),
+                'homework': grade_record.get('homework', 0),
+                'exams': grade_record.get('exams', 0),
+                'church_class': grade_record.get('church_class', 0),
+                'finall': grade_record.get('finall', 0),
+                'period': grade_record.get('period', period)
+            })
+        
+        response_data = {
+            'message': 'Calificaciones obtenidas correctamente',
+            'grades': grades_list,
+            'group_id': group_id,
+            'period': period
+        }
+        
+        # Guardar en caché
+        grades_versions.set(cache_key, group_id, version, {'roster': roster, 'data': response_data})
+        
+        log_payload(logger, "Respuesta de calificaciones", grades_list)
+        
+        return jsonify(response_data), 200
+    except Exception as e:
+        logger.exception("Error al obtener calificaciones")
+        return jsonify({"message": "Error al obtener calificaciones", "error": str(e)}), 500
+
+@grades_bp.route('/calificaciones/grupo/<int:group_id>/anual', methods=['GET', 'OPTIONS'])
+@cors_decorator
+def get_year_grades_by_group(group_id):
+    """
+    Endpoint con las calificaciones de todos los periodos de un grupo como matriz.
+
+    Cada estudiante trae sus calificaciones por periodo, su promedio anual y su
+    lugar en el grupo; el grupo trae el promedio, mínimo y máximo de cada
+    periodo y el promedio anual. Todo se calcula en una sola consulta con
+    agregados y funciones de ventana. La respuesta se guarda en caché por grupo
+    y se invalida al guardar calificaciones del grupo en cualquier periodo.
+    """
+    if request.method == 'OPTIONS':
+        return make_response()
+    
+    try:
+        # Obtener los estudiantes activos del grupo (desde el caché de rosters si está disponible)
+        roster = get_group_roster(group_id)
+        students = roster.students if roster else []
+        
+        if not students:
+            logger.info("No se encontraron estudiantes activos en el grupo %s", group_id)
+            return jsonify({
+                'message': 'No se encontraron estudiantes en este grupo',
+                'students': [],
+                'periods': [],
+                'group_id': group_id
+            }), 200
+        
+        cache_key = (group_id, 'anual')
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # Usar el caché solo si se construyó con el mismo roster y la versión actual del grupo
+                version = grades_versions.version(cur, group_id)
+                cached = grades_versions.get(cache_key, version)
+                if cached and cached['roster'] is roster:
+                    return jsonify(cached['data']), 200
                 
-                # Guardar en caché
-                grades_cache[cache_key] = {
-                    'data': response_data,
-                    'timestamp': time.time()
-                }
+                # Una fila por estudiante con calificaciones: sus periodos como objeto
+                # {periodo: calificaciones}, su promedio anual, su lugar y los
+                # promedios del grupo (iguales en todas las filas)
+                cur.execute("""
+                    WITH grades AS (
+                        SELECT student_id, period, id, class_participation, exercises,
+                               homework, exams, church_class, finall
+                        FROM notes
+                        WHERE grade_id = %(group_id)s AND student_id = ANY(%(student_ids)s)
+                    ), by_student AS (
+                        SELECT student_id,
+                               jsonb_object_agg(period::text, jsonb_build_object(
+                                   'id', id,
+                                   'class_participation', class_participation,
+                                   'exercises', exercises,
+                                   'homework', homework,
+                                   'exams', exams,
+                                   'church_class', church_class,
+                                   'finall', finall
+                               )) AS periods,
+                               avg(finall) AS annual_average
+                        FROM grades
+                        GROUP BY student_id
+                    ), by_period AS (
+                        SELECT jsonb_object_agg(period::text, jsonb_build_object(
+                                   'average', average, 'min', min_finall, 'max', max_finall, 'count', students
+                               ) ORDER BY period) AS stats
+                        FROM (
+                            SELECT period, round(avg(finall), 2) AS average, min(finall) AS min_finall,
+                                   max(finall) AS max_finall, count(*) AS students
+                            FROM grades
+                            GROUP BY period
+                        ) p
+                    )
+                    SELECT b.student_id, b.periods,
+                           round(b.annual_average, 2)::float AS annual_average,
+                           rank() OVER (ORDER BY b.annual_average DESC NULLS LAST) AS rank,
+                           round(avg(b.annual_average) OVER (), 2)::float AS group_annual_average,
+                           (SELECT stats FROM by_period) AS period_averages
+                    FROM by_student b
+                """, {'group_id': group_id, 'student_ids': roster.student_ids})
                 
-                print(f"Enviando respuesta con {len(grades_list)} estudiantes")
+                rows = {row['student_id']: row for row in cur.fetchall()}
+        
+        first = next(iter(rows.values()), None)
+        period_averages = first['period_averages'] if first else {}
+        
+        # Preparar la respuesta en el orden del roster; los estudiantes sin calificaciones quedan sin promedio
+        students_list = []
+        for student in students:
+            row = rows.get(student['id'])
+            students_list.append({
+                'student_id': student['id'],
+                'student_name': student['full_name'],
+                'group_id': group_id,
+                'grades': row['periods'] if row else {},
+                'annual_average': row['annual_average'] if row else None,
+                'rank': row['rank'] if row else None
+            })
+        
+        response_data = {
+            'message': 'Calificaciones anuales obtenidas correctamente',
+            'group_id': group_id,
+            'periods': sorted(int(period) for period in period_averages),
+            'period_averages': period_averages,
+            'annual_average': first['group_annual_average'] if first else None,
+            'students': students_list
+        }
+        
+        # Guardar en caché
+        grades_versions.set(cache_key, group_id, version, {'roster': roster, 'data': response_data})
+        
+        log_payload(logger, "Respuesta de calificaciones anuales", students_list)
+        
+        return jsonify(response_data), 200
+    except Exception as e:
+        logger.exception("Error al obtener calificaciones anuales")
+        return jsonify({"message": "Error al obtener calificaciones anuales", "error": str(e)}), 500
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+def grade_statistics(cur, group_id, period, student_ids):
+    """
+    Estadísticas de la calificación final y de cada componente de un grupo y periodo.
+
+    Una sola consulta convierte las calificaciones de los estudiantes a formato
+    largo (componente, valor) y calcula por componente media, desviación
+    estándar, mínimo, máximo, percentiles (percentile_cont) e histograma
+    (width_bucket). Devuelve {campo: estadísticas} con las llaves de
+    GRADE_COMPONENTS y 'finall'; los campos sin valores no aparecen.
+    """
+    cur.execute("""
+        WITH long AS (
+            SELECT v.component, v.value
+            FROM notes n
+            CROSS JOIN LATERAL (VALUES
+                ('class_participation', n.class_participation),
+                ('exercises', n.exercises),
+                ('homework', n.homework),
+                ('exams', n.exams),
+                ('church_class', n.church_class),
+                ('finall', n.finall)
+            ) AS v(component, value)
+            WHERE n.grade_id = %(group_id)s AND n.period = %(period)s
+              AND n.student_id = ANY(%(student_ids)s) AND v.value IS NOT NULL
+        ), histogram AS (
+            SELECT component, jsonb_object_agg(bucket, students) AS bins
+            FROM (
+                SELECT component,
+                       GREATEST(LEAST(width_bucket(value, 0, %(scale)s, %(bins)s), %(bins)s), 1) AS bucket,
+                       count(*) AS students
+                FROM long
+                GROUP BY 1, 2
+            ) b
+            GROUP BY component
+        )
+        SELECT l.component, count(*) AS count,
+               avg(l.value)::float AS mean,
+               stddev_pop(l.value)::float AS stddev,
+               min(l.value)::float AS min,
+               max(l.value)::float AS max,
+               percentile_cont(%(fractions)s::float8[]) WITHIN GROUP (ORDER BY l.value) AS percentiles,
+               h.bins
+        FROM long l
+        JOIN histogram h ON h.component = l.component
+        GROUP BY l.component, h.bins
+    """, {
+        'group_id': group_id,
+        'period': period,
+        'student_ids': student_ids,
+        'scale': GRADE_SCALE_MAX,
+        'bins': STATS_HISTOGRAM_BINS,
+        'fractions': [p / 100 for p in STATS_PERCENTILES],
+    })
+    
+    width = GRADE_SCALE_MAX / STATS_HISTOGRAM_BINS
+    stats = {}
+    for row in cur.fetchall():
+        percentiles = dict(zip(STATS_PERCENTILES, row['percentiles']))
+        stats[row['component']] = {
+            'count': row['count'],
+            'mean': _round(row['mean']),
+            'median': _round(percentiles[50]),
+            'stddev': _round(row['stddev']),
+            'min': _round(row['min']),
+            'max': _round(row['max']),
+            'percentiles': {f"p{p}": _round(value) for p, value in percentiles.items()},
+            'histogram': [
+                {'from': round(i * width, 2), 'to': round((i + 1) * width, 2), 'count': row['bins'].get(str(i + 1), 0)}
+                for i in range(STATS_HISTOGRAM_BINS)
+            ],
+        }
+    return stats
+
+@grades_bp.route('/calificaciones/estadisticas/<int:group_id>', methods=['GET', 'OPTIONS'])
+@cors_decorator
+def get_grade_statistics(group_id):
+    """
+    Endpoint con las estadísticas de calificaciones de un grupo en un periodo.
+
+    Devuelve media, mediana, desviación estándar, mínimo, máximo, percentiles
+    e histograma de la calificación final y de cada componente, calculados en
+    la base de datos (grade_statistics). La respuesta se guarda en caché por
+    (grupo, periodo) y se invalida en todos los procesos al guardar
+    calificaciones del grupo (cache_versions), o cuando cambia el roster.
+    """
+    if request.method == 'OPTIONS':
+        return make_response()
+    
+    try:
+        # Obtener el periodo del query string (por defecto 1)
+        period = request.args.get('period', '1')
+        try:
+            period = int(period)
+        except ValueError:
+            period = 1
+        
+        # Obtener los estudiantes activos del grupo (desde el caché de rosters si está disponible)
+        roster = get_group_roster(group_id)
+        students = roster.students if roster else []
+        
+        if not students:
+            logger.info("No se encontraron estudiantes activos en el grupo %s", group_id)
+            return jsonify({
+                'message': 'No se encontraron estudiantes en este grupo',
+                'group_id': group_id,
+                'period': period,
+                'students': 0
+            }), 200
+        
+        cache_key = (group_id, period, 'estadisticas')
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # Usar el caché solo si se construyó con el mismo roster y la versión actual del grupo
+                version = grades_versions.version(cur, group_id)
+                cached = grades_versions.get(cache_key, version)
+                if cached and cached['roster'] is roster:
+                    return jsonify(cached['data']), 200
                 
-                return jsonify(response_data), 200
+                stats = grade_statistics(cur, group_id, period, roster.student_ids)
+        
+        final = stats.get('finall')
+        response_data = {
+            'message': 'Estadísticas obtenidas correctamente',
+            'group_id': group_id,
+            'period': period,
+            'students': len(students),
+            'graded': final['count'] if final else 0,
+            'final': final,
+            'components': {
+                field: {**stats[field], 'weight': GRADE_WEIGHTS[field]} if field in stats else None
+                for field in GRADE_COMPONENTS
+            }
+        }
+        
+        # Guardar en caché
+        grades_versions.set(cache_key, group_id, version, {'roster': roster, 'data': response_data})
+        
+        return jsonify(response_data), 200
     except Exception as e:
-        traceback.print_exc()
-        return jsonify({"message": "Error al obtener calificaciones", "error": str(e)}), 500
+        logger.exception("Error al obtener estadísticas de calificaciones")
+        return jsonify({"message": "Error al obtener estadísticas de calificaciones", "error": str(e)}), 500
 
 @grades_bp.route('/calificaciones/guardar', methods=['POST', 'OPTIONS'])
 @cors_decorator
 def save_grades():
-    """Endpoint para guardar las calificaciones de los estudiantes"""
+    """
+    Endpoint para guardar las calificaciones de los estudiantes.
+
+    Todo el grupo se guarda con un único upsert multi-fila sobre
+    notes(student_id, grade_id, period); la misma sentencia descarta a los
+    estudiantes que no están activos en el grupo según history.
+    """
     if request.method == 'OPTIONS':
         return make_response()
         
@@ -198,7 +447,7 @@ def save_grades():
         data = request.get_json()
         grades_records = data.get('grades', [])
         
-        print(f"Recibidos {len(grades_records)} registros de calificaciones para guardar")
+        log_payload(logger, "Calificaciones recibidas", data)
         
         # Obtener el group_id y period del request
         group_id = data.get('group_id')
@@ -212,137 +461,243 @@ def save_grades():
         except (ValueError, TypeError):
             period = 1
             
-        print(f"Periodo: {period}")
-        
-        print(f"Grupo ID: {group_id}")
-        
         if not group_id:
             return jsonify({
                 "message": "Error: No se proporcionó un ID de grupo válido",
                 "success": False
             }), 400
         
-        # Usar un cursor que devuelva diccionarios
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                try:
-                    # Primero, obtener los IDs de estudiantes del grupo usando la tabla history
+        try:
+            group_id = int(group_id)
+        except (ValueError, TypeError):
+            return jsonify({
+                "message": "Error: No se proporcionó un ID de grupo válido",
+                "success": False
+            }), 400
+        
+        # Validar los registros y quedarnos con el último de cada estudiante
+        rows_by_student = {}
+        skipped = []
+        
+        for record in grades_records:
+            student_id = record.get('student_id')
+            
+            try:
+                student_id = int(student_id)
+            except (ValueError, TypeError):
+                skipped.append({"student_id": student_id, "reason": "ID de estudiante inválido"})
+                continue
+            
+            try:
+                values = [float(record.get(field) or 0) for field in GRADE_COMPONENTS]
+            except (ValueError, TypeError):
+                skipped.append({"student_id": student_id, "reason": "Calificaciones con formato inválido"})
+                continue
+            
+            if student_id in rows_by_student:
+                skipped.append({"student_id": student_id, "reason": "Registro duplicado, se conservó el último"})
+            
+            rows_by_student[student_id] = (student_id, *values, calculate_final_grade(*values))
+        
+        saved = []
+        if rows_by_student:
+            # Un solo INSERT ... ON CONFLICT para todo el grupo. Que el estudiante
+            # esté activo en el grupo se comprueba en la misma sentencia contra
+            # history (no contra el caché de rosters, que puede estar desactualizado
+            # en otros procesos)
+            columns = list(zip(*rows_by_student.values()))
+            with get_db_connection() as conn:
+                with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
                     cur.execute("""
-                        SELECT student_id FROM history WHERE group_id = %s AND status = 'activo'
-                    """, (group_id,))
+                        INSERT INTO notes
+                            (student_id, grade_id, class_participation, exercises,
+                             homework, exams, church_class, finall, period)
+                        SELECT v.student_id, %(group_id)s, v.class_participation, v.exercises,
+                               v.homework, v.exams, v.church_class, v.finall, %(period)s
+                        FROM unnest(
+                            %(student_ids)s::int[], %(class_participation)s::numeric[], %(exercises)s::numeric[],
+                            %(homework)s::numeric[], %(exams)s::numeric[], %(church_class)s::numeric[],
+                            %(finall)s::numeric[]
+                        ) AS v(student_id, class_participation, exercises, homework, exams, church_class, finall)
+                        WHERE EXISTS (
+                            SELECT 1 FROM history h
+                            WHERE h.student_id = v.student_id
+                              AND h.group_id = %(group_id)s AND h.status = 'activo'
+                        )
+                        ON CONFLICT (student_id, grade_id, period) DO UPDATE SET
+                            class_participation = EXCLUDED.class_participation,
+                            exercises = EXCLUDED.exercises,
+                            homework = EXCLUDED.homework,
+                            exams = EXCLUDED.exams,
+                            church_class = EXCLUDED.church_class,
+                            finall = EXCLUDED.finall
+                        RETURNING student_id, id
+                    """, {
+                        'group_id': group_id,
+                        'period': period,
+                        'student_ids': list(columns[0]),
+                        **{field: list(columns[index + 1]) for index, field in enumerate(GRADE_COMPONENTS + ('finall',))}
+                    })
                     
-                    student_ids = [row['student_id'] for row in cur.fetchall()]
-                    print(f"Estudiantes en el grupo {group_id}: {student_ids}")
+                    saved = [{"student_id": row['student_id'], "id": row['id']} for row in cur.fetchall()]
                     
-                    if student_ids:
-                        # Procesar cada registro de calificaciones
-                        for record in grades_records:
-                            student_id = record.get('student_id')
-                            
-                            if not student_id or student_id not in student_ids:
-                                print(f"Saltando estudiante inválido: {student_id}")
-                                continue
-                            
-                            try:
-                                # Convertir tipos de datos
-                                student_id_int = int(student_id)
-                                group_id_int = int(group_id)
-                                
-                                # Verificar si ya existe un registro para este estudiante, grupo y periodo
-                                cur.execute("""
-                                    SELECT id FROM notes 
-                                    WHERE student_id = %s AND grade_id = %s AND period = %s
-                                """, (student_id_int, group_id_int, period))
-                                
-                                existing_record = cur.fetchone()
-                                
-                                # Preparar los datos para la inserción o actualización
-                                class_participation = record.get('class_participation', 0)
-                                exercises = record.get('exercises', 0)
-                                homework = record.get('homework', 0)
-                                exams = record.get('exams', 0)
-                                church_class = record.get('church_class', 0)
-                                
-                                # Calcular la calificación final según las ponderaciones
-                                finall = (
-                                    class_participation * 0.15 +  # 15%
-                                    exercises * 0.15 +            # 15%
-                                    homework * 0.25 +             # 25%
-                                    exams * 0.35 +                # 35%
-                                    church_class * 0.10           # 10%
-                                )
-                                
-                                if existing_record:
-                                    # Actualizar registro existente
-                                    update_query = """
-                                        UPDATE notes 
-                                        SET class_participation = %s, exercises = %s, 
-                                            homework = %s, exams = %s, church_class = %s,
-                                            finall = %s, period = %s
-                                        WHERE id = %s
-                                        RETURNING id
-                                    """
-                                    
-                                    cur.execute(update_query, (
-                                        class_participation, exercises, homework, exams, 
-                                        church_class, finall, period, existing_record['id']
-                                    ))
-                                    updated_id = cur.fetchone()[0]
-                                    print(f"Actualizado registro con ID {updated_id}")
-                                else:
-                                    # Insertar nuevo registro
-                                    insert_query = """
-                                        INSERT INTO notes 
-                                        (student_id, grade_id, class_participation, exercises, 
-                                         homework, exams, church_class, finall, period)
-                                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                                        RETURNING id
-                                    """
-                                    
-                                    cur.execute(insert_query, (
-                                        student_id_int, group_id_int, class_participation, 
-                                        exercises, homework, exams, church_class, finall, period
-                                    ))
-                                    new_id = cur.fetchone()[0]
-                                    print(f"Creado registro con ID {new_id}")
-                                
-                                # Commit después de cada operación
-                                conn.commit()
-                            except Exception as e:
-                                print(f"Error al procesar registro para estudiante {student_id}: {e}")
-                                # Continuar con el siguiente estudiante
-                    else:
-                        print("No se encontraron estudiantes en el grupo")
-                        
-                except Exception as e:
-                    print(f"Error al procesar registros de calificaciones: {e}")
-                    return jsonify({
-                        "message": f"Error al procesar registros de calificaciones: {e}",
-                        "success": False
-                    }), 500
-                
-                # Invalidar el caché para este grupo y periodo
-                cache_key = f"grades_{group_id}_{period}"
-                if cache_key in grades_cache:
-                    print(f"Invalidando caché para grupo {group_id} y periodo {period}")
-                    del grades_cache[cache_key]
-                
-                return jsonify({
-                    "message": "Calificaciones guardadas correctamente",
-                    "success": True
-                }), 200
+                    # Invalida en todos los procesos los cachés del grupo (todos los periodos,
+                    # vista anual y estadísticas) en la misma transacción que el upsert
+                    version = grades_versions.bump(cur, group_id) if saved else None
+            
+            if version is not None:
+                grades_versions.invalidated(group_id, version)
+            
+            saved_ids = {row['student_id'] for row in saved}
+            skipped.extend(
+                {"student_id": student_id, "reason": "El estudiante no está activo en el grupo"}
+                for student_id in rows_by_student if student_id not in saved_ids
+            )
+        
+        logger.info("Calificaciones guardadas: grupo %s, periodo %s, %d guardadas, %d omitidas", group_id, period, len(saved), len(skipped))
+        
+        return jsonify({
+            "message": "Calificaciones guardadas correctamente",
+            "success": True,
+            "saved": saved,
+            "skipped": skipped
+        }), 200
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Error al guardar calificaciones")
         return jsonify({
             "message": "Error al guardar calificaciones", 
             "error": str(e),
             "success": False
         }), 500
 
+def period_label(period):
+    """Texto del periodo usado en encabezados y nombres de archivo"""
+    return "Primer" if period == 1 else "Segundo" if period == 2 else "Tercer" if period == 3 else "Cuarto"
+
+def build_grades_report(conn, group_id, period):
+    """
+    Reporte de calificaciones de un grupo y periodo.
+
+    Las calificaciones se leen con un cursor del lado del servidor, por lo que
+    la memoria no crece con el grupo.
+    """
+    with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as info_cur:
+        # Obtener información del grupo
+        info_cur.execute("""
+            SELECT g.grade, c.name as class_name
+            FROM "group" g
+            JOIN class c ON g.class_id = c.id
+            WHERE g.id = %s
+        """, (group_id,))
+        
+        group_info = info_cur.fetchone()
+    
+    if not group_info:
+        raise ReportNotFound("No se encontró información del grupo")
+    
+    group_name = f"{group_info['grade']} - {group_info['class_name']}"
+    
+    # Estudiantes activos del grupo con sus calificaciones del periodo (0 si no tienen)
+    cur = conn.cursor(name=f"grades_report_{group_id}", cursor_factory=psycopg2.extras.DictCursor)
+    cur.itersize = 500
+    cur.execute("""
+        SELECT s.name || ' ' || s.lastname_f || ' ' || s.lastname_m AS full_name,
+               COALESCE(n.class_participation, 0) AS class_participation,
+               COALESCE(n.exercises, 0) AS exercises,
+               COALESCE(n.homework, 0) AS homework,
+               COALESCE(n.exams, 0) AS exams,
+               COALESCE(n.church_class, 0) AS church_class,
+               COALESCE(n.finall, 0) AS finall,
+               count(*) OVER () AS total
+        FROM student s
+        JOIN history h ON s.id = h.student_id
+        LEFT JOIN notes n ON n.student_id = s.id AND n.grade_id = h.group_id AND n.period = %s
+        WHERE h.group_id = %s AND h.status = 'activo'
+        ORDER BY full_name
+    """, (period, group_id))
+    
+    first_batch = cur.fetchmany(cur.itersize)
+    if not first_batch:
+        cur.close()
+        raise ReportNotFound("No se encontraron estudiantes en este grupo")
+    
+    periodo_texto = period_label(period)
+    header = [
+        'Grupo', 'Nombre del Estudiante', f'Participación en clase ({periodo_texto} Parcial) (15%)', 
+        f'Ejercicios y prácticas ({periodo_texto} Parcial) (15%)', f'Tareas o trabajos ({periodo_texto} Parcial) (25%)', 
+        f'Exámenes ({periodo_texto} Parcial) (35%)', f'Asistencia a misa ({periodo_texto} Parcial) (10%)', 
+        f'Calificación Final ({periodo_texto} Parcial)'
+    ]
+    
+    def make_row(grade):
+        return [group_name, grade['full_name']] + [grade[field] for field in GRADE_COMPONENTS] + [grade['finall']]
+    
+    def report_rows():
+        yield header
+        yield from iter_cursor_rows(cur, first_batch, make_row)
+    
+    filename = f'Calificaciones_{periodo_texto}_Parcial_{group_name.replace(" ", "_")}.csv'
+    return ReportOutput(filename, report_rows(), total=first_batch[0]['total'])
+
+
+def build_school_grades_report(conn):
+    """
+    Reporte de calificaciones de toda la escuela.
+
+    Incluye todos los grupos y todos los periodos, con una fila por estudiante
+    activo, grupo y periodo registrado, leídos de un cursor del lado del servidor.
+    """
+    cur = conn.cursor(name="grades_report_school", cursor_factory=psycopg2.extras.DictCursor)
+    cur.itersize = 2000
+    cur.execute("""
+        SELECT g.id AS group_id, g.grade, c.name AS class_name,
+               s.name || ' ' || s.lastname_f || ' ' || s.lastname_m AS full_name,
+               n.period,
+               n.class_participation, n.exercises, n.homework, n.exams, n.church_class, n.finall
+        FROM history h
+        JOIN student s ON s.id = h.student_id
+        JOIN "group" g ON g.id = h.group_id
+        JOIN class c ON c.id = g.class_id
+        LEFT JOIN notes n ON n.student_id = s.id AND n.grade_id = g.id
+        WHERE h.status = 'activo'
+        ORDER BY g.grade, c.name, g.id, full_name, n.period
+    """)
+    
+    first_batch = cur.fetchmany(cur.itersize)
+    
+    header = [
+        'Grupo', 'Materia', 'Nombre del Estudiante', 'Periodo',
+        'Participación en clase (15%)', 'Ejercicios y prácticas (15%)', 'Tareas o trabajos (25%)',
+        'Exámenes (35%)', 'Asistencia a misa (10%)', 'Calificación Final'
+    ]
+    
+    def make_row(grade):
+        return [grade['grade'], grade['class_name'], grade['full_name'], grade['period'] or ''] + [
+            grade[field] if grade[field] is not None else '' for field in GRADE_COMPONENTS + ('finall',)
+        ]
+    
+    def report_rows():
+        yield header
+        yield from iter_cursor_rows(cur, first_batch, make_row)
+    
+    filename = f"Calificaciones_Escuela_{datetime.now().strftime('%Y%m%d')}.csv"
+    return ReportOutput(filename, report_rows())
+
+
+register_report_job('grades_report', lambda conn, params: build_grades_report(conn, params['group_id'], params['period']))
+register_report_job('school_grades_report', lambda conn, params: build_school_grades_report(conn))
+
+
 @grades_bp.route('/calificaciones/reporte/<int:group_id>', methods=['GET', 'OPTIONS'])
 @cors_decorator
 def generate_grades_report(group_id):
-    """Endpoint para generar un reporte CSV de calificaciones"""
+    """
+    Endpoint para generar un reporte CSV de calificaciones.
+
+    El CSV se emite de forma incremental. Con `async=1` (o
+    `Prefer: respond-async`) se genera en segundo plano y se responde 202 con
+    el identificador del trabajo.
+    """
     if request.method == 'OPTIONS':
         return make_response()
     
@@ -353,114 +708,47 @@ def generate_grades_report(group_id):
             period = int(period)
         except ValueError:
             period = 1
+        
+        if wants_async():
+            return enqueue_report('grades_report', {'group_id': group_id, 'period': period})
             
-        print(f"Generando reporte de calificaciones para el grupo {group_id} y periodo {period}")
+        logger.info("Generando reporte de calificaciones del grupo %s, periodo %s", group_id, period)
+        return stream_report(build_grades_report, group_id, period)
+    except ReportNotFound as e:
+        return jsonify({
+            "message": str(e),
+            "success": False
+        }), 404
+    except Exception as e:
+        logger.exception("Error al generar reporte de calificaciones")
+        return jsonify({
+            "message": "Error al generar reporte de calificaciones", 
+            "error": str(e),
+            "success": False
+        }), 500
+
+@grades_bp.route('/calificaciones/reporte', methods=['GET', 'OPTIONS'])
+@cors_decorator
+@admin_required
+def generate_school_grades_report():
+    """
+    Endpoint para generar un reporte CSV de calificaciones de toda la escuela.
+
+    Solo para administradores. El CSV se emite de forma incremental. Con `async=1` (o
+    `Prefer: respond-async`) se genera en segundo plano y se responde 202 con
+    el identificador del trabajo.
+    """
+    if request.method == 'OPTIONS':
+        return make_response()
+    
+    try:
+        if wants_async():
+            return enqueue_report('school_grades_report', {})
         
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                # Obtener todos los estudiantes del grupo usando la tabla history
-                cur.execute("""
-                    SELECT s.id, s.name || ' ' || s.lastname_f || ' ' || s.lastname_m as full_name
-                    FROM student s
-                    JOIN history h ON s.id = h.student_id
-                    WHERE h.group_id = %s AND h.status = 'activo'
-                    ORDER BY full_name
-                """, (group_id,))
-                
-                students = cur.fetchall()
-                student_ids = [student['id'] for student in students]
-                
-                if not student_ids:
-                    return jsonify({
-                        "message": "No se encontraron estudiantes en este grupo",
-                        "success": False
-                    }), 404
-                
-                # Obtener información del grupo
-                cur.execute("""
-                    SELECT g.grade, c.name as class_name
-                    FROM "group" g
-                    JOIN class c ON g.class_id = c.id
-                    WHERE g.id = %s
-                """, (group_id,))
-                
-                group_info = cur.fetchone()
-                if not group_info:
-                    return jsonify({
-                        "message": "No se encontró información del grupo",
-                        "success": False
-                    }), 404
-                
-                group_name = f"{group_info['grade']} - {group_info['class_name']}"
-                
-                # Obtener calificaciones para todos los estudiantes
-                placeholders = ', '.join(['%s'] * len(student_ids))
-                query = f"""
-                    SELECT n.student_id, s.name || ' ' || s.lastname_f || ' ' || s.lastname_m as full_name,
-                           n.class_participation, n.exercises, n.homework, n.exams, n.church_class, n.finall,
-                           n.period
-                    FROM notes n
-                    JOIN student s ON n.student_id = s.id
-                    WHERE n.student_id IN ({placeholders}) AND n.grade_id = %s AND n.period = %s
-                    ORDER BY full_name
-                """
-                
-                params = student_ids + [group_id, period]
-                cur.execute(query, params)
-                grades = cur.fetchall()
-                
-                # Crear un archivo CSV en memoria
-                output = io.StringIO()
-                writer = csv.writer(output)
-                
-                # Escribir encabezados
-                periodo_texto = "Primer" if period == 1 else "Segundo" if period == 2 else "Tercer" if period == 3 else "Cuarto"
-                writer.writerow([
-                    'Grupo', 'Nombre del Estudiante', f'Participación en clase ({periodo_texto} Parcial) (15%)', 
-                    f'Ejercicios y prácticas ({periodo_texto} Parcial) (15%)', f'Tareas o trabajos ({periodo_texto} Parcial) (25%)', 
-                    f'Exámenes ({periodo_texto} Parcial) (35%)', f'Asistencia a misa ({periodo_texto} Parcial) (10%)', 
-                    f'Calificación Final ({periodo_texto} Parcial)'
-                ])
-                
-                # Crear un diccionario para acceder fácilmente a las calificaciones por student_id
-                grades_dict = {grade['student_id']: grade for grade in grades}
-                
-                # Escribir datos para cada estudiante
-                for student in students:
-                    student_id = student['id']
-                    student_name = student['full_name']
-                    
-                    # Obtener calificaciones del estudiante o usar valores por defecto
-                    grade = grades_dict.get(student_id, {})
-                    
-                    writer.writerow([
-                        group_name,
-                        student_name,
-                        grade.get('class_participation', 0),
-                        grade.get('exercises', 0),
-                        grade.get('homework', 0),
-                        grade.get('exams', 0),
-                        grade.get('church_class', 0),
-                        grade.get('finall', 0)
-                    ])
-                
-                # Preparar la respuesta
-                output.seek(0)
-                
-                # Crear una respuesta con el archivo CSV
-                periodo_texto = "Primer" if period == 1 else "Segundo" if period == 2 else "Tercer" if period == 3 else "Cuarto"
-                response = Response(
-                    output.getvalue(),
-                    mimetype='text/csv',
-                    headers={
-                        'Content-Disposition': f'attachment; filename=Calificaciones_{periodo_texto}_Parcial_{group_name.replace(" ", "_")}.csv'
-                    }
-                )
-                
-                return response
-                
+        logger.info("Generando reporte de calificaciones de toda la escuela")
+        return stream_report(build_school_grades_report)
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Error al generar reporte de calificaciones")
         return jsonify({
             "message": "Error al generar reporte de calificaciones", 
             "error": str(e),
@@ -0,0 +1,199 @@
+from flask import Blueprint, jsonify, request, make_response, send_file
+from functools import wraps
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from utils.db import get_db_connection
+from utils.auth import admin_required, has_role, parse_roles
+from utils.report_jobs import DONE, get_job, job_summary, result_path
+from utils.report_bundle import BundleBusy, BundleItem, stream_report_bundle
+from utils.log import get_logger
+from routes.attendance_routes import build_attendance_report
+from routes.grades_routes import build_grades_report
+from config.config import Config
+from datetime import datetime, timedelta
+
+# Definir el decorador CORS localmente (igual que en attendance_routes.py)
+def cors_decorator(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method == 'OPTIONS':
+            response = make_response()
+            response.headers.add('Access-Control-Allow-Origin', '*')
+            response.headers.add('Access-Control-Allow-Methods', 'GET, OPTIONS')
+            response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization, Accept')
+            response.headers.add('Access-Control-Allow-Credentials', 'true')
+            return response
+        
+        resp = f(*args, **kwargs)
+        
+        # Si la respuesta es una tupla (jsonify(...), status_code), convertirla a una respuesta Flask
+        if isinstance(resp, tuple):
+            response = make_response(resp[0], resp[1])
+        else:
+            response = make_response(resp)
+            
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization, Accept')
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        # El nombre del archivo debe ser legible desde el navegador
+        response.headers.add('Access-Control-Expose-Headers', 'Content-Disposition')
+        return response
+    return decorated_function
+
+report_bp = Blueprint('report', __name__, url_prefix='/api/reportes')
+logger = get_logger(__name__)
+
+BUNDLE_KINDS = ('calificaciones', 'asistencia')
+
+@report_bp.route('/paquete', methods=['GET', 'OPTIONS'])
+@cors_decorator
+@admin_required
+def download_report_bundle():
+    """
+    Descarga un ZIP con los reportes de calificaciones y asistencia de todos los grupos.
+
+    Parámetros opcionales:
+    - `tipos`: calificaciones, asistencia o ambos separados por comas (por defecto ambos)
+    - `period`: periodo de las calificaciones (por defecto 1)
+    - `start` y `end`: rango de la asistencia (YYYY-MM-DD, por defecto los últimos 30 días)
+    - `grade`: solo los grupos de ese grado (p. ej. "1° secundaria")
+    - `campus`: solo los grupos con estudiantes activos de ese plantel
+
+    Solo se incluyen grupos con estudiantes activos. Los reportes se generan
+    en paralelo y el ZIP se emite a medida que cada uno termina; solo para
+    administradores.
+    """
+    if request.method == 'OPTIONS':
+        return make_response()
+    
+    try:
+        kinds = [kind.strip() for kind in request.args.get('tipos', ','.join(BUNDLE_KINDS)).split(',') if kind.strip()]
+        if not kinds or any(kind not in BUNDLE_KINDS for kind in kinds):
+            return jsonify({
+                "message": f"Tipos de reporte inválidos, se esperaba: {', '.join(BUNDLE_KINDS)}",
+                "success": False
+            }), 400
+        
+        try:
+            period = int(request.args.get('period', '1'))
+        except ValueError:
+            period = 1
+        
+        try:
+            end_date = datetime.strptime(request.args['end'], '%Y-%m-%d') if request.args.get('end') else datetime.now()
+            start_date = datetime.strptime(request.args['start'], '%Y-%m-%d') if request.args.get('start') else end_date - timedelta(days=30)
+        except ValueError as e:
+            return jsonify({
+                "message": f"Formato de fecha inválido, se esperaba YYYY-MM-DD: {e}",
+                "success": False
+            }), 400
+        
+        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        if start_date > end_date:
+            return jsonify({
+                "message": "La fecha de inicio debe ser anterior o igual a la fecha de fin",
+                "success": False
+            }), 400
+        
+        grade = request.args.get('grade')
+        campus = request.args.get('campus')
+        
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT g.id
+                    FROM "group" g
+                    WHERE (%(grade)s::text IS NULL OR g.grade = %(grade)s)
+                      AND EXISTS (
+                          SELECT 1
+                          FROM history h
+                          JOIN student s ON s.id = h.student_id
+                          WHERE h.group_id = g.id AND h.status = 'activo'
+                            AND (%(campus)s::text IS NULL OR s.school_campus = %(campus)s)
+                      )
+                    ORDER BY g.grade, g.id
+                """, {'grade': grade, 'campus': campus})
+                group_ids = [row['id'] for row in cur.fetchall()]
+        
+        if not group_ids:
+            return jsonify({"message": "No hay grupos con estudiantes activos para los filtros indicados", "success": False}), 404
+        
+        items = []
+        for group_id in group_ids:
+            if 'calificaciones' in kinds:
+                items.append(BundleItem('calificaciones', group_id, build_grades_report, group_id, period))
+            if 'asistencia' in kinds:
+                items.append(BundleItem('asistencia', group_id, build_attendance_report, group_id, start_date, end_date))
+        
+        logger.info("Generando paquete de reportes %s de %d grupos", kinds, len(group_ids))
+        return stream_report_bundle(items, f"Reportes_{datetime.now().strftime('%Y%m%d')}.zip")
+    except BundleBusy:
+        return jsonify({
+            "message": "Ya se está generando un paquete de reportes; intente de nuevo en unos minutos",
+            "success": False
+        }), 503
+    except Exception as e:
+        logger.exception("Error al generar el paquete de reportes")
+        return jsonify({"message": "Error al generar el paquete de reportes", "error": str(e), "success": False}), 500
+
+def _get_user_job(job_id):
+    """Devuelve el trabajo si lo pidió el usuario del token o si este es administrador; si no, None"""
+    job = get_job(job_id)
+    if job is None:
+        return None
+    user_id = job.get('user_id')
+    if user_id is not None and user_id != str(get_jwt_identity()) and not has_role(parse_roles(Config.ADMIN_ROLES)):
+        # Mismo 404 que un trabajo inexistente, para no revelar que el id es válido
+        return None
+    return job
+
+@report_bp.route('/<job_id>', methods=['GET', 'OPTIONS'])
+@cors_decorator
+@jwt_required()
+def get_report_job(job_id):
+    """
+    Estado de un reporte generado en segundo plano.
+
+    `status` es queued, running, done o failed; `progress` indica las filas
+    escritas y, si se conoce, el total. Cuando el reporte está listo incluye
+    `download_url`.
+    """
+    if request.method == 'OPTIONS':
+        return make_response()
+    
+    try:
+        job = _get_user_job(job_id)
+        if job is None:
+            return jsonify({"message": "El reporte no existe o ya expiró", "success": False}), 404
+        
+        summary = job_summary(job)
+        if job['status'] == DONE:
+            summary['download_url'] = f"/api/reportes/{job_id}/archivo"
+        return jsonify({**summary, "success": True}), 200
+    except Exception as e:
+        logger.exception("Error al consultar el reporte")
+        return jsonify({"message": "Error al consultar el reporte", "error": str(e), "success": False}), 500
+
+@report_bp.route('/<job_id>/archivo', methods=['GET', 'OPTIONS'])
+@cors_decorator
+@jwt_required()
+def download_report(job_id):
+    """Descarga el CSV de un reporte terminado"""
+    if request.method == 'OPTIONS':
+        return make_response()
+    
+    try:
+        job = _get_user_job(job_id)
+        if job is None:
+            return jsonify({"message": "El reporte no existe o ya expiró", "success": False}), 404
+        if job['status'] != DONE:
+            return jsonify({**job_summary(job), "message": "El reporte aún no está listo", "success": False}), 409
+        
+        return send_file(result_path(job_id), mimetype='text/csv', as_attachment=True, download_name=job['filename'])
+    except FileNotFoundError:
+        return jsonify({"message": "El reporte no existe o ya expiró", "success": False}), 404
+    except Exception as e:
+        logger.exception("Error al descargar el reporte")
+        return jsonify({"message": "Error al descargar el reporte", "error": str(e), "success": False}), 500
@@ -1,15 +1,16 @@
 from flask import Blueprint, request, jsonify, make_response, Response
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from config.config import Config
+from utils.db import get_db_connection
+from utils.roster import get_group_roster, invalidate_group, invalidate_student
+from utils.schema import schema
+from utils.log import get_logger
+from utils.search import build_search, normalize_search_term
+from utils.pagination import build_page_query, parse_cursor, split_page, cached_count, approximate_count, invalidate_counts
 from functools import wraps
 import datetime
 import json
 
 student_bp = Blueprint('student', __name__, url_prefix='/api')
-
-def get_db_connection():
-    return psycopg2.connect(**Config.DB_CONFIG, cursor_factory=RealDictCursor)
+logger = get_logger(__name__)
 
 def cors_decorator(f):
     @wraps(f)
@@ -114,12 +115,12 @@ def registrar_estudiante():
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_counts('student')
 
         return jsonify({"message": "Estudiante registrado exitosamente"}), 201
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al registrar estudiante")
         return jsonify({"message": "Error al registrar estudiante", "error": str(e)}), 500
 
 @student_bp.route('/estudiantes', methods=['GET', 'OPTIONS'])
@@ -135,45 +136,39 @@ def get_estudiantes():
         # Obtener parámetros de consulta para filtrado y paginación
         page = request.args.get('page', default=1, type=int)
         per_page = request.args.get('per_page', default=10, type=int)
-        search = request.args.get('search', default='', type=str)
+        search = normalize_search_term(request.args.get('search', default='', type=str))
+        cursor = request.args.get('cursor')
+        count_mode = request.args.get('count', default='exact', type=str)
         
-        # Calcular offset para paginación
-        offset = (page - 1) * per_page
+        # Con cursor se pagina por rango sobre la clave de orden; sin cursor se usa el número de página
+        after, valid_cursor = parse_cursor(cursor, search)
+        if not valid_cursor:
+            cur.close()
+            conn.close()
+            return jsonify({"message": "Cursor de paginación inválido"}), 400
+        offset = 0 if after else (page - 1) * per_page
         
-        # Construir la consulta base
-        query = """
-            SELECT 
+        # Añadir filtro de búsqueda si se proporciona (ordenado por relevancia)
+        search_filter = build_search('student', search, alias='s')
+        
+        query, params = build_page_query(
+            """
                 s.id, s.name, s.lastname_f, s.lastname_m, s.email, 
                 s.blood_type, s.allergies, s.scholar_ship, s.chapel, 
                 s.school_campus, s.family_id, s.permission, 
                 s.reg_date, s.birth_date, s.curp, s.sep_register, s.cpdb_register, s.gender
-            FROM public.student s
-        """
-        
-        params = []
-        
-        # Añadir filtro de búsqueda si se proporciona
-        if search:
-            query += """
-                WHERE 
-                    name ILIKE %s OR 
-                    lastname_f ILIKE %s OR 
-                    lastname_m ILIKE %s OR 
-                    email ILIKE %s
-            """
-            search_param = f'%{search}%'
-            params.extend([search_param, search_param, search_param, search_param])
-        
-        # Añadir ordenamiento y paginación
-        query += """
-            ORDER BY id
-            LIMIT %s OFFSET %s
-        """
-        params.extend([per_page, offset])
+            """,
+            "public.student s",
+            "s.id",
+            search_filter,
+            after=after,
+            per_page=per_page,
+            offset=offset
+        )
         
         # Ejecutar la consulta principal
         cur.execute(query, params)
-        estudiantes = cur.fetchall()
+        estudiantes, next_cursor = split_page(cur.fetchall(), per_page, search)
         
         # Obtener la información de grupos para cada estudiante
         student_ids = [e['id'] for e in estudiantes]
@@ -232,28 +227,21 @@ def get_estudiantes():
                             'display_name': f"{g['grade']} - {g['class_name']}" if g['class_name'] else g['grade']
                         } for g in student_all_groups[student_id]
                     ]
-                    
-                    print(f"Estudiante {student_id} tiene asignado el grupo principal {estudiante['group_grade']}")
-                    print(f"Estudiante {student_id} tiene {len(estudiante['all_groups'])} grupos asignados en total")
                 else:
                     estudiante['all_groups'] = []
-                    print(f"Estudiante {student_id} no tiene grupo asignado")
-        
-        # Obtener el conteo total para la paginación
-        count_query = "SELECT COUNT(*) FROM public.student"
-        if search:
-            count_query += """
-                WHERE 
-                    name ILIKE %s OR 
-                    lastname_f ILIKE %s OR 
-                    lastname_m ILIKE %s OR 
-                    email ILIKE %s
-            """
-            cur.execute(count_query, [search_param, search_param, search_param, search_param])
+        
+        # Obtener el conteo total para la paginación (en caché, aproximado o sin conteo)
+        if count_mode == 'none':
+            total_count = None
+        elif count_mode == 'approx' and not search_filter:
+            total_count = approximate_count(cur, 'public.student')
         else:
-            cur.execute(count_query)
-            
-        total_count = cur.fetchone()['count']
+            count_query = "SELECT COUNT(*) AS total FROM public.student s"
+            count_params = []
+            if search_filter:
+                count_query += f" WHERE {search_filter[0]}"
+                count_params = search_filter[1]
+            total_count = cached_count(cur, 'student', search, count_query, count_params)
         
         cur.close()
         conn.close()
@@ -265,14 +253,15 @@ def get_estudiantes():
                 "total": total_count,
                 "page": page,
                 "per_page": per_page,
-                "total_pages": (total_count + per_page - 1) // per_page
+                "total_pages": (total_count + per_page - 1) // per_page if total_count is not None else None,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
             }
         }
         
         return jsonify(response), 200
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener estudiantes")
         return jsonify({"message": "Error al obtener estudiantes", "error": str(e)}), 500
 
 @student_bp.route('/estudiantes/<int:id>', methods=['DELETE', 'OPTIONS'])
@@ -297,14 +286,15 @@ def delete_estudiante(id):
         # Eliminar el estudiante
         cur.execute("DELETE FROM student WHERE id = %s", (id,))
         conn.commit()
+        invalidate_student(id)
+        invalidate_counts('student')
         
         cur.close()
         conn.close()
         
         return jsonify({"message": f"Estudiante con ID {id} eliminado correctamente"}), 200
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al eliminar estudiante")
         return jsonify({"message": "Error al eliminar estudiante", "error": str(e)}), 500
 
 @student_bp.route('/estudiantes/<int:id>', methods=['PUT', 'OPTIONS'])
@@ -368,6 +358,8 @@ def update_estudiante(id):
         ))
         
         conn.commit()
+        invalidate_student(id)
+        invalidate_counts('student')
         
         # Obtener el estudiante actualizado
         cur.execute("""
@@ -384,8 +376,7 @@ def update_estudiante(id):
             "estudiante": dict(updated_student)
         }), 200
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al actualizar estudiante")
         return jsonify({"message": "Error al actualizar estudiante", "error": str(e)}), 500
 
 @student_bp.route('/estudiantes/por-grupo/<int:group_id>', methods=['GET'])
@@ -393,38 +384,19 @@ def update_estudiante(id):
 def get_estudiantes_por_grupo(group_id):
     """Endpoint para obtener todos los estudiantes asignados a un grupo específico"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        # Obtener los estudiantes activos del grupo (desde el caché de rosters si está disponible)
+        roster = get_group_roster(group_id)
         
-        # Verificar si el grupo existe
-        cur.execute("SELECT id FROM \"group\" WHERE id = %s", (group_id,))
-        if not cur.fetchone():
-            cur.close()
-            conn.close()
+        if roster is None:
             return jsonify({"message": f"Grupo con ID {group_id} no encontrado"}), 404
         
-        # Obtener todos los estudiantes activos en este grupo
-        cur.execute("""
-            SELECT 
-                s.id, s.name, s.lastname_f, s.lastname_m, s.email, 
-                s.blood_type, s.allergies, s.scholar_ship, s.chapel, 
-                s.school_campus, s.family_id, s.permission, 
-                s.reg_date,
-                h.group_id,
-                g.grade as group_grade,
-                c.name as class_name
-            FROM public.student s
-            JOIN history h ON s.id = h.student_id
-            JOIN \"group\" g ON h.group_id = g.id
-            LEFT JOIN class c ON g.class_id = c.id
-            WHERE h.group_id = %s AND h.status = 'activo'
-            ORDER BY s.lastname_f, s.lastname_m, s.name
-        """, (group_id,))
-        
-        estudiantes = [dict(row) for row in cur.fetchall()]
-        
-        cur.close()
-        conn.close()
+        estudiantes = [
+            {key: value for key, value in student.items() if key != 'full_name'}
+            for student in sorted(
+                roster.students,
+                key=lambda student: (student['lastname_f'] or '', student['lastname_m'] or '', student['name'] or '')
+            )
+        ]
         
         return jsonify({
             "message": "Estudiantes obtenidos correctamente",
@@ -432,8 +404,7 @@ def get_estudiantes_por_grupo(group_id):
             "total": len(estudiantes)
         }), 200
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener estudiantes")
         return jsonify({"message": "Error al obtener estudiantes", "error": str(e)}), 500
 
 @student_bp.route('/tutores', methods=['GET', 'OPTIONS'])
@@ -460,24 +431,17 @@ def get_tutores():
         params = []
         
         # Añadir filtro de búsqueda si se proporciona
-        if search:
-            query += """
-                WHERE 
-                    tutor_name ILIKE %s OR 
-                    tutor_lastname_f ILIKE %s OR 
-                    tutor_lastname_m ILIKE %s OR 
-                    email_address ILIKE %s
-            """
-            search_param = f'%{search}%'
-            params.extend([search_param, search_param, search_param, search_param])
+        search_filter = build_search('family', search, alias='f')
+        if search_filter:
+            where_sql, where_params, rank_sql, rank_params = search_filter
             # Ordenar por relevancia cuando hay búsqueda
-            query += """
-                ORDER BY 
-                    CASE WHEN tutor_lastname_f ILIKE %s THEN 0 ELSE 1 END,
-                    tutor_lastname_f, tutor_lastname_m, tutor_name
+            query += f"""
+                WHERE {where_sql}
+                ORDER BY {rank_sql} DESC,
+                    f.tutor_lastname_f, f.tutor_lastname_m, f.tutor_name
                 LIMIT 20
             """
-            params.append(search_param)
+            params.extend(where_params + rank_params)
         else:
             # Si no hay búsqueda, mostrar los tutores más recientes
             # Asumimos que los IDs más altos son los más recientes
@@ -499,8 +463,7 @@ def get_tutores():
         }), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener tutores")
         return jsonify({"message": "Error al obtener tutores", "error": str(e)}), 500
 
 @student_bp.route('/estudiantes/<int:estudiante_id>/asignar-grupo', methods=['POST'])
@@ -550,7 +513,7 @@ def asignar_grupo(estudiante_id):
             
             # Usar todos los grupos del grado
             group_ids = [group['id'] for group in grade_groups]
-            print(f"Asignando estudiante {estudiante_id} a todos los grupos del grado {grade}: {group_ids}")
+            logger.debug("Asignando estudiante %s a los grupos del grado %s: %s", estudiante_id, grade, group_ids)
         else:
             # Compatibilidad con la versión anterior que usaba group_id
             if 'group_id' in data and 'group_ids' not in data:
@@ -574,7 +537,7 @@ def asignar_grupo(estudiante_id):
         
         # Si es una desasignación, desactivamos todas las asignaciones activas
         if is_unassign:
-            print(f"Desasignando al estudiante {estudiante_id} de todos los grupos")
+            logger.debug("Desasignando al estudiante %s de todos los grupos", estudiante_id)
             cur.execute(
                 """UPDATE history 
                 SET status = 'inactivo' 
@@ -589,6 +552,7 @@ def asignar_grupo(estudiante_id):
             )
             
             conn.commit()
+            invalidate_student(estudiante_id)
             cur.close()
             conn.close()
             
@@ -633,14 +597,14 @@ def asignar_grupo(estudiante_id):
             
             if inactive_record:
                 # Si existe un registro inactivo, reactivarlo
-                print(f"Reactivando registro para estudiante {estudiante_id} y grupo {group_id}")
+                logger.debug("Reactivando registro para estudiante %s y grupo %s", estudiante_id, group_id)
                 cur.execute(
                     """UPDATE history SET status = 'activo' WHERE id = %s""", 
                     (inactive_record['id'],)
                 )
             else:
                 # Si no existe, crear un nuevo registro
-                print(f"Creando nuevo registro para estudiante {estudiante_id} y grupo {group_id}")
+                logger.debug("Creando registro para estudiante %s y grupo %s", estudiante_id, group_id)
                 cur.execute(
                     """INSERT INTO history (student_id, group_id, status) 
                     VALUES (%s, %s, 'activo')""", 
@@ -649,32 +613,31 @@ def asignar_grupo(estudiante_id):
         
         # Actualizar el campo group_id en la tabla student con el primer grupo de la lista
         # (esto es para mantener compatibilidad con el campo group_id existente)
+        added_group_column = False
         if group_ids:
             try:
-                cur.execute(
-                    """SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'student' AND column_name = 'group_id'"""
-                )
-                column_exists = cur.fetchone()
-                
-                if not column_exists:
+                if not schema.has_column('student', 'group_id'):
                     # La columna no existe, la creamos
-                    print("Creando columna group_id en la tabla student")
+                    logger.info("Creando columna group_id en la tabla student")
                     cur.execute(
-                        "ALTER TABLE student ADD COLUMN group_id INTEGER"
+                        "ALTER TABLE student ADD COLUMN IF NOT EXISTS group_id INTEGER"
                     )
+                    added_group_column = True
                 
                 # Actualizamos el campo group_id con el primer grupo de la lista
                 cur.execute(
                     "UPDATE student SET group_id = %s WHERE id = %s", 
                     (group_ids[0], estudiante_id)
                 )
-            except Exception as e:
-                print(f"Error al actualizar el campo group_id: {e}")
+            except Exception:
+                logger.exception("Error al actualizar el campo group_id")
                 # Continuamos con la ejecución aunque falle esta parte
         
         conn.commit()
+        if added_group_column:
+            schema.add_column('student', 'group_id')
+        invalidate_student(estudiante_id)
+        invalidate_group(*group_ids)
         cur.close()
         conn.close()
         
@@ -685,6 +648,5 @@ def asignar_grupo(estudiante_id):
         }), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al asignar grupo")
         return jsonify({"message": "Error al asignar grupo", "error": str(e)}), 500
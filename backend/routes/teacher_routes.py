@@ -1,13 +1,11 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import decode_token
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from config.config import Config
+from utils.db import get_db_connection
+from utils.log import get_logger
+from datetime import datetime, timedelta
 
 teacher_bp = Blueprint('teacher', __name__, url_prefix='/api/profesor')
-
-def get_db_connection():
-    return psycopg2.connect(**Config.DB_CONFIG, cursor_factory=RealDictCursor)
+logger = get_logger(__name__)
 
 @teacher_bp.route('/materias', methods=['GET', 'OPTIONS'])
 def get_materias():
@@ -63,8 +61,7 @@ def get_materias():
         }), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener materias")
         return jsonify({"message": "Error al obtener materias", "error": str(e)}), 500
 
 @teacher_bp.route('/materias/<int:group_id>', methods=['GET', 'OPTIONS'])
@@ -95,6 +92,153 @@ def get_materia_details(group_id):
         return jsonify({"message": "No se ha implementado la obtención de detalles de la materia"}), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener detalles de la materia")
         return jsonify({"message": "Error al obtener detalles de la materia", "error": str(e)}), 500
+
+@teacher_bp.route('/gradebook', methods=['GET', 'OPTIONS'])
+def get_gradebook():
+    """
+    Endpoint con todos los grupos del profesor del token, sus estudiantes activos,
+    sus calificaciones del periodo y la asistencia del día.
+
+    Reemplaza a /materias seguido de /calificaciones/grupo/<id> y
+    /asistencia/grupo/<id> por cada grupo: se resuelve con tres consultas
+    (grupos, estudiantes con calificaciones y asistencia del día) sin importar
+    cuántos grupos tenga el profesor.
+
+    Parámetros opcionales:
+    - `period`: periodo de las calificaciones (por defecto el último con
+      calificaciones registradas en sus grupos, o 1)
+    - `date`: día de la asistencia (YYYY-MM-DD, por defecto hoy)
+    """
+    if request.method == "OPTIONS":
+        response = jsonify({"message": "CORS preflight OK"})
+        response.headers.add("Access-Control-Allow-Origin", "http://localhost:3001")
+        response.headers.add("Access-Control-Allow-Methods", "GET, OPTIONS")
+        response.headers.add("Access-Control-Allow-Headers", "Content-Type, Authorization")
+        response.headers.add("Access-Control-Allow-Credentials", "true")
+        return response, 204
+        
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return jsonify({"message": "Token no proporcionado o formato incorrecto"}), 401
+        
+    token = auth_header.split(' ')[1]
+    
+    try:
+        decoded_token = decode_token(token)
+        user_id = int(decoded_token["sub"])
+        
+        try:
+            period = int(request.args['period']) if request.args.get('period') else None
+        except ValueError:
+            period = None
+        
+        date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+        try:
+            day_start = datetime.strptime(date, '%Y-%m-%d')
+        except ValueError as e:
+            return jsonify({"message": f"Formato de fecha inválido, se esperaba YYYY-MM-DD: {e}"}), 400
+        day_end = day_start + timedelta(days=1)
+        
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # Grupos del profesor y el último periodo con calificaciones en ellos
+                cur.execute("""
+                    WITH groups AS (
+                        SELECT g.id AS group_id, g.grade AS grado, c.id AS class_id, c.name AS class_name
+                        FROM "group" g
+                        JOIN class c ON c.id = g.class_id
+                        WHERE g.professor_id = %s
+                    )
+                    SELECT groups.*,
+                           (SELECT max(n.period) FROM notes n WHERE n.grade_id IN (SELECT group_id FROM groups)) AS last_period
+                    FROM groups
+                    ORDER BY grado, class_name, group_id
+                """, (user_id,))
+                groups = cur.fetchall()
+                
+                if not groups:
+                    return jsonify({
+                        "message": "El profesor no tiene grupos asignados",
+                        "period": period or 1,
+                        "date": date,
+                        "grupos": []
+                    }), 200
+                
+                if period is None:
+                    period = groups[0]['last_period'] or 1
+                group_ids = [group['group_id'] for group in groups]
+                
+                # Estudiantes activos de todos los grupos con sus calificaciones del periodo
+                cur.execute("""
+                    SELECT h.group_id, s.id AS student_id,
+                           s.name || ' ' || s.lastname_f || ' ' || s.lastname_m AS student_name,
+                           n.id AS note_id, n.class_participation, n.exercises, n.homework,
+                           n.exams, n.church_class, n.finall
+                    FROM history h
+                    JOIN student s ON s.id = h.student_id
+                    LEFT JOIN notes n ON n.student_id = s.id AND n.grade_id = h.group_id AND n.period = %s
+                    WHERE h.group_id = ANY(%s) AND h.status = 'activo'
+                    ORDER BY h.group_id, student_name
+                """, (period, group_ids))
+                student_rows = cur.fetchall()
+                
+                # Asistencia del día de todos los grupos (rango semiabierto para usar el índice (grade_id, fecha))
+                cur.execute("""
+                    SELECT grade_id AS group_id, student_id, bool_or(status) AS present
+                    FROM attendance
+                    WHERE grade_id = ANY(%s) AND fecha >= %s AND fecha < %s
+                    GROUP BY grade_id, student_id
+                """, (group_ids, day_start, day_end))
+                attendance = {(row['group_id'], row['student_id']): row['present'] for row in cur.fetchall()}
+        
+        students_by_group = {group_id: [] for group_id in group_ids}
+        seen = set()
+        for row in student_rows:
+            key = (row['group_id'], row['student_id'])
+            # Un estudiante con más de un registro activo en el mismo grupo se muestra una vez
+            if key in seen:
+                continue
+            seen.add(key)
+            students_by_group[row['group_id']].append({
+                'student_id': row['student_id'],
+                'student_name': row['student_name'],
+                'grades': {
+                    'id': row['note_id'] or 0,
+                    'class_participation': row['class_participation'] or 0,
+                    'exercises': row['exercises'] or 0,
+                    'homework': row['homework'] or 0,
+                    'exams': row['exams'] or 0,
+                    'church_class': row['church_class'] or 0,
+                    'finall': row['finall'] or 0,
+                },
+                'present': attendance.get(key)
+            })
+        
+        grupos = []
+        for group in groups:
+            students = students_by_group[group['group_id']]
+            recorded = sum(1 for student in students if student['present'] is not None)
+            grupos.append({
+                "group_id": group['group_id'],
+                "grado": group['grado'],
+                "class_id": group['class_id'],
+                "class_name": group['class_name'],
+                "students": students,
+                "attendance": {
+                    "recorded": recorded,
+                    "total": len(students),
+                    "complete": bool(students) and recorded == len(students)
+                }
+            })
+        
+        return jsonify({
+            "period": period,
+            "date": date,
+            "grupos": grupos
+        }), 200
+        
+    except Exception as e:
+        logger.exception("Error al obtener el gradebook del profesor")
+        return jsonify({"message": "Error al obtener el gradebook del profesor", "error": str(e)}), 500
@@ -1,14 +1,16 @@
 from flask import Blueprint, jsonify, request
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from config.config import Config
+from utils.db import get_db_connection
+from utils.auth import admin_required
+from utils.roster import invalidate_group
+from utils.schema import schema
+from utils.log import get_logger, log_payload
+from utils.search import build_search, normalize_search_term
+from utils.pagination import build_page_query, parse_cursor, split_page, cached_count, approximate_count, invalidate_counts
 import bcrypt
 
 user_bp = Blueprint('user', __name__, url_prefix='/api/usuarios')
-
-def get_db_connection():
-    return psycopg2.connect(**Config.DB_CONFIG, cursor_factory=RealDictCursor)
+logger = get_logger(__name__)
 
 @user_bp.route('', methods=['GET'])
 @jwt_required()
@@ -18,58 +20,62 @@ def get_usuarios():
         # Obtener parámetros de paginación y búsqueda
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
-        search = request.args.get('search', '')
+        search = normalize_search_term(request.args.get('search', ''))
+        cursor = request.args.get('cursor')
+        count_mode = request.args.get('count', 'exact')
         
-        # Calcular offset para la paginación
-        offset = (page - 1) * per_page
+        # Con cursor se pagina por rango sobre la clave de orden; sin cursor se usa el número de página
+        after, valid_cursor = parse_cursor(cursor, search)
+        if not valid_cursor:
+            return jsonify({"message": "Cursor de paginación inválido"}), 400
+        offset = 0 if after else (page - 1) * per_page
         
         conn = get_db_connection()
         cur = conn.cursor()
         
-        # Consulta para contar el total de registros con filtro de búsqueda
-        count_query = """
-            SELECT COUNT(*) as total
-            FROM usuarios
-            WHERE (
-                LOWER(name) LIKE LOWER(%s) OR
-                LOWER(lastname_f) LIKE LOWER(%s) OR
-                LOWER(lastname_m) LIKE LOWER(%s) OR
-                LOWER(email) LIKE LOWER(%s)
-            )
-        """
-        
-        search_pattern = f'%{search}%'
-        cur.execute(count_query, (search_pattern, search_pattern, search_pattern, search_pattern))
-        total_count = cur.fetchone()['total']
+        # Filtro de búsqueda compartido (sin acentos, por trigramas)
+        search_filter = build_search('usuarios', search)
         
-        # Consulta para obtener los usuarios paginados
-        query = """
-            SELECT id, name, lastname_f, lastname_m, email, rol, profesor_type
-            FROM usuarios
-            WHERE (
-                LOWER(name) LIKE LOWER(%s) OR
-                LOWER(lastname_f) LIKE LOWER(%s) OR
-                LOWER(lastname_m) LIKE LOWER(%s) OR
-                LOWER(email) LIKE LOWER(%s)
-            )
-            ORDER BY id
-            LIMIT %s OFFSET %s
-        """
+        # Consulta para contar el total de registros con filtro de búsqueda
+        if count_mode == 'none':
+            total_count = None
+        elif count_mode == 'approx' and not search_filter:
+            total_count = approximate_count(cur, 'usuarios')
+        else:
+            count_query = "SELECT COUNT(*) AS total FROM usuarios"
+            count_params = []
+            if search_filter:
+                count_query += f" WHERE {search_filter[0]}"
+                count_params = search_filter[1]
+            total_count = cached_count(cur, 'usuarios', search, count_query, count_params)
+        
+        # Consulta para obtener los usuarios paginados, ordenados por relevancia si hay búsqueda
+        query, params = build_page_query(
+            "id, name, lastname_f, lastname_m, email, rol, profesor_type",
+            "usuarios",
+            "id",
+            search_filter,
+            after=after,
+            per_page=per_page,
+            offset=offset
+        )
         
-        cur.execute(query, (search_pattern, search_pattern, search_pattern, search_pattern, per_page, offset))
-        usuarios = cur.fetchall()
+        cur.execute(query, params)
+        usuarios, next_cursor = split_page(cur.fetchall(), per_page, search)
         
         # Calcular el total de páginas
-        total_pages = (total_count + per_page - 1) // per_page
+        total_pages = (total_count + per_page - 1) // per_page if total_count is not None else None
         
         # Preparar la respuesta
         response = {
-            "usuarios": list(usuarios),
+            "usuarios": usuarios,
             "pagination": {
                 "total": total_count,
                 "page": page,
                 "per_page": per_page,
-                "total_pages": total_pages
+                "total_pages": total_pages,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
             }
         }
         
@@ -79,8 +85,7 @@ def get_usuarios():
         return jsonify(response), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener usuarios")
         return jsonify({"message": "Error al obtener usuarios", "error": str(e)}), 500
 
 @user_bp.route('/<int:id>', methods=['GET'])
@@ -109,8 +114,7 @@ def get_usuario(id):
         return jsonify(usuario), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener usuario")
         return jsonify({"message": "Error al obtener usuario", "error": str(e)}), 500
 
 @user_bp.route('', methods=['POST'])
@@ -159,6 +163,7 @@ def create_usuario():
         
         new_usuario = cur.fetchone()
         conn.commit()
+        invalidate_counts('usuarios')
         
         cur.close()
         conn.close()
@@ -166,8 +171,7 @@ def create_usuario():
         return jsonify(new_usuario), 201
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al crear usuario")
         return jsonify({"message": "Error al crear usuario", "error": str(e)}), 500
 
 @user_bp.route('/<int:id>', methods=['PUT'])
@@ -248,6 +252,7 @@ def update_usuario(id):
         
         updated_usuario = cur.fetchone()
         conn.commit()
+        invalidate_counts('usuarios')
         
         cur.close()
         conn.close()
@@ -255,8 +260,7 @@ def update_usuario(id):
         return jsonify(updated_usuario), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al actualizar usuario")
         return jsonify({"message": "Error al actualizar usuario", "error": str(e)}), 500
 
 @user_bp.route('/<int:id>', methods=['DELETE'])
@@ -278,6 +282,7 @@ def delete_usuario(id):
         cur.execute("DELETE FROM usuarios WHERE id = %s RETURNING id", (id,))
         deleted = cur.fetchone()
         conn.commit()
+        invalidate_counts('usuarios')
         
         cur.close()
         conn.close()
@@ -288,8 +293,7 @@ def delete_usuario(id):
             return jsonify({"message": "No se pudo eliminar el usuario"}), 500
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al eliminar usuario")
         return jsonify({"message": "Error al eliminar usuario", "error": str(e)}), 500
 
 @user_bp.route('/<int:id>/materias', methods=['GET'])
@@ -297,37 +301,21 @@ def delete_usuario(id):
 def get_materias_profesor(id):
     """Endpoint para obtener las materias asignadas a un profesor"""
     try:
-        print(f"Obteniendo materias para el profesor ID: {id}")
         conn = get_db_connection()
         cur = conn.cursor()
         
         # Verificar si el usuario existe
         cur.execute("SELECT id, name, lastname_f, lastname_m FROM usuarios WHERE id = %s", (id,))
         usuario = cur.fetchone()
-        print(f"Usuario encontrado: {usuario}")
         
         if not usuario:
             cur.close()
             conn.close()
             return jsonify({"message": "Usuario no encontrado"}), 404
         
-        # Comprobar si la tabla group existe
-        cur.execute("""SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'group'
-        )""")
-        group_table_exists = cur.fetchone()['exists']
-        print(f"¿Existe la tabla 'group'?: {group_table_exists}")
-        
-        # Comprobar si la tabla class existe
-        cur.execute("""SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'class'
-        )""")
-        class_table_exists = cur.fetchone()['exists']
-        print(f"¿Existe la tabla 'class'?: {class_table_exists}")
+        # Comprobar en el registro de esquema (en memoria) que existan las tablas y columnas necesarias
+        group_table_exists = schema.has_table('group')
+        class_table_exists = schema.has_table('class')
         
         # Si alguna de las tablas no existe, devolver una lista vacía
         if not group_table_exists or not class_table_exists:
@@ -343,28 +331,13 @@ def get_materias_profesor(id):
             conn.close()
             return jsonify(response), 200
         
-        # Verificar la estructura de la tabla group
-        cur.execute("""SELECT column_name 
-                      FROM information_schema.columns 
-                      WHERE table_name = 'group'""")
-        group_columns = [col['column_name'] for col in cur.fetchall()]
-        print(f"Columnas de la tabla 'group': {group_columns}")
-        
-        # Verificar la estructura de la tabla class
-        cur.execute("""SELECT column_name 
-                      FROM information_schema.columns 
-                      WHERE table_name = 'class'""")
-        class_columns = [col['column_name'] for col in cur.fetchall()]
-        print(f"Columnas de la tabla 'class': {class_columns}")
+        group_columns = sorted(schema.columns('group'))
+        class_columns = sorted(schema.columns('class'))
         
         # Verificar si las columnas necesarias existen
         has_required_columns = (
-            'professor_id' in group_columns and
-            'class_id' in group_columns and
-            'id' in group_columns and
-            'grade' in group_columns and
-            'id' in class_columns and
-            'name' in class_columns
+            schema.has_columns('group', 'professor_id', 'class_id', 'id', 'grade') and
+            schema.has_columns('class', 'id', 'name')
         )
         
         if not has_required_columns:
@@ -396,7 +369,7 @@ def get_materias_profesor(id):
             """, (id,))
             
             materias = cur.fetchall()
-            print(f"Materias encontradas: {materias}")
+            log_payload(logger, "Materias del profesor", materias)
             
             # Preparar la respuesta
             response = {
@@ -404,7 +377,7 @@ def get_materias_profesor(id):
                 "materias": list(materias)
             }
         except Exception as e:
-            print(f"Error al ejecutar la consulta SQL: {str(e)}")
+            logger.exception("Error al obtener las materias del profesor %s", id)
             # Si hay un error en la consulta, devolver información de depuración
             response = {
                 "usuario": usuario,
@@ -422,8 +395,7 @@ def get_materias_profesor(id):
         return jsonify(response), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener materias del profesor")
         return jsonify({"message": "Error al obtener materias del profesor", "error": str(e)}), 500
 
 @user_bp.route('/materias-disponibles', methods=['GET'])
@@ -431,25 +403,16 @@ def get_materias_profesor(id):
 def get_materias_disponibles():
     """Endpoint para obtener las materias que no tienen profesor asignado"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
         # Verificar si las tablas necesarias existen
-        cur.execute("""SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'class'
-        )""")
-        class_table_exists = cur.fetchone()['exists']
-        
-        if not class_table_exists:
-            cur.close()
-            conn.close()
+        if not schema.has_table('class'):
             return jsonify({
                 "materias": [],
                 "message": "Las tablas necesarias no existen"
             }), 200
         
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
         # Consulta modificada para obtener materias que no están asignadas a ningún grupo o historial
         # O que tienen grupos con professor_id = NULL (materias desasignadas)
         cur.execute("""
@@ -493,8 +456,7 @@ def get_materias_disponibles():
         }), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener materias disponibles")
         return jsonify({"message": "Error al obtener materias disponibles", "error": str(e)}), 500
 
 @user_bp.route('/<int:profesor_id>/asignar-materia', methods=['POST'])
@@ -577,6 +539,8 @@ def asignar_materia(profesor_id):
                 return jsonify({"message": "Error al crear el grupo"}), 500
         
         conn.commit()
+        if grupo_info:
+            invalidate_group(grupo_info['id'])
         cur.close()
         conn.close()
         
@@ -597,8 +561,7 @@ def asignar_materia(profesor_id):
         return jsonify(response), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al asignar materia")
         return jsonify({"message": "Error al asignar materia", "error": str(e)}), 500
 
 @user_bp.route('/<int:profesor_id>/desasignar-materia', methods=['POST'])
@@ -645,40 +608,23 @@ def desasignar_materia(profesor_id):
         return jsonify({"message": "Materia desasignada correctamente"}), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al desasignar materia")
         return jsonify({"message": "Error al desasignar materia", "error": str(e)}), 500
 
 @user_bp.route('/groups', methods=['GET'])
 def get_all_groups():
     """Endpoint para obtener todos los grupos disponibles"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
         # Verificar si las tablas necesarias existen
-        cur.execute("""SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'group'
-        )""")
-        group_table_exists = cur.fetchone()['exists']
-        
-        cur.execute("""SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'class'
-        )""")
-        class_table_exists = cur.fetchone()['exists']
-        
-        if not group_table_exists or not class_table_exists:
-            cur.close()
-            conn.close()
+        if not schema.has_tables('group', 'class'):
             return jsonify({
                 "groups": [],
                 "message": "Las tablas necesarias no existen"
             }), 200
         
+        conn = get_db_connection()
+        cur = conn.cursor()
+        
         # Obtener solo los grados únicos sin repetir
         cur.execute("""
             SELECT DISTINCT
@@ -697,6 +643,19 @@ def get_all_groups():
         }), 200
         
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error al obtener grupos")
         return jsonify({"message": "Error al obtener grupos", "error": str(e)}), 500
+
+@user_bp.route('/schema/refresh', methods=['POST'])
+@admin_required
+def refresh_schema():
+    """Endpoint para recargar el registro de esquema después de cambios en la base de datos"""
+    try:
+        tables = schema.refresh()
+        return jsonify({
+            "message": "Esquema recargado correctamente",
+            "tables": sorted(tables)
+        }), 200
+    except Exception as e:
+        logger.exception("Error al recargar el esquema")
+        return jsonify({"message": "Error al recargar el esquema", "error": str(e)}), 500
@@ -1,18 +0,0 @@
--- Crear tabla de asistencia si no existe
-CREATE TABLE IF NOT EXISTS attendance (
-    id SERIAL PRIMARY KEY,
-    student_id INTEGER NOT NULL,
-    group_id INTEGER NOT NULL,
-    date DATE NOT NULL,
-    present BOOLEAN DEFAULT FALSE,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (student_id) REFERENCES student(id),
-    FOREIGN KEY (group_id) REFERENCES "group"(id),
-    UNIQUE (student_id, group_id, date)
-);
-
--- Crear índices para mejorar el rendimiento
-CREATE INDEX IF NOT EXISTS idx_attendance_student_id ON attendance(student_id);
-CREATE INDEX IF NOT EXISTS idx_attendance_group_id ON attendance(group_id);
-CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(date);
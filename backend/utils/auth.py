@@ -0,0 +1,58 @@
+from flask import jsonify
+from functools import wraps
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+
+from config.config import Config
+from utils.db import get_db_connection
+
+
+def parse_roles(value):
+    """Convierte una lista de ids de rol separados por comas ("1,3") en un conjunto de cadenas"""
+    return {role.strip() for role in str(value).split(',') if role.strip()}
+
+
+def current_user_role():
+    """
+    Rol del usuario del token JWT de la petición, o None si no hay token.
+
+    Usa el claim `rol` que agrega /api/login; los tokens emitidos por /api/refresh
+    no lo tienen y en ese caso se consulta usuarios.rol.
+    """
+    verify_jwt_in_request(optional=True)
+    user_id = get_jwt_identity()
+    if user_id is None:
+        return None
+    role = get_jwt().get('rol')
+    if role is not None:
+        return role
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT rol FROM usuarios WHERE id = %s", (int(user_id),))
+            row = cur.fetchone()
+    return row['rol'] if row else None
+
+
+def has_role(roles):
+    """Indica si el usuario de la petición tiene uno de los roles; sin token o con token inválido es False"""
+    try:
+        return str(current_user_role()) in roles
+    except Exception:
+        return False
+
+
+def admin_required(f):
+    """
+    Decorador que exige un token JWT de un usuario con rol de administrador (ADMIN_ROLES).
+
+    Uso:
+        @bp.route('/ruta')
+        @admin_required
+        def mi_funcion():
+            ...
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not has_role(parse_roles(Config.ADMIN_ROLES)):
+            return jsonify({"message": "Se requiere un usuario administrador", "success": False}), 403
+        return f(*args, **kwargs)
+    return decorated_function
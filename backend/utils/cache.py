@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+
+_named_caches = {}
+
+
+def named_caches():
+    """Devuelve {nombre: caché} de los cachés creados con `name`"""
+    return dict(_named_caches)
+
+
+class TTLCache:
+    """
+    Caché en memoria LRU con expiración, seguro entre hilos.
+
+    - Guarda como máximo `maxsize` entradas; al exceder el límite se descarta
+      la usada hace más tiempo.
+    - Cada entrada expira `ttl` segundos después de guardarse.
+    - Lleva contadores de aciertos, fallos, expiraciones y desalojos.
+    - Si se le da un `name`, queda registrado en named_caches() (lo usa /metrics).
+
+    Uso:
+        cache = TTLCache(maxsize=256, ttl=60)
+        valor = cache.get(clave)
+        if valor is None:
+            valor = calcular()
+            cache.set(clave, valor)
+    """
+
+    def __init__(self, maxsize=128, ttl=60, name=None):
+        if maxsize < 1:
+            raise ValueError("maxsize debe ser al menos 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expirations = 0
+        self._evictions = 0
+        if name is not None:
+            _named_caches[name] = self
+
+    def get(self, key, default=None):
+        """Devuelve el valor guardado o `default` si no existe o expiró"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value):
+        """Guarda un valor, desalojando la entrada menos usada si se excede el tamaño"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key):
+        """Elimina una entrada si existe"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Elimina las entradas para las que predicate(clave, valor) es verdadero"""
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        """Vacía el caché (los contadores se conservan)"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Devuelve contadores de uso del caché"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "expirations": self._expirations,
+                "evictions": self._evictions,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,96 @@
+"""
+Cachés en memoria coherentes entre procesos.
+
+Cada proceso de gunicorn tiene sus propios TTLCache, así que borrar una
+entrada al guardar solo afecta al proceso que atendió la escritura. Para que
+una escritura invalide el caché de todos, la tabla cache_versions guarda un
+contador por (ámbito, llave), p. ej. ('grades', id del grupo):
+
+- las escrituras lo incrementan en su misma transacción (VersionedCache.bump)
+  y, después del commit, lo registran en el proceso (VersionedCache.invalidated);
+- las lecturas lo consultan antes de leer los datos (VersionedCache.version),
+  con una búsqueda por clave primaria, y solo sirven una entrada construida
+  con esa misma versión;
+- una entrada construida con una versión anterior a la última conocida por el
+  proceso no se guarda, así una lectura que empezó antes de una escritura no
+  vuelve a dejar datos viejos en el caché.
+"""
+import threading
+
+
+def current_version(cur, scope, key):
+    """Versión actual de (scope, key); 0 si nunca se ha escrito"""
+    cur.execute("SELECT version FROM cache_versions WHERE scope = %s AND key = %s", (scope, key))
+    row = cur.fetchone()
+    return row['version'] if row else 0
+
+
+def bump_version(cur, scope, key):
+    """Incrementa la versión de (scope, key) dentro de la transacción de `cur` y devuelve la nueva"""
+    cur.execute("""
+        INSERT INTO cache_versions (scope, key, version) VALUES (%s, %s, 1)
+        ON CONFLICT (scope, key) DO UPDATE SET version = cache_versions.version + 1
+        RETURNING version
+    """, (scope, key))
+    return cur.fetchone()['version']
+
+
+class VersionedCache:
+    """
+    TTLCache cuyas entradas llevan la versión de cache_versions con que se construyeron.
+
+    `version_key` es la llave de cache_versions (p. ej. el id del grupo) y
+    `cache_key` la del caché (p. ej. (grupo, periodo)); varias entradas
+    pueden compartir la misma versión.
+
+    Uso:
+        version = cache.version(cur, group_id)
+        data = cache.get((group_id, period), version)
+        if data is None:
+            data = consultar(cur)
+            cache.set((group_id, period), group_id, version, data)
+    """
+
+    def __init__(self, cache, scope):
+        self.cache = cache
+        self.scope = scope
+        self._floors = {}
+        self._lock = threading.Lock()
+
+    def _raise_floor(self, version_key, version):
+        with self._lock:
+            if version > self._floors.get(version_key, 0):
+                self._floors[version_key] = version
+
+    def version(self, cur, version_key):
+        """Lee la versión actual; debe llamarse antes de consultar los datos que se van a guardar"""
+        version = current_version(cur, self.scope, version_key)
+        self._raise_floor(version_key, version)
+        return version
+
+    def get(self, cache_key, version):
+        """Devuelve el valor guardado si se construyó con `version`, o None"""
+        entry = self.cache.get(cache_key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        return None
+
+    def set(self, cache_key, version_key, version, value):
+        """Guarda el valor salvo que ya se conozca una versión más nueva; devuelve si se guardó"""
+        with self._lock:
+            if version < self._floors.get(version_key, 0):
+                return False
+            self.cache.set(cache_key, (version, value))
+            return True
+
+    def bump(self, cur, version_key):
+        """
+        Invalida las entradas de `version_key` en todos los procesos; se llama dentro de la transacción de la escritura.
+
+        Devuelve la nueva versión, que se pasa a invalidated() después del commit.
+        """
+        return bump_version(cur, self.scope, version_key)
+
+    def invalidated(self, version_key, version):
+        """Registra en este proceso la versión de una escritura ya confirmada"""
+        self._raise_floor(version_key, version)
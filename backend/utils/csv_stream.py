@@ -0,0 +1,22 @@
+import csv
+
+
+class _EchoBuffer:
+    """Objeto tipo archivo que devuelve lo que se le escribe, para usar csv.writer sin buffer"""
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """
+    Convierte un iterable de filas en líneas CSV, una a la vez.
+
+    Permite construir respuestas Flask que emiten el CSV de forma incremental
+    sin acumular todo el archivo en memoria.
+
+    Uso:
+        return Response(stream_with_context(iter_csv(filas)), mimetype='text/csv')
+    """
+    writer = csv.writer(_EchoBuffer())
+    for row in rows:
+        yield writer.writerow(row)
@@ -1,29 +1,455 @@
+import threading
+import time
+from collections import deque
+
 import psycopg2
+import psycopg2.extensions
+import psycopg2.sql
 from psycopg2.extras import RealDictCursor
-from contextlib import contextmanager
+from flask import g, has_request_context
 from config.config import Config
 
-@contextmanager
+
+class PoolTimeoutError(Exception):
+    """Error cuando no hay conexiones disponibles en el pool dentro del tiempo de espera"""
+    pass
+
+
+_query_listeners = []
+_instrumented_cursor_classes = {}
+
+
+def add_query_listener(listener):
+    """
+    Registra una función que se llama después de cada sentencia ejecutada.
+
+    La función recibe (query, duration) donde query es el texto SQL y duration
+    el tiempo en segundos. Solo aplica a cursores creados por conexiones del pool.
+    """
+    if listener not in _query_listeners:
+        _query_listeners.append(listener)
+
+
+def remove_query_listener(listener):
+    """Elimina una función registrada con add_query_listener"""
+    if listener in _query_listeners:
+        _query_listeners.remove(listener)
+
+
+def _notify_query(cur, query, duration):
+    if isinstance(query, psycopg2.sql.Composable):
+        query = query.as_string(cur)
+    elif isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    for listener in list(_query_listeners):
+        try:
+            listener(query, duration)
+        except Exception:
+            pass
+
+
+def _instrumented_cursor_class(base):
+    """Devuelve una subclase de `base` que mide el tiempo de execute/executemany"""
+    cls = _instrumented_cursor_classes.get(base)
+    if cls is None:
+        class InstrumentedCursor(base):
+            def execute(self, query, vars=None):
+                start = time.perf_counter()
+                try:
+                    return super().execute(query, vars)
+                finally:
+                    _notify_query(self, query, time.perf_counter() - start)
+
+            def executemany(self, query, vars_list):
+                start = time.perf_counter()
+                try:
+                    return super().executemany(query, vars_list)
+                finally:
+                    _notify_query(self, query, time.perf_counter() - start)
+
+        InstrumentedCursor.__name__ = f"Instrumented{base.__name__}"
+        cls = _instrumented_cursor_classes[base] = InstrumentedCursor
+    return cls
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    Conexión de psycopg2 que pertenece a un pool.
+
+    Llamar a close() devuelve la conexión al pool en lugar de cerrarla, de modo
+    que el código existente que hace `conn.close()` sigue funcionando igual.
+    Usada como contexto (`with get_db_connection() as conn:`) hace commit al
+    salir sin errores, rollback si hubo una excepción, y la devuelve al pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        # Número de préstamo actual; cambia cada vez que el pool la entrega
+        self.checkout_id = 0
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+    def cursor(self, *args, **kwargs):
+        if _query_listeners:
+            base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+            kwargs['cursor_factory'] = _instrumented_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def discard(self):
+        """Cierra físicamente la conexión sin devolverla al pool"""
+        if not self.closed:
+            super().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        try:
+            if not self.closed:
+                if exc_type is None:
+                    self.commit()
+                else:
+                    self.rollback()
+        finally:
+            self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones PostgreSQL seguro entre hilos.
+
+    - Mantiene al menos `minconn` conexiones abiertas y nunca más de `maxconn`.
+    - Si todas están ocupadas, espera hasta `timeout` segundos y luego lanza
+      PoolTimeoutError.
+    - Las conexiones con más de `max_lifetime` segundos se reemplazan.
+    - Las conexiones inactivas más de `health_check_interval` segundos se
+      verifican con `SELECT 1` antes de entregarse.
+    """
+
+    def __init__(self, dsn_params, minconn=1, maxconn=10, timeout=30,
+                 max_lifetime=1800, health_check_interval=30):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Configuración de pool inválida: se requiere 0 <= minconn <= maxconn y maxconn >= 1")
+
+        self.dsn_params = dict(dsn_params)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()
+        self._in_use = set()
+        # Conexiones prestadas cuyo rollback de devolución está en curso
+        self._releasing = set()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "failed_health_checks": 0,
+        }
+
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+            self._stats["created"] += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(
+            **self.dsn_params,
+            connection_factory=PooledConnection,
+            cursor_factory=RealDictCursor
+        )
+        conn.pool = self
+        return conn
+
+    def _total(self):
+        return len(self._idle) + len(self._in_use)
+
+    def _is_expired(self, conn):
+        return self.max_lifetime and time.monotonic() - conn.created_at > self.max_lifetime
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - conn.last_used_at < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self):
+        """
+        Obtiene una conexión del pool, esperando si es necesario.
+
+        La verificación de salud (`SELECT 1`) se hace fuera del lock para que
+        una conexión lenta o medio abierta no detenga al resto de los hilos.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                conn = placeholder = None
+                while True:
+                    if self._closed:
+                        raise PoolTimeoutError("El pool de conexiones está cerrado")
+
+                    if self._idle:
+                        # Se marca como prestada mientras se verifica fuera del lock
+                        conn = self._idle.pop()
+                        self._in_use.add(conn)
+                        break
+
+                    if self._total() < self.maxconn:
+                        # Reservar el lugar antes de conectar fuera del lock
+                        placeholder = object()
+                        self._in_use.add(placeholder)
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"No hay conexiones disponibles después de {self.timeout} segundos"
+                        )
+                    self._stats["waits"] += 1
+                    self._cond.wait(remaining)
+
+            if placeholder is not None:
+                break
+
+            if self._is_expired(conn):
+                reason = "recycled"
+            elif not self._is_healthy(conn):
+                reason = "failed_health_checks"
+            else:
+                with self._cond:
+                    return self._checkout(conn)
+
+            conn.discard()
+            with self._cond:
+                self._in_use.discard(conn)
+                self._stats[reason] += 1
+                self._cond.notify()
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use.discard(placeholder)
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._in_use.discard(placeholder)
+            self._stats["created"] += 1
+            return self._checkout(conn)
+
+    def _checkout(self, conn):
+        self._in_use.add(conn)
+        conn.checkout_id += 1
+        self._stats["checkouts"] += 1
+        return conn
+
+    def owns(self, conn):
+        """Indica si la conexión está prestada actualmente por este pool"""
+        with self._cond:
+            return conn in self._in_use
+
+    def release(self, conn, checkout_id=None):
+        """
+        Devuelve una conexión al pool descartando cualquier transacción abierta.
+
+        Con `checkout_id` solo se devuelve si sigue siendo ese préstamo; si la
+        conexión ya se devolvió y otro hilo la tomó, no se toca.
+        """
+        with self._cond:
+            if conn not in self._in_use or conn in self._releasing:
+                return
+            if checkout_id is not None and conn.checkout_id != checkout_id:
+                return
+            self._releasing.add(conn)
+
+        # El rollback va al servidor: se hace fuera del lock, la conexión sigue contada como prestada
+        keep = not conn.closed
+        if keep:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        with self._cond:
+            self._releasing.discard(conn)
+            self._in_use.discard(conn)
+            keep = keep and not self._closed
+
+            if keep and self._is_expired(conn):
+                self._stats["recycled"] += 1
+                keep = False
+
+            if keep:
+                conn.last_used_at = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+        if not keep:
+            conn.discard()
+
+    def close(self):
+        """Cierra todas las conexiones inactivas; las ocupadas se cierran al liberarse"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().discard()
+            self._cond.notify_all()
+
+    def stats(self):
+        """Devuelve estadísticas de uso del pool"""
+        with self._cond:
+            in_use = sum(1 for conn in self._in_use if isinstance(conn, PooledConnection))
+            return {
+                "size": self._total(),
+                "idle": len(self._idle),
+                "in_use": in_use,
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_config = None
+_pool_lock = threading.Lock()
+_inherited_pools = []
+
+
+def create_pool(config=None):
+    """
+    Crea un pool de conexiones a partir de la configuración.
+
+    Args:
+        config: Mapeo con las claves DB_CONFIG y DB_POOL_* (por ejemplo app.config).
+                Si no se proporciona, se usan los valores de Config.
+    """
+    if config is None:
+        config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    return ConnectionPool(
+        config['DB_CONFIG'],
+        minconn=config['DB_POOL_MIN'],
+        maxconn=config['DB_POOL_MAX'],
+        timeout=config['DB_POOL_TIMEOUT'],
+        max_lifetime=config['DB_POOL_MAX_LIFETIME'],
+        health_check_interval=config['DB_POOL_HEALTH_CHECK_INTERVAL'],
+    )
+
+
+def init_db_pool(app):
+    """
+    Inicializa el pool de conexiones compartido de la aplicación.
+
+    Se llama desde create_app; reemplaza cualquier pool previo. También
+    registra un teardown que devuelve al pool las conexiones que un endpoint
+    haya dejado abiertas (por ejemplo, al salir por una excepción antes de
+    llamar a conn.close()).
+    """
+    global _pool, _pool_config
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool_config = app.config
+        _pool = create_pool(app.config)
+        app.extensions['db_pool'] = _pool
+
+    @app.teardown_request
+    def release_request_connections(exc):
+        # Solo se devuelven los préstamos de esta petición: una conexión que el
+        # endpoint ya cerró puede estar prestada ahora a otro hilo
+        for conn, checkout_id in g.pop('_db_connections', []):
+            if conn.pool is not None:
+                conn.pool.release(conn, checkout_id)
+
+    return _pool
+
+
+def get_pool():
+    """Devuelve el pool compartido, creándolo con la configuración por defecto si no existe"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = create_pool(_pool_config)
+    return _pool
+
+
+def close_db_pool():
+    """Cierra el pool compartido"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def reset_db_pool_after_fork(app=None):
+    """
+    Reemplaza el pool heredado por uno nuevo en un proceso hijo.
+
+    Se llama desde el hook post_fork de gunicorn. Las conexiones heredadas del
+    proceso padre se abandonan sin cerrarlas: sus sockets son compartidos y
+    cerrarlas desde el hijo terminaría también la sesión del padre.
+    """
+    global _pool, _pool_lock
+    if _pool is not None:
+        # Mantener la referencia evita que el recolector cierre las conexiones heredadas
+        _inherited_pools.append(_pool)
+    _pool_lock = threading.Lock()
+    _pool = create_pool(_pool_config)
+    if app is not None:
+        app.extensions['db_pool'] = _pool
+    return _pool
+
+
 def get_db_connection():
     """
-    Contexto para manejar conexiones a la base de datos.
-    Garantiza que las conexiones se cierren correctamente después de su uso.
-    
-    Uso:
+    Obtiene una conexión del pool compartido.
+
+    La conexión usa RealDictCursor por defecto y puede usarse de dos formas:
+
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT * FROM tabla")
                 resultados = cur.fetchall()
+
+    o bien
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        ...
+        cur.close()
+        conn.close()  # Devuelve la conexión al pool
+
+    Como contexto hace commit al terminar sin errores y rollback si ocurre una
+    excepción. Al devolverse al pool se descarta cualquier transacción sin commit.
     """
-    conn = None
-    try:
-        conn = psycopg2.connect(**Config.DB_CONFIG, cursor_factory=RealDictCursor)
-        yield conn
-        conn.commit()
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
-    finally:
-        if conn:
-            conn.close()
+    conn = get_pool().acquire()
+    if has_request_context():
+        g.setdefault('_db_connections', []).append((conn, conn.checkout_id))
+    return conn
@@ -1,5 +1,7 @@
 from flask import jsonify
-import traceback
+from utils.log import get_logger
+
+logger = get_logger(__name__)
 
 class APIError(Exception):
     """Clase base para errores de API personalizados"""
@@ -49,5 +51,5 @@ def register_error_handlers(app):
     @app.errorhandler(500)
     def handle_server_error(error):
         # En producción, no mostrar el error completo
-        traceback.print_exc()
+        logger.exception("Error interno del servidor")
         return jsonify({"message": "Error interno del servidor"}), 500
@@ -0,0 +1,206 @@
+"""
+Logging estructurado de la aplicación.
+
+- Cada petición recibe un identificador de correlación (el encabezado
+  X-Request-ID si el cliente o el proxy lo envían, o uno nuevo) que se agrega a
+  todos los registros emitidos durante la petición y se devuelve en la
+  respuesta.
+- Los registros se encolan con un QueueHandler y un hilo aparte los formatea y
+  escribe en stdout, de modo que las peticiones no esperan a la salida. Si la
+  cola se llena los registros se descartan en lugar de bloquear.
+- Los volcados de depuración grandes (cuerpos de petición, listas completas)
+  se registran con log_payload: solo se formatean si el nivel DEBUG está
+  activo y la petición fue elegida por muestreo (LOG_DEBUG_SAMPLE_RATE).
+
+Uso:
+    from utils.log import get_logger, log_payload
+
+    logger = get_logger(__name__)
+    logger.info("Asistencia guardada: %d cambios", changed)
+    log_payload(logger, "Cuerpo recibido", data)
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+LOGGER_NAME = 'copadb'
+REQUEST_ID_HEADER = 'X-Request-ID'
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'
+
+_VALID_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,128}$')
+
+_queue_handler = None
+_listener = None
+_output_handlers = []
+_sample_rate = 0.0
+
+
+def get_logger(name):
+    """Devuelve el logger de un módulo dentro de la jerarquía de la aplicación"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def current_request_id():
+    """Identificador de correlación de la petición actual, o None fuera de una petición"""
+    return g.get('request_id') if has_request_context() else None
+
+
+class RequestContextFilter(logging.Filter):
+    """Agrega request_id, método y ruta de la petición actual a cada registro"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id', '-')
+            record.method = request.method
+            record.path = request.path
+        else:
+            record.request_id = '-'
+            record.method = None
+            record.path = None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como un objeto JSON en una sola línea"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'method', None):
+            entry['method'] = record.method
+            entry['path'] = record.path
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler que descarta registros si la cola está llena en lugar de bloquear"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # El formato final (texto o JSON) lo aplica el hilo de escritura; aquí solo se
+        # resuelve el mensaje y se conserva la excepción como texto
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def payload_sampled():
+    """Indica si la petición actual fue elegida para registrar volcados de depuración"""
+    if not has_request_context():
+        return random.random() < _sample_rate
+    sampled = g.get('_log_sampled')
+    if sampled is None:
+        sampled = g._log_sampled = random.random() < _sample_rate
+    return sampled
+
+
+def log_payload(logger, message, payload):
+    """Registra en DEBUG un volcado grande solo si el nivel está activo y la petición fue muestreada"""
+    if logger.isEnabledFor(logging.DEBUG) and payload_sampled():
+        logger.debug("%s: %s", message, payload)
+
+
+def _start_listener(queue_size):
+    global _listener
+    _queue_handler.queue = queue.Queue(maxsize=queue_size)
+    _listener = QueueListener(_queue_handler.queue, *_output_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def init_logging(app):
+    """
+    Configura el logging de la aplicación.
+
+    Se llama al inicio de create_app. Configura el logger `copadb` (usado por
+    get_logger) y app.logger con el nivel LOG_LEVEL, el formato LOG_FORMAT
+    (json o text) y la cola de escritura; además asigna el identificador de
+    correlación de cada petición.
+    """
+    global _queue_handler, _output_handlers, _sample_rate
+
+    _stop_listener()
+    _sample_rate = app.config.get('LOG_DEBUG_SAMPLE_RATE', 0.0)
+    queue_size = app.config.get('LOG_QUEUE_SIZE', 10000)
+    level = logging.getLevelName(app.config.get('LOG_LEVEL', 'INFO').upper())
+
+    output = logging.StreamHandler(sys.stdout)
+    if app.config.get('LOG_FORMAT', 'json') == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+    _output_handlers = [output]
+
+    if _queue_handler is None:
+        _queue_handler = NonBlockingQueueHandler(None)
+        _queue_handler.addFilter(RequestContextFilter())
+    _start_listener(queue_size)
+
+    for logger in (logging.getLogger(LOGGER_NAME), app.logger):
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(_queue_handler)
+        logger.setLevel(level)
+        logger.propagate = False
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if _VALID_REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def add_request_id_header(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+
+def _restart_listener_after_fork():
+    # Los hilos no sobreviven a fork: el proceso hijo necesita su propio hilo de escritura
+    global _listener
+    if _queue_handler is not None and _listener is not None:
+        _listener = None
+        _start_listener(_queue_handler.queue.maxsize)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+atexit.register(_stop_listener)
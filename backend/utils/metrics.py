@@ -0,0 +1,158 @@
+"""
+Métricas Prometheus expuestas en GET /metrics.
+
+- Peticiones por blueprint, endpoint, método y estado, e histograma de su
+  duración (hasta enviar los encabezados; el streaming de reportes CSV no se
+  incluye).
+- Histograma de la duración de cada sentencia SQL, mediante un listener del
+  pool de conexiones.
+- Aciertos, fallos, desalojos y tamaño de los cachés con nombre (roster,
+  grades, attendance, counts) y utilización del pool de conexiones. Estos
+  valores se leen de los contadores internos como máximo cada
+  METRICS_REFRESH_INTERVAL segundos por proceso, y siempre al atender /metrics.
+
+Con varios procesos (gunicorn) se usa el modo multiproceso de
+prometheus_client: antes de arrancar se define PROMETHEUS_MULTIPROC_DIR con un
+directorio escribible. gunicorn.conf.py lo vacía al iniciar el maestro y
+descarta las métricas de los procesos que terminan.
+"""
+import hmac
+import os
+import threading
+import time
+
+from flask import Response, g, jsonify, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+from utils.cache import named_caches
+from utils.db import add_query_listener, get_pool
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+HTTP_REQUESTS = Counter(
+    'copadb_http_requests_total', 'Peticiones HTTP atendidas',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+HTTP_REQUEST_DURATION = Histogram(
+    'copadb_http_request_duration_seconds', 'Duración de las peticiones HTTP',
+    ['blueprint', 'endpoint', 'method'], buckets=REQUEST_BUCKETS
+)
+DB_QUERY_DURATION = Histogram(
+    'copadb_db_query_duration_seconds', 'Duración de las sentencias SQL', buckets=QUERY_BUCKETS
+)
+
+CACHE_LOOKUPS = Counter('copadb_cache_lookups_total', 'Consultas a los cachés en memoria', ['cache', 'result'])
+CACHE_EVICTIONS = Counter('copadb_cache_evictions_total', 'Entradas desalojadas por tamaño', ['cache'])
+CACHE_ENTRIES = Gauge('copadb_cache_entries', 'Entradas en caché', ['cache'], multiprocess_mode='livesum')
+CACHE_HIT_RATIO = Gauge(
+    'copadb_cache_hit_ratio', 'Proporción de aciertos desde el inicio del proceso', ['cache'],
+    multiprocess_mode='liveall'
+)
+
+POOL_CONNECTIONS = Gauge(
+    'copadb_db_pool_connections', 'Conexiones del pool por estado', ['state'], multiprocess_mode='livesum'
+)
+POOL_MAX_CONNECTIONS = Gauge(
+    'copadb_db_pool_max_connections', 'Máximo de conexiones del pool', multiprocess_mode='livesum'
+)
+POOL_EVENTS = Counter(
+    'copadb_db_pool_events_total', 'Eventos del pool (checkouts, esperas, timeouts, conexiones creadas o recicladas)',
+    ['event']
+)
+POOL_EVENT_KEYS = ('checkouts', 'waits', 'timeouts', 'created', 'recycled', 'failed_health_checks')
+
+_refresh_lock = threading.Lock()
+_next_refresh = 0.0
+# Últimos valores leídos de los contadores internos, para incrementar los de Prometheus con la diferencia
+_last_seen = {}
+
+
+def _advance(counter, key, value):
+    previous = _last_seen.get(key, 0)
+    # Si el contador interno se reinició (p. ej. un pool nuevo tras fork) se cuenta desde cero
+    delta = value - previous if value >= previous else value
+    if delta:
+        counter.inc(delta)
+    _last_seen[key] = value
+
+
+def refresh_runtime_metrics(interval=0.0):
+    """Actualiza las métricas de cachés y pool si pasaron `interval` segundos desde la última vez"""
+    global _next_refresh
+    now = time.monotonic()
+    if now < _next_refresh or not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        _next_refresh = now + interval
+
+        for name, cache in named_caches().items():
+            stats = cache.stats()
+            _advance(CACHE_LOOKUPS.labels(name, 'hit'), ('cache', name, 'hits'), stats['hits'])
+            _advance(CACHE_LOOKUPS.labels(name, 'miss'), ('cache', name, 'misses'), stats['misses'])
+            _advance(CACHE_EVICTIONS.labels(name), ('cache', name, 'evictions'), stats['evictions'])
+            CACHE_ENTRIES.labels(name).set(stats['size'])
+            CACHE_HIT_RATIO.labels(name).set(stats['hit_ratio'])
+
+        stats = get_pool().stats()
+        POOL_CONNECTIONS.labels('idle').set(stats['idle'])
+        POOL_CONNECTIONS.labels('in_use').set(stats['in_use'])
+        POOL_MAX_CONNECTIONS.set(stats['maxconn'])
+        for key in POOL_EVENT_KEYS:
+            _advance(POOL_EVENTS.labels(key), ('pool', key), stats[key])
+    finally:
+        _refresh_lock.release()
+
+
+def _observe_query(query, duration):
+    DB_QUERY_DURATION.observe(duration)
+
+
+def _registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def init_metrics(app):
+    """
+    Registra la recolección de métricas y el endpoint GET /metrics.
+
+    Se llama desde create_app. Se desactiva con METRICS_ENABLED=False. Si se
+    define METRICS_TOKEN, /metrics exige el encabezado Authorization: Bearer.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    refresh_interval = app.config.get('METRICS_REFRESH_INTERVAL', 5)
+    token = app.config.get('METRICS_TOKEN')
+    add_query_listener(_observe_query)
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            blueprint = request.blueprint or ''
+            endpoint = request.endpoint or 'unmatched'
+            HTTP_REQUEST_DURATION.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+        refresh_runtime_metrics(refresh_interval)
+        return response
+
+    def metrics():
+        if token:
+            supplied = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(supplied, f'Bearer {token}'):
+                return jsonify({"message": "No autorizado"}), 401
+        refresh_runtime_metrics()
+        return Response(generate_latest(_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
@@ -0,0 +1,402 @@
+"""
+Migraciones SQL versionadas.
+
+Los archivos de migrations/ se nombran NNNN_descripcion.sql y se aplican en
+orden numérico. Cada versión aplicada se registra en la tabla schema_migrations
+junto con el checksum del archivo, de modo que `flask db upgrade` solo ejecuta
+las pendientes y `flask db status` advierte si un archivo aplicado cambió.
+
+Por defecto cada archivo se ejecuta dentro de una transacción. Los archivos que
+empiezan con la directiva `-- migrate: no-transaction` (necesaria para
+CREATE INDEX CONCURRENTLY) se ejecutan sentencia por sentencia en modo
+autocommit; por eso deben ser idempotentes (IF NOT EXISTS).
+
+Comandos:
+    flask --app app db upgrade   # Aplica las migraciones pendientes
+    flask --app app db status    # Muestra las migraciones aplicadas y pendientes
+    flask --app app db verify    # Comprueba con EXPLAIN que las consultas frecuentes usan índices
+    flask --app app db partitions  # Crea las particiones futuras de attendance y separa las antiguas
+    flask --app app db plans     # EXPLAIN ANALYZE de las consultas frecuentes y comparación de planes
+"""
+import hashlib
+import json
+import os
+import re
+
+import click
+import psycopg2
+from flask.cli import AppGroup
+
+from config.config import Config
+from utils.partitions import maintain_attendance_partitions
+from utils.query_catalog import HOT_QUERIES, default_sample, plan_index_names
+from utils.query_plans import compare_snapshots, load_snapshot, save_snapshot, snapshot_path, take_snapshot
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+NO_TRANSACTION_DIRECTIVE = '-- migrate: no-transaction'
+
+_FILENAME_RE = re.compile(r'^(\d{4})_([\w-]+)\.sql$')
+_DOLLAR_TAG_RE = re.compile(r'\$[A-Za-z_]*\$')
+
+
+class Migration:
+    """Archivo de migración descubierto en migrations/"""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def read(self):
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    @property
+    def checksum(self):
+        return hashlib.sha256(self.read().encode('utf-8')).hexdigest()
+
+    @property
+    def transactional(self):
+        return not self.read().lstrip().startswith(NO_TRANSACTION_DIRECTIVE)
+
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    """Devuelve las migraciones de `directory` ordenadas por versión"""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME_RE.match(filename)
+        if match:
+            migrations.append(Migration(match.group(1), match.group(2), os.path.join(directory, filename)))
+
+    versions = [migration.version for migration in migrations]
+    duplicated = sorted({version for version in versions if versions.count(version) > 1})
+    if duplicated:
+        raise ValueError(f"Versiones de migración duplicadas: {', '.join(duplicated)}")
+    return migrations
+
+
+def split_statements(sql):
+    """
+    Divide un script SQL en sentencias individuales.
+
+    Respeta cadenas entre comillas, identificadores entre comillas dobles,
+    bloques $$...$$ (con o sin etiqueta) y comentarios de línea.
+    """
+    statements = []
+    current = []
+    i = 0
+    length = len(sql)
+
+    while i < length:
+        char = sql[i]
+
+        if char == '-' and sql.startswith('--', i):
+            end = sql.find('\n', i)
+            end = length if end == -1 else end
+            current.append(sql[i:end])
+            i = end
+            continue
+
+        if char in ("'", '"'):
+            end = i + 1
+            while end < length:
+                if sql[end] == char:
+                    # Comilla duplicada = comilla escapada
+                    if end + 1 < length and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+            continue
+
+        if char == '$':
+            tag = _DOLLAR_TAG_RE.match(sql, i)
+            if tag:
+                end = sql.find(tag.group(0), tag.end())
+                end = length if end == -1 else end + len(tag.group(0))
+                current.append(sql[i:end])
+                i = end
+                continue
+
+        if char == ';':
+            statements.append(''.join(current))
+            current = []
+            i += 1
+            continue
+
+        current.append(char)
+        i += 1
+
+    statements.append(''.join(current))
+    return [statement.strip() for statement in statements if _has_code(statement)]
+
+
+def _has_code(statement):
+    lines = [line.strip() for line in statement.splitlines()]
+    return any(line and not line.startswith('--') for line in lines)
+
+
+def get_migration_connection():
+    """Conexión directa (fuera del pool) para ejecutar migraciones"""
+    return psycopg2.connect(**Config.DB_CONFIG)
+
+
+def ensure_migrations_table(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                checksum TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT now()
+            )
+        """)
+    conn.commit()
+
+
+def applied_migrations(conn):
+    """Devuelve {version: checksum} de las migraciones registradas"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT version, checksum FROM schema_migrations ORDER BY version")
+        return dict(cur.fetchall())
+
+
+def _record_migration(cur, migration):
+    cur.execute(
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+        (migration.version, migration.name, migration.checksum)
+    )
+
+
+def apply_migration(conn, migration):
+    """Aplica una migración y la registra en schema_migrations"""
+    sql = migration.read()
+
+    if migration.transactional:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                _record_migration(cur, migration)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return
+
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for statement in split_statements(sql):
+                cur.execute(statement)
+            _record_migration(cur, migration)
+    finally:
+        conn.autocommit = False
+
+
+def pending_migrations(conn, migrations=None):
+    migrations = discover_migrations() if migrations is None else migrations
+    applied = applied_migrations(conn)
+    return [migration for migration in migrations if migration.version not in applied]
+
+
+def invalid_indexes(conn):
+    """Índices marcados como inválidos (p. ej. un CREATE INDEX CONCURRENTLY interrumpido)"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE NOT i.indisvalid AND n.nspname = current_schema()
+            ORDER BY c.relname
+        """)
+        return [row[0] for row in cur.fetchall()]
+
+
+def with_parent_indexes(conn, index_names):
+    """
+    Agrega a `index_names` los índices padre de los índices de partición.
+
+    En una tabla particionada el plan muestra el índice de cada partición
+    (p. ej. attendance_y2025m03_grade_id_fecha_idx); el catálogo de consultas
+    usa el nombre del índice definido en la tabla padre.
+    """
+    if not index_names:
+        return set()
+    with conn.cursor() as cur:
+        cur.execute("""
+            WITH RECURSIVE ancestors(oid) AS (
+                SELECT c.oid FROM pg_class c WHERE c.relkind IN ('i', 'I') AND c.relname = ANY(%s)
+                UNION
+                SELECT i.inhparent FROM pg_inherits i JOIN ancestors a ON i.inhrelid = a.oid
+            )
+            SELECT c.relname FROM ancestors a JOIN pg_class c ON c.oid = a.oid
+        """, (list(index_names),))
+        names = {row[0] for row in cur.fetchall()}
+    conn.rollback()
+    return names | set(index_names)
+
+
+def explain_hot_query(conn, hot_query):
+    """
+    Devuelve el plan (FORMAT JSON) de una consulta del catálogo con los valores de default_sample.
+
+    Se desactiva el seq scan dentro de la transacción para que, en bases de
+    desarrollo con pocas filas, el plan refleje si el índice es aplicable.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off")
+            cur.execute(f"EXPLAIN (FORMAT JSON) {hot_query.sql}", hot_query.params(default_sample()))
+            result = cur.fetchone()[0]
+    finally:
+        conn.rollback()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]['Plan']
+
+
+db_cli = AppGroup('db', help='Migraciones y verificación del esquema.')
+
+
+@db_cli.command('upgrade')
+def upgrade_command():
+    """Aplica las migraciones pendientes."""
+    conn = get_migration_connection()
+    try:
+        ensure_migrations_table(conn)
+        pending = pending_migrations(conn)
+        if not pending:
+            click.echo('La base de datos está al día.')
+            return
+        for migration in pending:
+            click.echo(f'Aplicando {migration.version}_{migration.name}...')
+            apply_migration(conn, migration)
+        click.echo(f'{len(pending)} migración(es) aplicada(s).')
+    finally:
+        conn.close()
+
+
+@db_cli.command('status')
+def status_command():
+    """Muestra las migraciones aplicadas y pendientes."""
+    conn = get_migration_connection()
+    try:
+        ensure_migrations_table(conn)
+        applied = applied_migrations(conn)
+        for migration in discover_migrations():
+            checksum = applied.get(migration.version)
+            if checksum is None:
+                state = 'pendiente'
+            elif checksum != migration.checksum:
+                state = 'aplicada (el archivo cambió desde que se aplicó)'
+            else:
+                state = 'aplicada'
+            click.echo(f'{migration.version}_{migration.name}: {state}')
+    finally:
+        conn.close()
+
+
+@db_cli.command('verify')
+def verify_command():
+    """Comprueba que las consultas frecuentes usan los índices esperados."""
+    conn = get_migration_connection()
+    failures = 0
+    try:
+        for name in invalid_indexes(conn):
+            failures += 1
+            click.echo(f'Índice inválido: {name} (recrearlo con DROP INDEX CONCURRENTLY y flask db upgrade)')
+
+        for hot_query in HOT_QUERIES:
+            try:
+                used = with_parent_indexes(conn, plan_index_names(explain_hot_query(conn, hot_query)))
+            except psycopg2.Error as e:
+                failures += 1
+                click.echo(f'ERROR {hot_query.name} ({hot_query.source}): {str(e).strip()}')
+                continue
+
+            if used.intersection(hot_query.expected_indexes):
+                click.echo(f'OK    {hot_query.name}: {", ".join(sorted(used))}')
+            else:
+                failures += 1
+                found = ", ".join(sorted(used)) or 'ninguno'
+                click.echo(
+                    f'FALLA {hot_query.name} ({hot_query.source}): se esperaba '
+                    f'{" o ".join(hot_query.expected_indexes)}, se usó {found}'
+                )
+    finally:
+        conn.close()
+
+    if failures:
+        raise SystemExit(1)
+
+
+@db_cli.command('partitions')
+def partitions_command():
+    """Crea las particiones futuras de attendance y separa las antiguas."""
+    conn = get_migration_connection()
+    try:
+        created, detached = maintain_attendance_partitions(
+            conn, Config.ATTENDANCE_PARTITIONS_AHEAD, Config.ATTENDANCE_RETENTION_MONTHS
+        )
+    finally:
+        conn.close()
+
+    click.echo(f'Particiones creadas: {created}')
+    for name in detached:
+        click.echo(f'Partición separada: {name}')
+
+
+@db_cli.command('plans')
+@click.option('--save', 'save_name', help='Guardar la instantánea en benchmarks/plans/<nombre>.json.')
+@click.option('--compare', 'compare_name', help='Comparar contra una instantánea guardada.')
+@click.option('--runs', default=5, show_default=True, help='Corridas por consulta (se usa la mediana).')
+def plans_command(save_name, compare_name, runs):
+    """Ejecuta EXPLAIN ANALYZE sobre las consultas frecuentes y detecta cambios de plan."""
+    previous = None
+    if compare_name:
+        if not os.path.exists(snapshot_path(compare_name)):
+            raise click.ClickException(f'No existe la instantánea {snapshot_path(compare_name)}')
+        previous = load_snapshot(compare_name)
+
+    conn = get_migration_connection()
+    try:
+        snapshot = take_snapshot(conn, runs)
+    finally:
+        conn.close()
+
+    for name, result in snapshot['queries'].items():
+        click.echo(
+            f"{name}: {result['execution_ms']} ms (planificación {result['planning_ms']} ms), "
+            f"{result['rows']} filas, bloques {result['shared_hit_blocks']} en caché / "
+            f"{result['shared_read_blocks']} leídos"
+        )
+
+    if save_name:
+        save_snapshot(snapshot, save_name)
+        click.echo(f'Instantánea guardada en {snapshot_path(save_name)}')
+
+    if previous is None:
+        return
+
+    failures, warnings = compare_snapshots(previous, snapshot)
+    for warning in warnings:
+        click.echo(f'AVISO {warning}')
+    for failure in failures:
+        click.echo(f"FALLA {failure['message']}")
+        click.echo('  antes:')
+        for line in failure['before']:
+            click.echo(f'    {line}')
+        click.echo('  ahora:')
+        for line in failure['after']:
+            click.echo(f'    {line}')
+    if failures:
+        raise SystemExit(1)
+    click.echo(f"Planes sin cambios respecto a {compare_name} ({previous.get('commit') or 'sin commit'})")
+
+
+def register_migration_commands(app):
+    """Registra el grupo de comandos `flask db` en la aplicación"""
+    app.cli.add_command(db_cli)
@@ -0,0 +1,153 @@
+"""
+Utilidades de paginación por cursor (keyset) y conteos en caché.
+
+En lugar de LIMIT/OFFSET, cada página devuelve un `next_cursor` opaco que
+codifica la clave de orden de la última fila. La siguiente página se obtiene
+con un rango sobre esa clave, lo que cuesta lo mismo sin importar qué tan
+profunda sea la página.
+
+El total de registros se guarda en caché por tabla y búsqueda durante
+COUNT_CACHE_TTL segundos; los endpoints que insertan, modifican o eliminan
+registros deben llamar a invalidate_counts(tabla).
+"""
+import base64
+import json
+
+from config.config import Config
+from utils.cache import TTLCache
+
+count_cache = TTLCache(maxsize=Config.COUNT_CACHE_SIZE, ttl=Config.COUNT_CACHE_TTL, name='counts')
+
+
+def encode_cursor(values):
+    """Codifica un diccionario con la clave de orden como cursor opaco"""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodifica un cursor generado por encode_cursor; devuelve None si es inválido"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        return None
+    return values if isinstance(values, dict) else None
+
+
+def cached_count(cur, table, search, query, params):
+    """
+    Devuelve el conteo de `query` usando el caché por (tabla, búsqueda).
+
+    `query` debe devolver una sola fila con la columna `total`.
+    """
+    key = (table, search or '')
+    total = count_cache.get(key)
+    if total is None:
+        cur.execute(query, params)
+        total = cur.fetchone()['total']
+        count_cache.set(key, total)
+    return total
+
+
+def approximate_count(cur, table):
+    """Devuelve el número estimado de filas de una tabla según las estadísticas de PostgreSQL"""
+    cur.execute("SELECT GREATEST(reltuples, 0)::bigint AS total FROM pg_class WHERE oid = %s::regclass", (table,))
+    row = cur.fetchone()
+    return row['total'] if row else 0
+
+
+def invalidate_counts(table):
+    """Elimina del caché los conteos de una tabla"""
+    count_cache.delete_where(lambda key, _: key[0] == table)
+
+
+def build_page_query(select_sql, from_sql, id_column, search_filter, after=None, per_page=10, offset=0):
+    """
+    Construye la consulta de una página ordenada por (relevancia, id) o solo por id.
+
+    Args:
+        select_sql: Columnas a seleccionar.
+        from_sql: Cláusula FROM (sin la palabra FROM).
+        id_column: Columna única usada para desempatar y como clave del cursor.
+        search_filter: Resultado de utils.search.build_search o None.
+        after: Clave de orden decodificada del cursor ({'id': ..., 'rank': ...}) o None.
+        per_page: Tamaño de página; se pide una fila extra para saber si hay más.
+        offset: Desplazamiento para la paginación por número de página (sin cursor).
+
+    Returns:
+        tuple: (query, params)
+    """
+    params = []
+    conditions = []
+
+    if search_filter:
+        where_sql, where_params, rank_sql, rank_params = search_filter
+        select_sql = f"{select_sql}, {rank_sql} AS search_rank"
+        params.extend(rank_params)
+        conditions.append(where_sql)
+        params.extend(where_params)
+        if after:
+            conditions.append(f"({rank_sql} < %s::real OR ({rank_sql} = %s::real AND {id_column} > %s))")
+            params.extend(rank_params + [after['rank']] + rank_params + [after['rank'], after['id']])
+        order_sql = f"search_rank DESC, {id_column}"
+    else:
+        if after:
+            conditions.append(f"{id_column} > %s")
+            params.append(after['id'])
+        order_sql = id_column
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT {select_sql}
+        FROM {from_sql}
+        {where_clause}
+        ORDER BY {order_sql}
+        LIMIT %s OFFSET %s
+    """
+    params.extend([per_page + 1, offset])
+    return query, params
+
+
+def parse_cursor(cursor, search):
+    """
+    Decodifica el cursor de la petición y verifica que corresponda a la misma búsqueda.
+
+    Returns:
+        tuple: (after, valid). `after` es None si no se envió cursor; `valid` es
+               False si el cursor es inválido o pertenece a otra búsqueda.
+    """
+    if not cursor:
+        return None, True
+    after = decode_cursor(cursor)
+    if after is None or 'id' not in after or after.get('q', '') != (search or ''):
+        return None, False
+    if search and 'rank' not in after:
+        return None, False
+    return after, True
+
+
+def split_page(rows, per_page, search, id_key='id'):
+    """
+    Separa la fila extra de la página y genera el cursor de la siguiente.
+
+    Quita la columna auxiliar search_rank de las filas.
+
+    Returns:
+        tuple: (filas, next_cursor) donde next_cursor es None en la última página.
+    """
+    rows = [dict(row) for row in rows]
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        values = {'id': last[id_key], 'q': search or ''}
+        if 'search_rank' in last:
+            values['rank'] = last['search_rank']
+        next_cursor = encode_cursor(values)
+
+    for row in rows:
+        row.pop('search_rank', None)
+    return rows, next_cursor
@@ -0,0 +1,81 @@
+"""
+Mantenimiento de las particiones mensuales de attendance.
+
+attendance está particionada por rango de `fecha`, una partición por mes (ver
+migrations/0006_attendance_partitioning.sql). Las particiones de los próximos
+ATTENDANCE_PARTITIONS_AHEAD meses se crean al iniciar la aplicación y con
+`flask db partitions`; este último también separa las particiones con más de
+ATTENDANCE_RETENTION_MONTHS meses de antigüedad (0 = nunca), por lo que
+conviene programarlo con cron.
+
+save_attendance además asegura la partición del mes que guarda, por si se
+registra asistencia de un mes fuera del rango ya creado.
+"""
+import psycopg2.extras
+
+from utils.db import get_db_connection
+
+# Meses (año, mes) cuya partición ya se verificó en este proceso
+_known_months = set()
+
+
+def ensure_attendance_partition(day):
+    """
+    Crea, si no existe, la partición del mes de `day`; solo consulta la base la primera vez por mes.
+
+    Usa su propia conexión y transacción, así la partición no depende de la
+    transacción del llamador (si esta se revierte, la partición se conserva) y
+    el mes solo se recuerda después del commit. Debe llamarse antes de tomar la
+    conexión de la escritura, para no retener dos conexiones del pool a la vez.
+    """
+    month = (day.year, day.month)
+    if month in _known_months:
+        return
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT ensure_attendance_partition(%s::date)", (day,))
+    _known_months.add(month)
+
+
+def maintain_attendance_partitions(conn, months_ahead, retention_months=0):
+    """
+    Crea las particiones de los próximos `months_ahead` meses y separa las que
+    terminan hace más de `retention_months` meses (si es mayor que 0).
+
+    Returns:
+        tuple: (número de particiones creadas, nombres de las tablas archivadas)
+    """
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute("""
+            SELECT ensure_attendance_partitions(
+                current_date, (current_date + make_interval(months => %s))::date
+            ) AS created
+        """, (months_ahead,))
+        created = cur.fetchone()['created']
+
+        detached = []
+        if retention_months > 0:
+            cur.execute("""
+                SELECT detach_attendance_partitions(
+                    (date_trunc('month', current_date) - make_interval(months => %s))::date
+                ) AS name
+            """, (retention_months,))
+            detached = [row['name'] for row in cur.fetchall()]
+    conn.commit()
+    return created, detached
+
+
+def init_attendance_partitions(app):
+    """
+    Crea las particiones futuras de attendance al iniciar la aplicación.
+
+    Se llama desde create_app. Si falla (por ejemplo, si la migración 0006 aún
+    no se aplicó) solo se registra una advertencia.
+    """
+    try:
+        with get_db_connection() as conn:
+            created, _ = maintain_attendance_partitions(conn, app.config['ATTENDANCE_PARTITIONS_AHEAD'])
+        if created:
+            app.logger.info("Se crearon %d particiones de attendance", created)
+    except Exception as e:
+        app.logger.warning("No se pudieron asegurar las particiones de attendance: %s", e)
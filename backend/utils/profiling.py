@@ -0,0 +1,187 @@
+"""
+Perfilado bajo demanda de peticiones individuales.
+
+Un administrador puede perfilar una petición agregando el encabezado
+`X-Profile` (o el parámetro `_profile`) con uno de estos modos:
+
+- `stacks`: perfilador por muestreo; cada PROFILING_SAMPLE_INTERVAL segundos
+  toma la pila del hilo que atiende la petición. Se guarda en formato
+  "collapsed stacks", compatible con flamegraph.pl y speedscope.
+- `pstats`: perfilador determinista (cProfile). Se guarda en formato pstats,
+  que se abre con `python -m pstats` o snakeviz.
+
+El perfil se guarda en PROFILING_DIR con el identificador de la petición
+(encabezado X-Request-ID), que se devuelve en `X-Profile-Id`, y se descarga
+con GET /api/profiles/<id>. Solo se conservan los últimos
+PROFILING_MAX_FILES perfiles.
+
+Solo se perfila si el token JWT de la petición pertenece a un rol de
+PROFILING_ADMIN_ROLES. Sin el encabezado ni el parámetro el costo es una
+búsqueda en los encabezados. Se perfila una petición a la vez por proceso; si
+ya hay otra en curso se responde sin perfil y con `X-Profile-Status: busy`.
+"""
+import cProfile
+import glob
+import os
+import re
+import sys
+import threading
+import uuid
+from collections import Counter
+
+from flask import g, jsonify, request, send_file
+
+from utils.auth import has_role, parse_roles
+from utils.log import current_request_id, get_logger
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+PROFILE_MODES = {'stacks': 'collapsed', 'pstats': 'pstats'}
+
+_SAFE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+_profile_lock = threading.Lock()
+
+logger = get_logger(__name__)
+
+
+class StackSampler:
+    """Perfilador por muestreo de un hilo que acumula pilas en formato collapsed"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _stop_profiler(mode, profiler):
+    try:
+        if mode == 'pstats':
+            profiler.disable()
+        else:
+            profiler.stop()
+    finally:
+        _profile_lock.release()
+
+
+def _prune(directory, max_files):
+    files = sorted(glob.glob(os.path.join(directory, '*.*')), key=os.path.getmtime)
+    for path in files[:-max_files] if max_files > 0 else []:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def init_profiling(app):
+    """
+    Registra el perfilado bajo demanda y GET /api/profiles/<id>.
+
+    Se llama desde create_app. Se desactiva con PROFILING_ENABLED=False.
+    """
+    if not app.config.get('PROFILING_ENABLED', True):
+        return
+
+    directory = app.config.get('PROFILING_DIR')
+    max_files = app.config.get('PROFILING_MAX_FILES', 100)
+    interval = app.config.get('PROFILING_SAMPLE_INTERVAL', 0.005)
+    admin_roles = parse_roles(app.config.get('PROFILING_ADMIN_ROLES', '1'))
+
+    @app.before_request
+    def start_profiling():
+        mode = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_PARAM)
+        if not mode:
+            return
+        mode = mode.lower()
+        if mode not in PROFILE_MODES or request.endpoint == 'profiles' or not has_role(admin_roles):
+            return
+        if not _profile_lock.acquire(blocking=False):
+            g._profile_busy = True
+            return
+
+        if mode == 'pstats':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), interval)
+            profiler.start()
+        g._profile = (mode, profiler)
+
+    @app.after_request
+    def finish_profiling(response):
+        if g.pop('_profile_busy', False):
+            response.headers['X-Profile-Status'] = 'busy'
+            return response
+
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+
+        mode, profiler = profile
+        _stop_profiler(mode, profiler)
+
+        request_id = current_request_id()
+        profile_id = request_id if request_id and _SAFE_ID_RE.match(request_id) else uuid.uuid4().hex
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{profile_id}.{PROFILE_MODES[mode]}")
+            if mode == 'pstats':
+                profiler.dump_stats(path)
+            else:
+                profiler.dump(path)
+            _prune(directory, max_files)
+        except OSError:
+            logger.exception("No se pudo guardar el perfil de %s", request.path)
+            return response
+
+        logger.info("Perfil %s (%s) guardado para %s %s", profile_id, mode, request.method, request.path)
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    @app.teardown_request
+    def abort_profiling(exc):
+        # Si after_request no llegó a ejecutarse, se detiene el perfilador para liberar el candado
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            _stop_profiler(*profile)
+
+    def get_profile(profile_id):
+        if not has_role(admin_roles):
+            return jsonify({"message": "No autorizado"}), 403
+        if not _SAFE_ID_RE.match(profile_id):
+            return jsonify({"message": "Identificador de perfil inválido"}), 400
+        for extension in PROFILE_MODES.values():
+            path = os.path.join(directory, f"{profile_id}.{extension}")
+            if os.path.exists(path):
+                return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+        return jsonify({"message": "Perfil no encontrado"}), 404
+
+    app.add_url_rule('/api/profiles/<profile_id>', 'profiles', get_profile, methods=['GET'])
@@ -0,0 +1,216 @@
+"""
+Catálogo de las sentencias SQL más frecuentes de las rutas.
+
+Cada entrada describe una sentencia representativa, cómo construir sus
+parámetros a partir de una muestra de valores y los índices que debería poder
+usar. `flask db verify` ejecuta EXPLAIN sobre cada una con valores fijos para
+comprobar que los índices de las migraciones son aplicables; `flask db plans`
+las ejecuta con EXPLAIN ANALYZE usando valores tomados de la propia base (ver
+utils/query_plans.py).
+"""
+from datetime import date, timedelta
+
+from utils.search import build_search
+
+
+class HotQuery:
+    """
+    Sentencia frecuente con parámetros de ejemplo e índices esperados.
+
+    `params` recibe una muestra (ver default_sample y sample_parameters) y
+    devuelve los parámetros de la sentencia.
+    """
+
+    def __init__(self, name, source, sql, params, expected_indexes):
+        self.name = name
+        self.source = source
+        self.sql = sql
+        self.params = params
+        self.expected_indexes = expected_indexes
+
+
+def default_sample():
+    """Valores fijos para bases de desarrollo, donde no hace falta que existan"""
+    return {
+        'group_id': 1,
+        'student_ids': [1, 2, 3],
+        'period': 1,
+        'day': date.today(),
+        'professor_id': 1,
+        'term': 'garcia',
+    }
+
+
+def sample_parameters(conn):
+    """
+    Toma de la base valores representativos para las consultas del catálogo.
+
+    Usa el grupo con más estudiantes activos, sus estudiantes, su profesor, el
+    último día con asistencia registrada del grupo y el apellido de uno de sus
+    estudiantes como término de búsqueda. Si la base no tiene datos se usan
+    los valores de default_sample.
+    """
+    sample = default_sample()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT h.group_id, array_agg(h.student_id ORDER BY h.student_id) AS student_ids
+                FROM history h
+                WHERE h.status = 'activo'
+                GROUP BY h.group_id
+                ORDER BY count(*) DESC, h.group_id
+                LIMIT 1
+            """)
+            row = cur.fetchone()
+            if row is None:
+                return sample
+            sample['group_id'], sample['student_ids'] = row[0], row[1]
+
+            cur.execute('SELECT professor_id FROM "group" WHERE id = %s', (sample['group_id'],))
+            row = cur.fetchone()
+            if row and row[0] is not None:
+                sample['professor_id'] = row[0]
+
+            cur.execute("SELECT max(fecha)::date FROM attendance WHERE grade_id = %s", (sample['group_id'],))
+            row = cur.fetchone()
+            if row and row[0] is not None:
+                sample['day'] = row[0]
+
+            cur.execute("SELECT lower(lastname_f) FROM student WHERE id = %s", (sample['student_ids'][0],))
+            row = cur.fetchone()
+            if row and row[0]:
+                sample['term'] = row[0]
+    finally:
+        conn.rollback()
+    return sample
+
+
+# Filtro y orden de las búsquedas tal como los arman las rutas con build_search;
+# el SQL no depende del término, solo sus parámetros
+_SEARCH = {
+    'student': build_search('student', 'x', alias='s'),
+    'family': build_search('family', 'x', alias='f'),
+}
+
+
+def _search_params(table, term, rank_first=False):
+    """Parámetros de build_search para `term`, en el orden en que aparecen en la sentencia"""
+    _, where_params, _, rank_params = build_search(table, term or 'x')
+    return rank_params + where_params if rank_first else where_params + rank_params
+
+
+HOT_QUERIES = [
+    HotQuery(
+        'roster',
+        'utils/roster.py:_load_roster',
+        """
+            SELECT g.id, g.grade, c.name, s.id, s.name || ' ' || s.lastname_f || ' ' || s.lastname_m AS full_name
+            FROM "group" g
+            LEFT JOIN class c ON c.id = g.class_id
+            LEFT JOIN history h ON h.group_id = g.id AND h.status = 'activo'
+            LEFT JOIN student s ON s.id = h.student_id
+            WHERE g.id = %(group_id)s
+            ORDER BY full_name
+        """,
+        lambda sample: {'group_id': sample['group_id']},
+        ('history_group_status_idx',),
+    ),
+    HotQuery(
+        'student_groups',
+        'routes/student_routes.py:get_estudiantes',
+        """
+            SELECT h.student_id, h.group_id
+            FROM history h
+            WHERE h.student_id = ANY(%(student_ids)s) AND h.status = 'activo'
+        """,
+        lambda sample: {'student_ids': sample['student_ids']},
+        ('history_student_status_idx',),
+    ),
+    HotQuery(
+        'notes_lookup',
+        'routes/grades_routes.py:get_grades_by_group',
+        """
+            SELECT id, student_id, finall
+            FROM notes
+            WHERE student_id = ANY(%(student_ids)s) AND grade_id = %(group_id)s AND period = %(period)s
+        """,
+        lambda sample: {
+            'student_ids': sample['student_ids'], 'group_id': sample['group_id'], 'period': sample['period']
+        },
+        ('notes_student_grade_period_key', 'notes_grade_period_idx'),
+    ),
+    HotQuery(
+        'attendance_day',
+        'routes/attendance_routes.py:get_attendance_by_group',
+        """
+            SELECT id, student_id, status
+            FROM attendance
+            WHERE grade_id = %(group_id)s AND fecha >= %(day)s AND fecha < %(next_day)s
+        """,
+        lambda sample: {
+            'group_id': sample['group_id'], 'day': sample['day'], 'next_day': sample['day'] + timedelta(days=1)
+        },
+        ('attendance_grade_fecha_idx', 'attendance_student_grade_fecha_key'),
+    ),
+    HotQuery(
+        'professor_materias',
+        'routes/teacher_routes.py:get_materias',
+        """
+            SELECT g.id, g.grade, c.id, c.name
+            FROM "group" g
+            JOIN class c ON c.id = g.class_id
+            WHERE g.professor_id = %(professor_id)s
+        """,
+        lambda sample: {'professor_id': sample['professor_id']},
+        ('group_professor_id_idx',),
+    ),
+    HotQuery(
+        'student_search',
+        'routes/student_routes.py:get_estudiantes',
+        f"""
+            SELECT s.id, {_SEARCH['student'][2]} AS search_rank
+            FROM student s
+            WHERE {_SEARCH['student'][0]}
+            ORDER BY search_rank DESC, s.id
+            LIMIT 21
+        """,
+        lambda sample: _search_params('student', sample['term'], rank_first=True),
+        ('student_search_trgm_idx',),
+    ),
+    HotQuery(
+        'tutor_search',
+        'routes/student_routes.py:get_tutores',
+        f"""
+            SELECT f.id
+            FROM family f
+            WHERE {_SEARCH['family'][0]}
+            ORDER BY {_SEARCH['family'][2]} DESC, f.tutor_lastname_f, f.tutor_lastname_m, f.tutor_name
+            LIMIT 20
+        """,
+        lambda sample: _search_params('family', sample['term']),
+        ('family_search_trgm_idx',),
+    ),
+]
+
+
+def plan_index_names(plan):
+    """Devuelve los nombres de índices usados en un plan de EXPLAIN (FORMAT JSON)"""
+    names = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if 'Index Name' in node:
+            names.add(node['Index Name'])
+        stack.extend(node.get('Plans', []))
+    return names
+
+
+def plan_node_types(plan):
+    """Devuelve los tipos de nodo de un plan de EXPLAIN (FORMAT JSON) en orden de recorrido"""
+    types = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        types.append(node['Node Type'])
+        stack.extend(reversed(node.get('Plans', [])))
+    return types
@@ -0,0 +1,190 @@
+"""
+Regresiones de planes de ejecución de las consultas frecuentes.
+
+`flask db plans` ejecuta cada consulta de utils/query_catalog.py con
+EXPLAIN (ANALYZE, BUFFERS) usando valores tomados de la propia base
+(sample_parameters), normalmente cargada con benchmarks.dataset. De cada
+consulta se guarda:
+
+- la forma del plan: tipos de nodo con sus tablas e índices, sin costos ni
+  filas, de modo que solo cambia si el planificador elige otro camino
+  (p. ej. un Seq Scan en lugar de un Index Scan);
+- la mediana del tiempo de ejecución y de planificación de varias corridas;
+- los bloques leídos de caché y de disco.
+
+Las instantáneas se guardan en benchmarks/plans/<nombre>.json junto con el
+commit y la muestra usada. Al comparar contra una instantánea anterior, un
+cambio de forma es una falla y un tiempo mucho mayor es una advertencia (los
+tiempos dependen de la máquina y del estado de la caché).
+
+Uso:
+    flask --app app db plans --save main       # Guarda la instantánea de la rama principal
+    flask --app app db plans --compare main    # Compara el commit actual contra ella
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+from datetime import date, datetime
+
+from utils.query_catalog import HOT_QUERIES, sample_parameters
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLANS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'plans')
+
+# Un tiempo de ejecución se reporta si supera en este factor al anterior y en al menos MIN_TIME_DELTA_MS
+TIME_REGRESSION_FACTOR = 2.0
+MIN_TIME_DELTA_MS = 1.0
+
+# Las particiones mensuales de attendance se muestran con el nombre de la tabla padre
+_PARTITION_RE = re.compile(r'\battendance_y\d{4}m\d{2}')
+_NODE_FIELDS = ('Relation Name', 'Index Name', 'Join Type', 'Strategy', 'Parent Relationship')
+
+
+def _normalize(name):
+    return _PARTITION_RE.sub('attendance_*', name)
+
+
+def plan_shape(plan):
+    """
+    Forma de un plan (FORMAT JSON) como árbol de cadenas.
+
+    Los hijos idénticos consecutivos (p. ej. el mismo Index Scan sobre cada
+    partición de un Append) se reducen a uno, para que agregar particiones no
+    cuente como cambio de plan.
+    """
+    label = plan['Node Type']
+    details = [f"{field}={_normalize(plan[field])}" for field in _NODE_FIELDS if plan.get(field)]
+    if details:
+        label = f"{label} ({', '.join(details)})"
+
+    children = []
+    for child in plan.get('Plans', []):
+        shape = plan_shape(child)
+        if not children or children[-1] != shape:
+            children.append(shape)
+    return [label, children] if children else [label]
+
+
+def format_shape(shape, indent=0):
+    """Representación indentada de plan_shape para mostrarla en consola"""
+    lines = ['  ' * indent + shape[0]]
+    for child in shape[1] if len(shape) > 1 else []:
+        lines.extend(format_shape(child, indent + 1))
+    return lines
+
+
+def _scan_nodes(shape):
+    nodes = [shape[0]] if 'Scan' in shape[0] else []
+    for child in shape[1] if len(shape) > 1 else []:
+        nodes.extend(_scan_nodes(child))
+    return nodes
+
+
+def analyze_hot_query(conn, hot_query, sample, runs=5):
+    """
+    Ejecuta la consulta con EXPLAIN (ANALYZE, BUFFERS) `runs` veces y devuelve su resumen.
+
+    La primera corrida calienta la caché; el plan y los bloques son los de la última.
+    """
+    params = hot_query.params(sample)
+    executions, plannings = [], []
+    result = None
+    try:
+        with conn.cursor() as cur:
+            for _ in range(runs + 1):
+                cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {hot_query.sql}", params)
+                result = cur.fetchone()[0]
+                if isinstance(result, str):
+                    result = json.loads(result)
+                executions.append(result[0]['Execution Time'])
+                plannings.append(result[0]['Planning Time'])
+    finally:
+        conn.rollback()
+
+    plan = result[0]['Plan']
+    return {
+        'source': hot_query.source,
+        'shape': plan_shape(plan),
+        'execution_ms': round(statistics.median(executions[1:]), 3),
+        'planning_ms': round(statistics.median(plannings[1:]), 3),
+        'rows': plan.get('Actual Rows'),
+        'shared_hit_blocks': plan.get('Shared Hit Blocks', 0),
+        'shared_read_blocks': plan.get('Shared Read Blocks', 0),
+    }
+
+
+def _current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def take_snapshot(conn, runs=5):
+    """Analiza todas las consultas del catálogo y devuelve la instantánea"""
+    sample = sample_parameters(conn)
+    with conn.cursor() as cur:
+        cur.execute("SHOW server_version")
+        server_version = cur.fetchone()[0]
+    conn.rollback()
+
+    return {
+        'commit': _current_commit(),
+        'taken_at': datetime.now().isoformat(timespec='seconds'),
+        'server_version': server_version,
+        'sample': {key: value.isoformat() if isinstance(value, date) else value for key, value in sample.items()},
+        'queries': {hot_query.name: analyze_hot_query(conn, hot_query, sample, runs) for hot_query in HOT_QUERIES},
+    }
+
+
+def compare_snapshots(previous, current):
+    """
+    Compara dos instantáneas y devuelve (fallas, advertencias).
+
+    Es falla un cambio en la forma del plan (se detalla si aparece un Seq Scan
+    que antes no estaba) y advertencia un tiempo de ejecución
+    TIME_REGRESSION_FACTOR veces mayor o una consulta nueva o eliminada.
+    """
+    failures, warnings = [], []
+    for name in sorted(set(previous['queries']) | set(current['queries'])):
+        before = previous['queries'].get(name)
+        after = current['queries'].get(name)
+        if before is None or after is None:
+            warnings.append(f"{name}: consulta {'nueva' if before is None else 'eliminada'} en el catálogo")
+            continue
+
+        if before['shape'] != after['shape']:
+            new_seq_scans = [node for node in _scan_nodes(after['shape'])
+                             if node.startswith('Seq Scan') and node not in _scan_nodes(before['shape'])]
+            detail = f" (nuevo {'; '.join(new_seq_scans)})" if new_seq_scans else ''
+            failures.append({
+                'query': name,
+                'message': f"{name}: cambió el plan{detail}",
+                'before': format_shape(before['shape']),
+                'after': format_shape(after['shape']),
+            })
+
+        if (after['execution_ms'] > before['execution_ms'] * TIME_REGRESSION_FACTOR
+                and after['execution_ms'] - before['execution_ms'] > MIN_TIME_DELTA_MS):
+            warnings.append(f"{name}: ejecución {before['execution_ms']} ms -> {after['execution_ms']} ms")
+    return failures, warnings
+
+
+def snapshot_path(name):
+    return os.path.join(PLANS_DIR, f"{name}.json")
+
+
+def save_snapshot(snapshot, name):
+    os.makedirs(PLANS_DIR, exist_ok=True)
+    with open(snapshot_path(name), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def load_snapshot(name):
+    with open(snapshot_path(name), encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,168 @@
+"""
+Paquete ZIP con los reportes CSV de muchos grupos.
+
+Los reportes se generan en paralelo en un ThreadPoolExecutor: cada tarea toma
+su propia conexión del pool compartido, ejecuta la función `build` del reporte
+(las mismas de utils/reports.py) y devuelve el CSV ya codificado. El hilo de
+la petición escribe cada CSV en el ZIP en cuanto está listo y emite los bytes
+comprimidos de inmediato, por lo que la descarga empieza con el primer reporte
+y el tiempo total depende de REPORT_BUNDLE_WORKERS y no del número de grupos.
+
+Se usan hilos y no procesos: las consultas y la compresión (zlib) liberan el
+GIL, y así las tareas comparten el pool de conexiones del proceso.
+"""
+import csv
+import io
+import re
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from flask import Response, stream_with_context
+
+from utils.db import get_db_connection
+from utils.log import get_logger
+from utils.reports import ReportNotFound
+
+ERRORS_FILENAME = 'ERRORES.txt'
+
+_UNSAFE_NAME_RE = re.compile(r'[\\/:*?"<>|]')
+
+logger = get_logger(__name__)
+
+
+class BundleBusy(Exception):
+    """Este proceso ya está generando el máximo de paquetes simultáneos"""
+
+
+class BundleItem:
+    """Un reporte del paquete: carpeta dentro del ZIP, prefijo del archivo y la llamada build(conn, *args)"""
+
+    def __init__(self, folder, prefix, build, *args):
+        self.folder = folder
+        self.prefix = prefix
+        self.build = build
+        self.args = args
+
+
+class _ZipStream:
+    """Archivo de solo escritura y sin seek que acumula lo que ZipFile escribe hasta que se emite"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_bundle_slots = threading.BoundedSemaphore(1)
+_settings = {'workers': 4}
+
+
+def _render(item):
+    conn = get_db_connection()
+    try:
+        report = item.build(conn, *item.args)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(report.rows)
+    finally:
+        # Devuelve la conexión al pool (descarta la transacción de solo lectura)
+        conn.close()
+    filename = _UNSAFE_NAME_RE.sub('_', report.filename)
+    return f"{item.folder}/{item.prefix}_{filename}", buffer.getvalue().encode('utf-8')
+
+
+def _iter_bundle(items):
+    stream = _ZipStream()
+    errors = []
+    written = 0
+    with ThreadPoolExecutor(max_workers=_settings['workers'], thread_name_prefix='report-bundle') as executor:
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            pending = {}
+            remaining = iter(items)
+            # Se mantienen a lo sumo dos tareas por hilo para no acumular CSV en memoria
+            window = _settings['workers'] * 2
+            try:
+                while True:
+                    for item in remaining:
+                        pending[executor.submit(_render, item)] = item
+                        if len(pending) >= window:
+                            break
+                    if not pending:
+                        break
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        item = pending.pop(future)
+                        try:
+                            arcname, data = future.result()
+                        except ReportNotFound:
+                            # Grupo sin estudiantes: no se incluye
+                            continue
+                        except Exception as e:
+                            logger.exception("Error al generar %s/%s del paquete", item.folder, item.prefix)
+                            errors.append(f"{item.folder}/{item.prefix}: {e}")
+                            continue
+                        archive.writestr(arcname, data)
+                        written += 1
+                    chunk = stream.take()
+                    if chunk:
+                        yield chunk
+            finally:
+                # Si el cliente cortó la descarga no se generan los reportes que faltan
+                for future in pending:
+                    future.cancel()
+
+            if errors:
+                archive.writestr(ERRORS_FILENAME, '\n'.join(errors) + '\n')
+    yield stream.take()
+    logger.info("Paquete de reportes generado: %d archivos, %d errores", written, len(errors))
+
+
+def stream_report_bundle(items, filename):
+    """
+    Genera los reportes de `items` (BundleItem) en paralelo y devuelve el ZIP como respuesta incremental.
+
+    Los reportes sin datos (ReportNotFound) se omiten y los que fallan se
+    listan en ERRORES.txt dentro del ZIP, porque para entonces la respuesta ya
+    empezó. Lanza BundleBusy si el proceso ya genera REPORT_BUNDLE_MAX_CONCURRENT
+    paquetes.
+    """
+    slots = _bundle_slots
+    if not slots.acquire(blocking=False):
+        raise BundleBusy()
+    try:
+        response = Response(
+            stream_with_context(_iter_bundle(items)),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    except Exception:
+        slots.release()
+        raise
+    # El turno se libera al cerrar la respuesta, aunque el cliente corte la descarga antes de empezar
+    response.call_on_close(slots.release)
+    return response
+
+
+def init_report_bundles(app):
+    """
+    Configura los paquetes de reportes con REPORT_BUNDLE_*.
+
+    Se llama desde create_app. Los hilos por paquete se limitan para dejar
+    conexiones del pool libres para el resto de las peticiones.
+    """
+    global _bundle_slots
+    workers = app.config.get('REPORT_BUNDLE_WORKERS', 4)
+    pool_max = app.config.get('DB_POOL_MAX', 10)
+    _settings['workers'] = max(1, min(workers, pool_max - 2))
+    _bundle_slots = threading.BoundedSemaphore(max(1, app.config.get('REPORT_BUNDLE_MAX_CONCURRENT', 1)))
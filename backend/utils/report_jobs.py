@@ -0,0 +1,389 @@
+"""
+Generación de reportes en segundo plano.
+
+Una petición de reporte asíncrona (`?async=1` o el encabezado
+`Prefer: respond-async`) solo registra el trabajo y responde 202 con su
+identificador; un hilo del proceso genera el CSV y lo guarda en
+REPORT_JOBS_DIR. El estado se consulta en GET /api/reportes/<id> y el archivo
+se descarga de GET /api/reportes/<id>/archivo hasta que expira
+(REPORT_JOBS_TTL).
+
+- Cada trabajo se guarda como <id>.json (estado y progreso) y <id>.csv en
+  REPORT_JOBS_DIR, de modo que cualquier proceso de gunicorn del mismo
+  servidor puede responder el estado y la descarga.
+- Cada proceso ejecuta hasta REPORT_JOBS_WORKERS trabajos a la vez y acepta
+  hasta REPORT_JOBS_MAX_QUEUED en espera; si la cola está llena la petición
+  recibe 503.
+- Entre todos los procesos se ejecutan a lo sumo REPORT_JOBS_MAX_CONCURRENT
+  reportes a la vez: cada trabajo toma uno de esos turnos con
+  pg_try_advisory_xact_lock antes de consultar, así el límite se mantiene
+  aunque haya varios procesos o servidores, y PostgreSQL libera el turno
+  aunque el proceso termine de forma abrupta.
+- Si el proceso que tenía un trabajo pendiente terminó (p. ej. gunicorn lo
+  reinició por max_requests), el trabajo se informa como fallido.
+
+Los tipos de reporte se registran con register_report_job desde las rutas.
+"""
+import csv
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from utils.db import get_db_connection
+from utils.log import get_logger
+from utils.reports import ReportNotFound
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+_PROGRESS_INTERVAL = 1.0
+_SLOT_RETRY_INTERVAL = 1.0
+_PURGE_INTERVAL = 60.0
+
+_job_kinds = {}
+_settings = {
+    'directory': None,
+    'workers': 2,
+    'max_concurrent': 2,
+    'max_queued': 20,
+    'ttl': 3600,
+}
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_pending = 0
+_next_purge = 0.0
+
+logger = get_logger(__name__)
+
+
+class JobQueueFull(Exception):
+    """No hay lugar en la cola de trabajos de este proceso"""
+
+
+def register_report_job(kind, build):
+    """
+    Registra un tipo de reporte.
+
+    `build(conn, params)` recibe una conexión y los parámetros del trabajo
+    (un diccionario serializable en JSON) y devuelve un ReportOutput.
+    """
+    _job_kinds[kind] = build
+
+
+def _now():
+    return time.time()
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds') if timestamp else None
+
+
+def _job_path(job_id):
+    return os.path.join(_settings['directory'], f"{job_id}.json")
+
+
+def result_path(job_id):
+    """Ruta del CSV generado por un trabajo"""
+    return os.path.join(_settings['directory'], f"{job_id}.csv")
+
+
+def _write_job(job):
+    job['updated_at'] = _now()
+    path = _job_path(job['id'])
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(job, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _read_job(job_id):
+    try:
+        with open(_job_path(job_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _owner_alive(job):
+    """Indica si el proceso que tiene el trabajo sigue vivo (si es de otro servidor se asume que sí)"""
+    if job.get('host') != socket.gethostname():
+        return True
+    try:
+        os.kill(job['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def get_job(job_id):
+    """
+    Devuelve el estado de un trabajo, o None si no existe o ya expiró.
+
+    Los trabajos pendientes cuyo proceso terminó se informan como fallidos.
+    """
+    if not _JOB_ID_RE.match(job_id):
+        return None
+    job = _read_job(job_id)
+    if job is None:
+        return None
+    now = _now()
+    if job['status'] in (QUEUED, RUNNING) and not _owner_alive(job):
+        job['status'] = FAILED
+        job['error'] = 'El trabajo se interrumpió; solicite el reporte de nuevo'
+    if job.get('expires_at') and job['expires_at'] < now:
+        return None
+    return job
+
+
+def job_summary(job):
+    """Representación pública de un trabajo para las respuestas JSON"""
+    total = job['progress'].get('total')
+    rows = job['progress'].get('rows', 0)
+    summary = {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'progress': {
+            'rows': rows,
+            'total': total,
+            'percent': round(min(rows / total, 1.0) * 100, 1) if total else None,
+        },
+        'created_at': _iso(job['created_at']),
+        'started_at': _iso(job.get('started_at')),
+        'finished_at': _iso(job.get('finished_at')),
+        'expires_at': _iso(job.get('expires_at')),
+    }
+    if job['status'] == DONE:
+        summary['filename'] = job['filename']
+        summary['size'] = job['size']
+    if job['status'] == FAILED:
+        summary['error'] = job.get('error')
+    return summary
+
+
+def _get_executor():
+    global _executor, _executor_pid, _pending
+    # Los hilos no sobreviven a fork: cada proceso de gunicorn crea su propio ejecutor
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=_settings['workers'], thread_name_prefix='report-job')
+        _executor_pid = os.getpid()
+        _pending = 0
+    return _executor
+
+
+def submit_report_job(kind, params, user_id=None):
+    """
+    Registra un trabajo y lo encola; devuelve su estado inicial.
+
+    `user_id` es el id del usuario que lo pidió; solo él (o un administrador)
+    puede consultar el estado y descargar el archivo.
+
+    Lanza JobQueueFull si este proceso ya tiene REPORT_JOBS_MAX_QUEUED
+    trabajos sin terminar.
+    """
+    global _pending
+    if kind not in _job_kinds:
+        raise ValueError(f"Tipo de reporte desconocido: {kind}")
+    purge_expired_jobs()
+
+    with _lock:
+        executor = _get_executor()
+        if _pending >= _settings['max_queued']:
+            raise JobQueueFull()
+        _pending += 1
+
+    job = {
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'params': params,
+        'user_id': user_id,
+        'status': QUEUED,
+        'progress': {'rows': 0, 'total': None},
+        'created_at': _now(),
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+    }
+    try:
+        os.makedirs(_settings['directory'], exist_ok=True)
+        _write_job(job)
+        executor.submit(_run_job, job)
+    except Exception:
+        with _lock:
+            _pending -= 1
+        raise
+    logger.info("Trabajo %s (%s) encolado: %s", job['id'], kind, params)
+    return job
+
+
+def wants_async():
+    """Indica si la petición pidió generar el reporte en segundo plano"""
+    return (request.args.get('async', '').lower() in ('1', 'true')
+            or 'respond-async' in request.headers.get('Prefer', ''))
+
+
+def enqueue_report(kind, params):
+    """Encola un reporte y devuelve la respuesta 202 (o 503 si la cola está llena) para la ruta"""
+    verify_jwt_in_request(optional=True)
+    user_id = get_jwt_identity()
+    try:
+        job = submit_report_job(kind, params, user_id=str(user_id) if user_id is not None else None)
+    except JobQueueFull:
+        return jsonify({
+            "message": "Hay demasiados reportes en proceso; intente de nuevo en unos minutos",
+            "success": False
+        }), 503
+
+    status_url = f"/api/reportes/{job['id']}"
+    response = jsonify({**job_summary(job), 'status_url': status_url, 'success': True})
+    response.headers['Location'] = status_url
+    return response, 202
+
+
+def _acquire_slot():
+    """
+    Espera un turno libre entre todos los procesos y devuelve la conexión que lo tiene.
+
+    El turno dura hasta el fin de la transacción de esa conexión. Mientras se
+    espera no se retiene ninguna conexión del pool, para no quitársela a las
+    peticiones.
+    """
+    while True:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                for slot in range(_settings['max_concurrent']):
+                    cur.execute("SELECT pg_try_advisory_xact_lock(hashtext('report_jobs'), %s) AS acquired", (slot,))
+                    if cur.fetchone()['acquired']:
+                        return conn
+        except Exception:
+            conn.close()
+            raise
+        # Sin turno: devolver la conexión (close descarta la transacción) antes de esperar
+        conn.close()
+        time.sleep(_SLOT_RETRY_INTERVAL)
+
+
+def _write_result(job, report):
+    path = result_path(job['id'])
+    tmp_path = f"{path}.tmp"
+    rows = 0
+    last_progress = _now()
+    job['progress'] = {'rows': 0, 'total': report.total}
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        for index, row in enumerate(report.rows):
+            writer.writerow(row)
+            # La primera fila es el encabezado
+            rows = index
+            if _now() - last_progress >= _PROGRESS_INTERVAL:
+                job['progress']['rows'] = rows
+                _write_job(job)
+                last_progress = _now()
+    os.replace(tmp_path, path)
+    job['progress']['rows'] = rows
+    return os.path.getsize(path)
+
+
+def _run_job(job):
+    global _pending
+    start = time.perf_counter()
+    conn = None
+    try:
+        conn = _acquire_slot()
+
+        job['status'] = RUNNING
+        job['started_at'] = _now()
+        _write_job(job)
+
+        report = _job_kinds[job['kind']](conn, job['params'])
+        job['size'] = _write_result(job, report)
+        job['filename'] = report.filename
+        job['status'] = DONE
+        logger.info(
+            "Trabajo %s (%s) terminado: %d filas en %.1f s",
+            job['id'], job['kind'], job['progress']['rows'], time.perf_counter() - start
+        )
+    except ReportNotFound as e:
+        job['status'] = FAILED
+        job['error'] = str(e)
+    except Exception:
+        logger.exception("Error en el trabajo %s (%s)", job['id'], job['kind'])
+        job['status'] = FAILED
+        job['error'] = 'Error al generar el reporte'
+    finally:
+        if conn is not None:
+            # Termina la transacción (libera el turno) y devuelve la conexión al pool
+            try:
+                conn.rollback()
+            finally:
+                conn.close()
+        job['finished_at'] = _now()
+        job['expires_at'] = job['finished_at'] + _settings['ttl']
+        try:
+            _write_job(job)
+        except OSError:
+            logger.exception("No se pudo guardar el estado del trabajo %s", job['id'])
+        with _lock:
+            _pending -= 1
+
+
+def purge_expired_jobs(force=False):
+    """Elimina los archivos de trabajos expirados; se ejecuta como máximo cada minuto por proceso"""
+    global _next_purge
+    now = _now()
+    if not force and now < _next_purge:
+        return
+    _next_purge = now + _PURGE_INTERVAL
+
+    directory = _settings['directory']
+    if not directory or not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        job_id, extension = os.path.splitext(filename)
+        if extension != '.json' or not _JOB_ID_RE.match(job_id):
+            continue
+        job = _read_job(job_id)
+        if job is None:
+            continue
+        expired = job.get('expires_at') and job['expires_at'] < now
+        # Trabajos abandonados por un proceso que terminó
+        abandoned = (job['status'] in (QUEUED, RUNNING) and not _owner_alive(job)
+                     and now - job['updated_at'] > _settings['ttl'])
+        if expired or abandoned:
+            for path in (result_path(job_id), f"{result_path(job_id)}.tmp", _job_path(job_id)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def init_report_jobs(app):
+    """
+    Configura la cola de reportes con REPORT_JOBS_*.
+
+    Se llama desde create_app. El ejecutor se crea al encolar el primer
+    trabajo de cada proceso.
+    """
+    _settings.update({
+        'directory': app.config['REPORT_JOBS_DIR'],
+        'workers': app.config.get('REPORT_JOBS_WORKERS', 2),
+        'max_concurrent': app.config.get('REPORT_JOBS_MAX_CONCURRENT', 2),
+        'max_queued': app.config.get('REPORT_JOBS_MAX_QUEUED', 20),
+        'ttl': app.config.get('REPORT_JOBS_TTL', 3600),
+    })
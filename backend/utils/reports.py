@@ -0,0 +1,64 @@
+"""
+Reportes CSV generados a partir de un cursor del lado del servidor.
+
+Cada reporte se construye con una función `build(conn, ...)` que ejecuta la
+consulta en la conexión recibida y devuelve un ReportOutput con el nombre del
+archivo y un iterador de filas. La misma función sirve para responder en la
+petición (stream_report) o en segundo plano (utils/report_jobs.py).
+"""
+from flask import Response, stream_with_context
+
+from utils.csv_stream import iter_csv
+from utils.db import get_db_connection
+
+
+class ReportNotFound(Exception):
+    """El reporte no tiene datos (grupo inexistente o sin estudiantes); el mensaje es para el usuario"""
+
+
+class ReportOutput:
+    """Nombre del archivo, filas del CSV (incluido el encabezado) y total de filas de datos si se conoce"""
+
+    def __init__(self, filename, rows, total=None):
+        self.filename = filename
+        self.rows = rows
+        self.total = total
+
+
+def iter_cursor_rows(cur, first_batch, make_row):
+    """Convierte los lotes de un cursor con nombre en filas de CSV y cierra el cursor al terminar"""
+    try:
+        batch = first_batch
+        while batch:
+            for record in batch:
+                yield make_row(record)
+            batch = cur.fetchmany(cur.itersize)
+    finally:
+        cur.close()
+
+
+def stream_report(build, *args):
+    """
+    Construye un reporte con una conexión del pool y lo devuelve como respuesta CSV incremental.
+
+    La conexión se devuelve al pool al terminar de emitir el archivo. Las
+    excepciones de `build` (incluida ReportNotFound) se propagan a la ruta.
+    """
+    conn = get_db_connection()
+    try:
+        report = build(conn, *args)
+    except Exception:
+        conn.close()
+        raise
+
+    def rows():
+        try:
+            yield from report.rows
+        finally:
+            conn.close()
+
+    return Response(
+        stream_with_context(iter_csv(rows())),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={report.filename}'}
+    )
@@ -0,0 +1,132 @@
+"""
+Listas de estudiantes activos por grupo (roster) con caché en memoria.
+
+Varias rutas (asistencia, calificaciones, estudiantes por grupo) necesitan los
+estudiantes activos de un grupo. Este módulo los obtiene con una sola consulta
+y los guarda en caché por grupo durante ROSTER_CACHE_TTL segundos. Cualquier
+endpoint que cambie inscripciones o datos de estudiantes debe invalidar el
+caché con invalidate_group, invalidate_student o invalidate_all.
+
+El caché es de cada proceso: la invalidación solo llega al proceso que
+atendió el cambio, y los demás pueden mostrar un roster de hasta
+ROSTER_CACHE_TTL segundos de antigüedad. Por eso solo se usa para lecturas;
+las escrituras validan contra history dentro de la propia sentencia.
+"""
+import threading
+
+from config.config import Config
+from utils.cache import TTLCache
+from utils.db import get_db_connection
+
+
+class GroupRoster:
+    """Información de un grupo y sus estudiantes activos ordenados por nombre completo"""
+
+    def __init__(self, group_id, grade, class_name, students):
+        self.group_id = group_id
+        self.grade = grade
+        self.class_name = class_name
+        self.students = students
+
+    @property
+    def student_ids(self):
+        return [student['id'] for student in self.students]
+
+    @property
+    def name(self):
+        return f"{self.grade} - {self.class_name}" if self.class_name else self.grade
+
+
+roster_cache = TTLCache(maxsize=Config.ROSTER_CACHE_SIZE, ttl=Config.ROSTER_CACHE_TTL, name='roster')
+_MISSING = object()
+
+# Se incrementa con cada invalidación; un roster cargado mientras hubo una
+# invalidación puede ser anterior a ella y no se guarda en el caché
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _bump_generation():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+
+
+def _load_roster(cur, group_id):
+    cur.execute("""
+        SELECT
+            g.id AS group_id, g.grade AS group_grade, c.name AS class_name,
+            s.id, s.name, s.lastname_f, s.lastname_m, s.email,
+            s.blood_type, s.allergies, s.scholar_ship, s.chapel,
+            s.school_campus, s.family_id, s.permission, s.reg_date,
+            s.name || ' ' || s.lastname_f || ' ' || s.lastname_m AS full_name
+        FROM "group" g
+        LEFT JOIN class c ON c.id = g.class_id
+        LEFT JOIN history h ON h.group_id = g.id AND h.status = 'activo'
+        LEFT JOIN student s ON s.id = h.student_id
+        WHERE g.id = %s
+        ORDER BY full_name
+    """, (group_id,))
+    rows = cur.fetchall()
+
+    if not rows:
+        return None
+
+    first = rows[0]
+    students = []
+    seen = set()
+    for row in rows:
+        if row['id'] is None or row['id'] in seen:
+            continue
+        seen.add(row['id'])
+        students.append(dict(row))
+
+    return GroupRoster(first['group_id'], first['group_grade'], first['class_name'], students)
+
+
+def get_group_roster(group_id, conn=None):
+    """
+    Devuelve el GroupRoster de un grupo, o None si el grupo no existe.
+
+    Con el caché caliente no se realiza ninguna consulta. Si se proporciona
+    `conn` se usa esa conexión para cargar el roster; si no, se toma una del pool.
+    Los diccionarios de `students` son compartidos: no deben modificarse.
+    """
+    roster = roster_cache.get(group_id, _MISSING)
+    if roster is not _MISSING:
+        return roster
+
+    generation = _generation
+    if conn is None:
+        with get_db_connection() as own_conn:
+            with own_conn.cursor() as cur:
+                roster = _load_roster(cur, group_id)
+    else:
+        with conn.cursor() as cur:
+            roster = _load_roster(cur, group_id)
+
+    with _generation_lock:
+        if generation == _generation:
+            roster_cache.set(group_id, roster)
+    return roster
+
+
+def invalidate_group(*group_ids):
+    """Elimina del caché los rosters de los grupos indicados"""
+    _bump_generation()
+    for group_id in group_ids:
+        roster_cache.delete(group_id)
+
+
+def invalidate_student(student_id):
+    """Elimina del caché todos los rosters que incluyen al estudiante"""
+    _bump_generation()
+    roster_cache.delete_where(
+        lambda group_id, roster: roster is not None and any(student['id'] == student_id for student in roster.students)
+    )
+
+
+def invalidate_all():
+    """Vacía el caché de rosters"""
+    _bump_generation()
+    roster_cache.clear()
@@ -0,0 +1,113 @@
+"""
+Registro en memoria de las tablas y columnas del esquema.
+
+Algunas rutas se adaptan a bases de datos con esquemas incompletos (tablas o
+columnas que pueden no existir). En lugar de consultar information_schema en
+cada petición, el esquema se lee una sola vez al iniciar la aplicación y las
+rutas lo consultan en memoria:
+
+    from utils.schema import schema
+
+    if not schema.has_tables('group', 'class'):
+        ...
+    if schema.has_column('student', 'group_id'):
+        ...
+
+Si el esquema cambia en caliente (por ejemplo tras `flask db upgrade`) se
+puede recargar con schema.refresh() o con POST /api/usuarios/schema/refresh.
+"""
+import threading
+
+import psycopg2.extras
+
+from utils.db import get_db_connection
+
+
+class SchemaRegistry:
+    """Tablas y columnas del esquema actual, cargadas una vez y consultadas en memoria"""
+
+    def __init__(self):
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def _load(self, conn):
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute("""
+                SELECT table_name, column_name
+                FROM information_schema.columns
+                WHERE table_schema = current_schema()
+            """)
+            tables = {}
+            for row in cur.fetchall():
+                tables.setdefault(row['table_name'], set()).add(row['column_name'])
+        return {name: frozenset(columns) for name, columns in tables.items()}
+
+    def refresh(self, conn=None):
+        """Vuelve a leer el esquema; usa `conn` si se proporciona o una conexión del pool"""
+        if conn is None:
+            with get_db_connection() as own_conn:
+                tables = self._load(own_conn)
+        else:
+            tables = self._load(conn)
+        with self._lock:
+            self._tables = tables
+        return tables
+
+    def _snapshot(self):
+        tables = self._tables
+        if tables is None:
+            with self._lock:
+                tables = self._tables
+            if tables is None:
+                tables = self.refresh()
+        return tables
+
+    @property
+    def loaded(self):
+        return self._tables is not None
+
+    def tables(self):
+        return sorted(self._snapshot())
+
+    def columns(self, table):
+        """Columnas de `table` (conjunto vacío si la tabla no existe)"""
+        return self._snapshot().get(table, frozenset())
+
+    def has_table(self, table):
+        return table in self._snapshot()
+
+    def has_tables(self, *tables):
+        snapshot = self._snapshot()
+        return all(table in snapshot for table in tables)
+
+    def has_column(self, table, column):
+        return column in self.columns(table)
+
+    def has_columns(self, table, *columns):
+        available = self.columns(table)
+        return all(column in available for column in columns)
+
+    def add_column(self, table, column):
+        """Registra una columna creada por la propia aplicación sin recargar todo el esquema"""
+        with self._lock:
+            if self._tables is not None:
+                tables = dict(self._tables)
+                tables[table] = tables.get(table, frozenset()) | {column}
+                self._tables = tables
+
+
+schema = SchemaRegistry()
+
+
+def init_schema_registry(app):
+    """
+    Carga el esquema al iniciar la aplicación.
+
+    Se llama desde create_app. Si la base no está disponible solo se registra
+    una advertencia y el esquema se carga en la primera consulta.
+    """
+    try:
+        tables = schema.refresh()
+        app.logger.info("Esquema cargado: %d tablas", len(tables))
+    except Exception as e:
+        app.logger.warning("No se pudo cargar el esquema al iniciar: %s", e)
@@ -0,0 +1,66 @@
+"""
+Búsqueda de texto para los listados de estudiantes, tutores y usuarios.
+
+Cada tabla tiene un "documento de búsqueda": sus columnas de nombre y correo
+concatenadas, en minúsculas y sin acentos mediante immutable_unaccent. Sobre esa
+misma expresión existe un índice GIN con gin_trgm_ops (ver
+migrations/0004_search_indexes.sql), por lo que tanto la coincidencia por
+subcadena (LIKE) como la similitud por trigramas (<%) usan el índice.
+
+La expresión SQL generada aquí debe coincidir exactamente con la de los índices;
+si se cambian las columnas hay que recrear el índice correspondiente.
+"""
+
+SEARCH_COLUMNS = {
+    'student': ('name', 'lastname_f', 'lastname_m', 'email'),
+    'family': ('tutor_name', 'tutor_lastname_f', 'tutor_lastname_m', 'email_address'),
+    'usuarios': ('name', 'lastname_f', 'lastname_m', 'email'),
+}
+
+
+def search_document(table, alias=None):
+    """Devuelve la expresión SQL del documento de búsqueda de una tabla"""
+    prefix = f"{alias}." if alias else ""
+    parts = " || ' ' || ".join(f"coalesce({prefix}{column}, '')" for column in SEARCH_COLUMNS[table])
+    return f"immutable_unaccent(lower({parts}))"
+
+
+def normalize_search_term(term):
+    """Limpia el término de búsqueda; devuelve None si queda vacío"""
+    term = " ".join((term or "").split())
+    return term or None
+
+
+def build_search(table, term, alias=None):
+    """
+    Construye el filtro y el orden por relevancia para buscar `term` en `table`.
+
+    Coinciden los registros cuyo documento contiene el término (sin importar
+    mayúsculas ni acentos) o se le parece por trigramas, lo que tolera errores
+    de escritura en nombres.
+
+    Returns:
+        tuple: (where_sql, where_params, rank_sql, rank_params), o None si el
+               término está vacío. rank_sql es mayor para mejores coincidencias.
+
+    Uso:
+        search = build_search('student', request.args.get('search'), alias='s')
+        if search:
+            where_sql, where_params, rank_sql, rank_params = search
+            query += f" WHERE {where_sql} ORDER BY {rank_sql} DESC, s.id"
+            params = where_params + rank_params
+    """
+    term = normalize_search_term(term)
+    if term is None:
+        return None
+
+    document = search_document(table, alias)
+    normalized = "immutable_unaccent(lower(%s))"
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    where_sql = (
+        f"({document} LIKE '%%' || {normalized} || '%%' "
+        f"OR {normalized} <%% {document})"
+    )
+    rank_sql = f"word_similarity({normalized}, {document})"
+    return where_sql, [escaped, term], rank_sql, [term]
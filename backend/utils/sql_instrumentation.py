@@ -0,0 +1,103 @@
+"""
+Instrumentación de SQL por petición.
+
+Registra cada sentencia ejecutada durante una petición (conteo, tiempo total y
+sentencia más lenta) y lo expone en el encabezado `Server-Timing`, visible en
+las herramientas de desarrollo del navegador. Si la misma forma de sentencia se
+ejecuta más de SQL_N_PLUS_ONE_THRESHOLD veces en una petición se registra una
+advertencia, lo que suele indicar un patrón N+1.
+
+Las sentencias de respuestas en streaming que se ejecutan después de enviar
+los encabezados no se incluyen en el encabezado.
+"""
+import re
+from collections import Counter
+
+from flask import g, has_request_context, request
+
+from utils.db import add_query_listener
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_PLACEHOLDER_LIST_RE = re.compile(r'%s(\s*,\s*%s)+')
+
+
+def statement_shape(query):
+    """Normaliza una sentencia para agrupar ejecuciones equivalentes"""
+    shape = _WHITESPACE_RE.sub(' ', query).strip()
+    return _PLACEHOLDER_LIST_RE.sub('%s, ...', shape)
+
+
+class RequestQueryStats:
+    """Estadísticas de las sentencias SQL ejecutadas en una petición"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_query = None
+        self.shapes = Counter()
+
+    def record(self, query, duration):
+        self.count += 1
+        self.total_time += duration
+        shape = statement_shape(query)
+        self.shapes[shape] += 1
+        if duration > self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_query = shape
+
+    def repeated_shapes(self, threshold):
+        """Devuelve las formas de sentencia ejecutadas más de `threshold` veces"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def server_timing(self):
+        """Valor del encabezado Server-Timing con las métricas de la petición"""
+        return (
+            f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries", '
+            f'db-slowest;dur={self.slowest_time * 1000:.2f}'
+        )
+
+
+def _record_query(query, duration):
+    if has_request_context():
+        stats = g.get('_sql_stats')
+        if stats is not None:
+            stats.record(query, duration)
+
+
+def current_query_stats():
+    """Devuelve las estadísticas SQL de la petición actual, o None si no hay"""
+    return g.get('_sql_stats') if has_request_context() else None
+
+
+def init_sql_instrumentation(app):
+    """
+    Instala la instrumentación de SQL en la aplicación.
+
+    Se llama desde create_app. Se desactiva con SQL_INSTRUMENTATION=False.
+    """
+    if not app.config.get('SQL_INSTRUMENTATION', True):
+        return
+
+    threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 10)
+    add_query_listener(_record_query)
+
+    @app.before_request
+    def start_query_stats():
+        g._sql_stats = RequestQueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('_sql_stats')
+        if stats is None:
+            return response
+
+        response.headers.add('Server-Timing', stats.server_timing())
+        response.headers.setdefault('Timing-Allow-Origin', app.config.get('CORS_ORIGIN', '*'))
+
+        for shape, count in stats.repeated_shapes(threshold):
+            app.logger.warning(
+                "Posible N+1 en %s %s: la misma sentencia se ejecutó %d veces: %s",
+                request.method, request.path, count, shape[:300]
+            )
+        return response
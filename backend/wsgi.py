@@ -0,0 +1,10 @@
+"""
+Punto de entrada WSGI para producción.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Para desarrollo local se sigue usando `python app.py`.
+"""
+from app import create_app
+
+app = create_app()